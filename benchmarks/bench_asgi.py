@@ -0,0 +1,203 @@
+"""Compare feed pages under a slow database with and without concurrency.
+
+Every SQL query is delayed by a fixed network round trip, as with a
+database on another host. First the latency of `group_posts`, `profile`
+and `post_detail` is measured one request at a time with their independent
+queries run one by one and concurrently, then the throughput of the feed
+pages under many simultaneous clients is measured for a single-threaded
+WSGI worker and for `yatube.asgi` running requests in its threads.
+
+Usage:
+    python benchmarks/bench_asgi.py [--latency 5] [--clients 32]
+        [--seconds 5] [--posts 10000] [--db PATH]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import time
+from statistics import median, quantiles
+from typing import Callable, Dict, List
+
+from common import WSGIClient, seed, setup_django
+
+
+def slow_database(latency: float) -> None:
+    """Delay every query of connections opened from now on.
+
+    Args:
+        latency: delay of a query in seconds.
+    """
+    from django.db import connections
+    from django.db.backends.signals import connection_created
+
+    def delay(execute, sql, params, many, context):
+        time.sleep(latency)
+        return execute(sql, params, many, context)
+
+    def add_delay(sender, connection, **kwargs):
+        connection.execute_wrappers.append(delay)
+
+    connection_created.connect(add_delay, weak=False)
+    connections.close_all()
+
+
+def pages(rng: random.Random) -> Dict[str, Callable[[], str]]:
+    """Get functions picking urls of the compared pages."""
+    from django.contrib.auth import get_user_model
+
+    from posts.models import Group, Post
+
+    slugs = list(Group.objects.values_list('slug', flat=True))
+    usernames = list(get_user_model().objects.order_by(
+        '-stats__posts_count').values_list('username', flat=True)[:100])
+    post_ids = list(Post.objects.order_by('?').values_list(
+        'pk', flat=True)[:1000])
+    return {
+        'group_posts': lambda: f'/group/{rng.choice(slugs)}/',
+        'profile': lambda: f'/profile/{rng.choice(usernames)}/',
+        'post_detail': lambda: f'/posts/{rng.choice(post_ids)}',
+    }
+
+
+async def asgi_get(application: Callable, path: str, cookies: str) -> int:
+    """Make a GET request to an ASGI application and get its status."""
+    messages = [{'type': 'http.request'}]
+    status = {}
+
+    async def receive():
+        return messages.pop() if messages else {'type': 'http.disconnect'}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status['code'] = message['status']
+
+    path, _, query = path.partition('?')
+    await application({
+        'type': 'http', 'method': 'GET', 'path': path,
+        'query_string': query.encode(), 'http_version': '1.1',
+        'server': ('127.0.0.1', 80), 'client': ('127.0.0.1', 50000),
+        'headers': [(b'host', b'127.0.0.1'), (b'cookie', cookies.encode())],
+    }, receive, send)
+    return status['code']
+
+
+async def asgi_load(application: Callable, urls: List[Callable[[], str]],
+                    cookies: str, clients: int,
+                    seconds: float) -> List[float]:
+    """Send requests of many clients at once until the time is over.
+
+    Returns:
+        latencies of the requests in ms.
+    """
+    deadline = time.perf_counter() + seconds
+    timings = []
+
+    async def client(number: int) -> None:
+        rng = random.Random(number)
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            await asgi_get(application, rng.choice(urls)(), cookies)
+            timings.append((time.perf_counter() - started) * 1000)
+
+    await asyncio.gather(*(client(number) for number in range(clients)))
+    return timings
+
+
+def wsgi_load(client: WSGIClient, urls: List[Callable[[], str]],
+              seconds: float) -> List[float]:
+    """Send requests one by one, as a synchronous worker handles them.
+
+    Returns:
+        latencies of the requests in ms.
+    """
+    rng = random.Random(0)
+    deadline = time.perf_counter() + seconds
+    timings = []
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        client.get(rng.choice(urls)())
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def report(title: str, timings: List[float], seconds: float) -> None:
+    """Print throughput and latency percentiles."""
+    cuts = quantiles(timings, n=100, method='inclusive')
+    print(f'{title:<40}{len(timings) / seconds:8.0f} req/s  '
+          f'p50 {cuts[49]:7.1f}  p95 {cuts[94]:7.1f} ms')
+
+
+def main() -> None:
+    """Run benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--latency', type=float, default=5,
+                        help='delay of every query in ms')
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--requests', type=int, default=50)
+    parser.add_argument('--posts', type=int, default=10000)
+    parser.add_argument('--db', help='database file, temporary by default; '
+                                     'an already seeded one is reused')
+    args = parser.parse_args()
+
+    os.environ.setdefault('YATUBE_CACHE', 'locmem')
+    db_name = setup_django(args.db)
+    from django.conf import settings
+    from django.contrib.auth import get_user_model
+    from django.core.management import call_command
+
+    from posts.models import Post
+
+    try:
+        call_command('migrate', verbosity=0)
+        if not Post.objects.exists():
+            seed(args.posts, args.posts // 10, 20, args.posts * 3, args.posts)
+        reader = get_user_model().objects.order_by('pk').first()
+        urls = pages(random.Random(0))
+        slow_database(args.latency / 1000)
+        client = WSGIClient(reader)
+        print(f'{args.latency:g} ms per query, {Post.objects.count()} posts')
+
+        print('\n--- one request at a time, median ms')
+        for name, url in urls.items():
+            line = f'{name:<14}'
+            for workers in (0, 4):
+                settings.QUERY_WORKERS = workers
+                timings = []
+                for _ in range(args.requests):
+                    started = time.perf_counter()
+                    client.get(url())
+                    timings.append((time.perf_counter() - started) * 1000)
+                title = 'concurrent' if workers else 'sequential'
+                line += f'  {title} {median(timings):7.1f}'
+            print(line)
+
+        print(f'\n--- {args.clients} clients, {args.seconds:g} s')
+        settings.QUERY_WORKERS = 0
+        report('WSGI, one request at a time',
+               wsgi_load(client, list(urls.values()), args.seconds),
+               args.seconds)
+        from yatube.asgi import application
+
+        cookies = '; '.join(
+            f'{name}={value}' for name, value in client.cookies.items())
+        for workers in (0, 4):
+            settings.QUERY_WORKERS = workers
+            timings = asyncio.run(asgi_load(
+                application, list(urls.values()), cookies, args.clients,
+                args.seconds))
+            report(f'ASGI, {settings.ASGI_THREADS} threads, '
+                   f'{"concurrent" if workers else "sequential"} queries',
+                   timings, args.seconds)
+    finally:
+        if args.db is None and db_name is not None:
+            os.remove(db_name)
+            for suffix in ('-wal', '-shm'):
+                if os.path.exists(db_name + suffix):
+                    os.remove(db_name + suffix)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""Compare cache hit rates of cache tiers across worker processes.
+
+Every worker serves a stream of requests for rendered pages whose keys
+follow a power-law distribution, renders a page on a miss and stores it.
+With a per-process cache every worker warms its own copy; with a shared
+tier a page rendered by one worker is a hit for all the others.
+
+Usage:
+    python benchmarks/bench_cache.py [--workers 8] [--requests 5000]
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from common import setup_django
+
+TIERS = {
+    'locmem (per process)': ('locmem', 0),
+    'sqlite (shared)': ('sqlite', 0),
+    'file (shared)': ('file', 0),
+    'sqlite + local LRU': ('sqlite', 5),
+}
+
+RENDER_SECONDS = 0.002
+PAGE_SIZE = 4096
+
+
+def worker(args: tuple) -> dict:
+    """Serve requests with the cache tier configured in the environment.
+
+    Args:
+        args: worker number, amount of requests, amount of pages and
+            settings of the cache tier.
+
+    Returns:
+        hit and miss counts and elapsed time.
+    """
+    number, requests, pages, backend, location, local_timeout = args
+    os.environ['YATUBE_CACHE'] = backend
+    os.environ['YATUBE_CACHE_LOCAL_TIMEOUT'] = str(local_timeout)
+    if location:
+        os.environ['YATUBE_CACHE_LOCATION'] = location
+    db_name = setup_django()
+    from django.core.cache import cache
+
+    rng = random.Random(number)
+    weights = [1 / (rank + 1) for rank in range(pages)]
+    keys = rng.choices(range(pages), weights=weights, k=requests)
+    hits = 0
+    start = time.perf_counter()
+    for key in keys:
+        if cache.get(f'page:{key}') is not None:
+            hits += 1
+            continue
+        time.sleep(RENDER_SECONDS)
+        cache.set(f'page:{key}', 'x' * PAGE_SIZE, 600)
+    elapsed = time.perf_counter() - start
+    os.remove(db_name)
+    return {'hits': hits, 'misses': requests - hits, 'seconds': elapsed}
+
+
+def main() -> None:
+    """Run the benchmark for every cache tier."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--pages', type=int, default=2000)
+    options = parser.parse_args()
+
+    print(
+        f'{options.workers} workers x {options.requests} requests '
+        f'over {options.pages} pages'
+    )
+    for title, (backend, local_timeout) in TIERS.items():
+        directory = tempfile.mkdtemp()
+        location = {
+            'sqlite': os.path.join(directory, 'cache.sqlite3'),
+            'file': directory,
+        }.get(backend)
+        tasks = [
+            (number, options.requests, options.pages, backend, location,
+             local_timeout)
+            for number in range(options.workers)
+        ]
+        with multiprocessing.Pool(
+                options.workers, maxtasksperchild=1) as pool:
+            results = pool.map(worker, tasks)
+        shutil.rmtree(directory, ignore_errors=True)
+        hits = sum(result['hits'] for result in results)
+        misses = sum(result['misses'] for result in results)
+        seconds = max(result['seconds'] for result in results)
+        print(
+            f'{title:>22}: hit rate {hits / (hits + misses):6.1%}, '
+            f'renders {misses:6d}, '
+            f'{options.workers * options.requests / seconds:8.0f} req/s'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+"""Measure mixed read/write traffic from concurrent worker processes.
+
+Every worker process plays a server worker with a logged-in user: it
+reads the main page, group pages, profiles and posts, and with the given
+share of requests creates posts and comments, all through the WSGI
+application in-process. Runs the traffic on SQLite with default settings
+and with the tuned pragmas and persistent connections of the project, or
+on PostgreSQL, configured with YATUBE_DATABASE=postgresql and YATUBE_DB_*
+variables, with new and with persistent connections.
+
+Usage:
+    python benchmarks/bench_concurrency.py [--workers 8] [--seconds 10]
+        [--write-share 0.2] [--posts 10000] [--db PATH]
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import time
+from statistics import quantiles
+from typing import Dict, List, Tuple
+
+from common import WSGIClient, seed, setup_django
+
+# Journal mode set before workers start, pragmas replacing SQLITE_PRAGMAS
+# and CONN_MAX_AGE.
+SQLITE_CONFIGS = {
+    'sqlite, default settings': ('DELETE', {}, 0),
+    'sqlite, tuned': ('WAL', None, 60),
+}
+
+POSTGRESQL_CONFIGS = {
+    'postgresql, new connections': (None, None, 0),
+    'postgresql, persistent': (None, None, 60),
+}
+
+READS = ('index', 'group', 'profile', 'post')
+
+WRITES = ('post_create', 'add_comment')
+
+
+def request(client: WSGIClient, rng: random.Random, kind: str,
+            sample: dict):
+    """Make a request of a kind with random arguments."""
+    if kind == 'index':
+        return client.get(f'/?page={rng.randint(1, 3)}')
+    if kind == 'group':
+        return client.get(f'/group/{rng.choice(sample["slugs"])}/')
+    if kind == 'profile':
+        return client.get(f'/profile/{rng.choice(sample["usernames"])}/')
+    if kind == 'post':
+        return client.get(f'/posts/{rng.choice(sample["post_ids"])}')
+    if kind == 'post_create':
+        return client.post('/create/', {'text': f'Пост {rng.random()}'})
+    return client.post(f'/posts/{rng.choice(sample["post_ids"])}/comment',
+                       {'text': f'Комментарий {rng.random()}'})
+
+
+def worker(args: Tuple) -> Dict[str, List]:
+    """Send requests until the deadline in a forked process.
+
+    Args:
+        args: worker number, deadline, share of writes, pragmas replacing
+            SQLITE_PRAGMAS or None, CONN_MAX_AGE and sampled arguments.
+
+    Returns:
+        latencies in ms of reads and writes and amount of failed requests.
+    """
+    number, deadline, write_share, pragmas, conn_max_age, sample = args
+    from django.conf import settings
+    from django.contrib.auth import get_user_model
+
+    if pragmas is not None:
+        settings.SQLITE_PRAGMAS = pragmas
+    settings.DATABASES['default']['CONN_MAX_AGE'] = conn_max_age
+    rng = random.Random(number)
+    user = get_user_model().objects.get(
+        username=rng.choice(sample['usernames']))
+    client = WSGIClient(user)
+    results = {'reads': [], 'writes': [], 'errors': 0}
+    while time.time() < deadline:
+        write = rng.random() < write_share
+        kind = rng.choice(WRITES if write else READS)
+        started = time.perf_counter()
+        response = request(client, rng, kind, sample)
+        elapsed = (time.perf_counter() - started) * 1000
+        if response.status >= 500:
+            results['errors'] += 1
+        else:
+            results['writes' if write else 'reads'].append(elapsed)
+    return results
+
+
+def percentiles(timings: List[float]) -> str:
+    """Format p50, p95 and p99 of latencies."""
+    if len(timings) < 2:
+        return 'no requests'
+    cuts = quantiles(timings, n=100, method='inclusive')
+    return (f'p50 {cuts[49]:7.1f}  p95 {cuts[94]:7.1f}  '
+            f'p99 {cuts[98]:7.1f} ms')
+
+
+def main() -> None:
+    """Run benchmark for every configuration of the database."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--write-share', type=float, default=0.2)
+    parser.add_argument('--posts', type=int, default=10000)
+    parser.add_argument('--db', help='database file, temporary by default; '
+                                     'an already seeded one is reused')
+    args = parser.parse_args()
+
+    os.environ.setdefault('YATUBE_CACHE', 'locmem')
+    db_name = setup_django(args.db)
+    from django.conf import settings
+    from django.contrib.auth import get_user_model
+    from django.core.management import call_command
+    from django.db import connection, connections
+
+    from posts.models import Group, Post
+
+    try:
+        call_command('migrate', verbosity=0)
+        if not Post.objects.exists():
+            seed(args.posts, args.posts // 10, 20, args.posts, args.posts)
+        sample = {
+            'slugs': list(Group.objects.values_list('slug', flat=True)),
+            'usernames': list(get_user_model().objects.order_by(
+                '?').values_list('username', flat=True)[:200]),
+            'post_ids': list(Post.objects.order_by('?').values_list(
+                'pk', flat=True)[:1000]),
+        }
+        configs = (SQLITE_CONFIGS if settings.DATABASE == 'sqlite'
+                   else POSTGRESQL_CONFIGS)
+        print(f'{args.workers} workers, {args.write_share:.0%} writes, '
+              f'{args.seconds:g} s per configuration')
+        for title, (journal_mode, pragmas, conn_max_age) in configs.items():
+            if journal_mode is not None:
+                with connection.cursor() as cursor:
+                    cursor.execute(f'PRAGMA journal_mode = {journal_mode}')
+            connections.close_all()
+            deadline = time.time() + args.seconds
+            tasks = [
+                (number, deadline, args.write_share, pragmas, conn_max_age,
+                 sample)
+                for number in range(args.workers)
+            ]
+            context = multiprocessing.get_context('fork')
+            with context.Pool(args.workers) as pool:
+                results = pool.map(worker, tasks)
+            reads = [ms for result in results for ms in result['reads']]
+            writes = [ms for result in results for ms in result['writes']]
+            errors = sum(result['errors'] for result in results)
+            print(f'\n--- {title}: '
+                  f'{(len(reads) + len(writes)) / args.seconds:.0f} req/s, '
+                  f'{errors} failed')
+            print(f'  reads  {len(reads):6d}  {percentiles(reads)}')
+            print(f'  writes {len(writes):6d}  {percentiles(writes)}')
+    finally:
+        if args.db is None and db_name is not None:
+            os.remove(db_name)
+            for suffix in ('-wal', '-shm'):
+                if os.path.exists(db_name + suffix):
+                    os.remove(db_name + suffix)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,209 @@
+"""Measure latency and queries of the hot endpoints at several scales.
+
+Seeds a database at the chosen scale, then drives `index`, `group_posts`,
+`profile`, `post_detail`, `follow_index`, `post_create` and `add_comment`
+through the WSGI application in-process, as a logged-in reader picking
+groups, authors and posts with a power-law distribution. Reports p50, p95
+and p99 latency, SQL queries per request and throughput of every endpoint
+and writes them to a JSON file, which a later run can be compared with.
+
+Usage:
+    python benchmarks/bench_endpoints.py [--scale 10k] [--requests 200]
+        [--db PATH] [--output PATH] [--compare PATH]
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import time
+from datetime import datetime, timezone
+from statistics import mean, quantiles
+from typing import Callable, Dict, List
+
+from common import ROOT_DIR, WSGIClient, seed, setup_django
+
+SCALES = {
+    '10k': dict(posts=10 ** 4, users=10 ** 3, groups=20,
+                comments=3 * 10 ** 4, follows=2 * 10 ** 4),
+    '100k': dict(posts=10 ** 5, users=10 ** 4, groups=100,
+                 comments=3 * 10 ** 5, follows=2 * 10 ** 5),
+    '1m': dict(posts=10 ** 6, users=10 ** 5, groups=500,
+               comments=3 * 10 ** 6, follows=2 * 10 ** 6),
+}
+
+RESULTS_DIR = os.path.join(ROOT_DIR, 'benchmarks', 'results')
+
+PAGES = 10
+
+
+def summary(timings: List[float], queries: List[int], errors: int,
+            elapsed: float) -> Dict[str, float]:
+    """Get statistics of the requests to an endpoint.
+
+    Args:
+        timings: latencies of requests in milliseconds;
+        queries: SQL queries of every request;
+        errors: amount of responses with an unexpected status;
+        elapsed: wall time of all requests in seconds.
+    """
+    percentiles = quantiles(timings, n=100, method='inclusive')
+    return {
+        'requests': len(timings),
+        'errors': errors,
+        'p50_ms': round(percentiles[49], 3),
+        'p95_ms': round(percentiles[94], 3),
+        'p99_ms': round(percentiles[98], 3),
+        'queries_per_request': round(mean(queries), 2),
+        'requests_per_second': round(len(timings) / elapsed, 1),
+    }
+
+
+def scenarios(rng: random.Random) -> Dict[str, Callable]:
+    """Get functions making a request to every endpoint.
+
+    Args:
+        rng: random generator picking pages, groups, authors and posts.
+
+    Returns:
+        functions taking a client and returning its response, by name.
+    """
+    from django.contrib.auth import get_user_model
+    from django.db.models import Max, Min
+
+    from posts.models import Group, Post
+
+    User = get_user_model()
+    groups = list(Group.objects.order_by('pk').values_list('pk', 'slug'))
+    slugs = [slug for _, slug in groups]
+    usernames = list(
+        User.objects.order_by('pk').values_list('username', flat=True))
+    bounds = Post.objects.aggregate(low=Min('pk'), high=Max('pk'))
+
+    def power_law(items: list):
+        return items[min(int(rng.paretovariate(1)) - 1, len(items) - 1)]
+
+    def post_id() -> int:
+        return rng.randint(bounds['low'], bounds['high'])
+
+    def page() -> int:
+        return power_law(range(1, PAGES + 1))
+
+    return {
+        'index': lambda client: client.get(f'/?page={page()}'),
+        'group_posts': lambda client: client.get(
+            f'/group/{power_law(slugs)}/?page={page()}'),
+        'profile': lambda client: client.get(
+            f'/profile/{power_law(usernames)}/'),
+        'post_detail': lambda client: client.get(f'/posts/{post_id()}'),
+        'follow_index': lambda client: client.get(f'/follow/?page={page()}'),
+        'post_create': lambda client: client.post('/create/', {
+            'text': f'Benchmark post {rng.random()}',
+            'group': power_law(groups)[0] if rng.random() < 0.7 else '',
+        }),
+        'add_comment': lambda client: client.post(
+            f'/posts/{post_id()}/comment', {'text': 'Benchmark comment'}),
+    }
+
+
+def prepare_reader():
+    """Get the user following most authors, with the fullest feed."""
+    from django.contrib.auth import get_user_model
+
+    User = get_user_model()
+    return User.objects.order_by('-stats__following_count', 'pk').first()
+
+
+def run(args: argparse.Namespace) -> dict:
+    """Seed the database if needed and measure all endpoints."""
+    from django.core.management import call_command
+
+    from posts.models import Post
+
+    call_command('migrate', verbosity=0)
+    if not Post.objects.exists():
+        seed(**SCALES[args.scale])
+    client = WSGIClient(prepare_reader())
+    rng = random.Random(0)
+    endpoints = {}
+    for name, scenario in scenarios(rng).items():
+        for _ in range(args.warmup):
+            scenario(client)
+        timings, queries, errors = [], [], 0
+        started = time.perf_counter()
+        for _ in range(args.requests):
+            request_started = time.perf_counter()
+            response = scenario(client)
+            timings.append((time.perf_counter() - request_started) * 1000)
+            queries.append(response.queries)
+            errors += response.status not in (200, 302)
+        endpoints[name] = summary(
+            timings, queries, errors, time.perf_counter() - started)
+    return {
+        'scale': args.scale,
+        'posts': Post.objects.count(),
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'commit': subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR,
+            capture_output=True, text=True).stdout.strip(),
+        'python': platform.python_version(),
+        'endpoints': endpoints,
+    }
+
+
+def report(results: dict, previous: dict = None) -> None:
+    """Print results, with changes against a previous run."""
+    print(f'{results["posts"]} posts, commit {results["commit"]}')
+    print(f'{"endpoint":<14}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}'
+          f'{"queries":>9}{"req/s":>9}{"errors":>8}')
+    for name, stats in results['endpoints'].items():
+        line = (
+            f'{name:<14}{stats["p50_ms"]:9.2f}{stats["p95_ms"]:9.2f}'
+            f'{stats["p99_ms"]:9.2f}{stats["queries_per_request"]:9.2f}'
+            f'{stats["requests_per_second"]:9.1f}{stats["errors"]:8d}'
+        )
+        before = (previous or {}).get('endpoints', {}).get(name)
+        if before:
+            change = stats['p95_ms'] / before['p95_ms'] - 1
+            line += f'  p95 {change:+.0%} vs {previous["commit"]}'
+        print(line)
+
+
+def main() -> None:
+    """Run benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', choices=SCALES, default='10k')
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--db', help='database file, temporary by default; '
+                                     'an already seeded one is reused')
+    parser.add_argument('--output', help='JSON file with results, '
+                                         'benchmarks/results/ by default')
+    parser.add_argument('--compare', help='JSON file of a previous run')
+    args = parser.parse_args()
+
+    os.environ.setdefault('YATUBE_CACHE', 'locmem')
+    db_name = setup_django(args.db)
+    try:
+        results = run(args)
+    finally:
+        if args.db is None:
+            os.remove(db_name)
+    previous = None
+    if args.compare:
+        with open(args.compare) as file:
+            previous = json.load(file)
+    report(results, previous)
+    output = args.output or os.path.join(
+        RESULTS_DIR, f'endpoints-{args.scale}-'
+                     f'{datetime.now():%Y%m%d-%H%M%S}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as file:
+        json.dump(results, file, indent=2)
+    print(f'results written to {output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""Compare query plans of the feed pages before and after feed indexes.
+
+Seeds a throwaway database, drops the indexes declared in `Meta.indexes`
+of the posts models, prints EXPLAIN output and timings of the queries
+behind `index`, `group_posts`, `profile`, `follow_index` and
+`post_detail`, then creates the indexes again and repeats the
+measurements.
+
+Usage:
+    python benchmarks/bench_indexes.py --posts 1000000
+"""
+
+import argparse
+import os
+
+from common import seed, setup_django, timeit
+
+
+def feed_indexes() -> list:
+    """Get pairs of model and index declared for the feed queries."""
+    from posts.models import Comment, Follow, Post
+
+    return [
+        (model, index)
+        for model in (Post, Comment, Follow)
+        for index in model._meta.indexes
+    ]
+
+
+def feed_queries() -> dict:
+    """Get querysets of the feed pages keyed by view name."""
+    from django.contrib.auth import get_user_model
+    from django.db.models import Count
+    from posts.models import Comment, Follow, Group, Post
+
+    User = get_user_model()
+    author = User.objects.annotate(
+        posts_num=Count('posts')).order_by('-posts_num').first()
+    follower = Follow.objects.values_list('user', flat=True).annotate(
+        follows=Count('pk')).order_by('-follows').first()
+    group = Group.objects.first()
+    post = Post.objects.annotate(
+        comments_num=Count('comments')).order_by('-comments_num').first()
+    return {
+        'index': Post.objects.for_feed()[:10],
+        'group_posts': Post.objects.for_feed().filter(group=group)[:10],
+        'profile': Post.objects.for_feed().filter(author=author)[:10],
+        'follow_index': Post.objects.for_feed().filter(
+            author__following__user=follower)[:10],
+        'post_detail': Comment.objects.filter(post=post),
+    }
+
+
+def measure(title: str) -> None:
+    """Print plans and timings of the feed queries."""
+    print(f'\n===== {title} =====')
+    for name, queryset in feed_queries().items():
+        plan = queryset.explain()
+        sorts = 'TEMP B-TREE' in plan
+        duration = timeit(lambda: list(queryset.all()))
+        print(f'\n--- {name}: {duration:.2f} ms, '
+              f'{"sorts rows" if sorts else "index order"}')
+        print(plan)
+
+
+def main() -> None:
+    """Run benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--posts', type=int, default=1000000)
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--groups', type=int, default=100)
+    parser.add_argument('--comments', type=int, default=200000)
+    parser.add_argument('--follows', type=int, default=100000)
+    parser.add_argument('--db', help='database file, temporary by default')
+    args = parser.parse_args()
+
+    db_name = setup_django(args.db)
+    from django.core.management import call_command
+    from django.db import connection
+
+    try:
+        call_command('migrate', verbosity=0)
+        with connection.schema_editor() as editor:
+            for model, index in feed_indexes():
+                editor.remove_index(model, index)
+        seed(args.posts, args.users, args.groups, args.comments, args.follows)
+        measure(f'without feed indexes ({args.posts} posts)')
+        with connection.schema_editor() as editor:
+            for model, index in feed_indexes():
+                editor.add_index(model, index)
+        connection.cursor().execute('ANALYZE')
+        measure(f'with feed indexes ({args.posts} posts)')
+    finally:
+        if args.db is None:
+            os.remove(db_name)
+
+
+if __name__ == '__main__':
+    main()
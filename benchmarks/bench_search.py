@@ -0,0 +1,68 @@
+"""Compare search backends on a large database.
+
+Times the first page of results, including the count the paginator
+needs, for words of different frequency with the FTS5 index and with
+`icontains` scans, and the cost of keeping the index up to date on save.
+
+Usage:
+    python benchmarks/bench_search.py [--posts 1000000] [--db PATH]
+"""
+
+import argparse
+import os
+
+from common import seed, setup_django, timeit, vocabulary
+
+PAGE_SIZE = 10
+
+WORD_RANKS = (5, 500, 15000)
+
+
+def main() -> None:
+    """Run benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--posts', type=int, default=1000000)
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--comments', type=int, default=200000)
+    parser.add_argument('--db', help='database file, temporary by default')
+    args = parser.parse_args()
+
+    db_name = setup_django(args.db)
+    from django.core.management import call_command
+    from django.db import transaction
+
+    from posts.models import Post
+    from posts.search import DatabaseBackend, FTS5Backend
+
+    try:
+        call_command('migrate', verbosity=0)
+        seed(args.posts, args.users, 100, args.comments, 0)
+        words = vocabulary()
+        print(f'{Post.objects.count()} posts')
+        for backend in (FTS5Backend(), DatabaseBackend()):
+            for rank in WORD_RANKS:
+                results = backend.search(words[rank])
+
+                def first_page():
+                    return results.count(), list(results[:PAGE_SIZE])
+
+                found = results.count()
+                duration = timeit(first_page, repeat=3)
+                print(
+                    f'{type(backend).__name__:>15} word #{rank:<6}'
+                    f'{found:8d} found, first page {duration:9.2f} ms'
+                )
+        post = Post.objects.order_by('-pk').first()
+
+        def save():
+            with transaction.atomic():
+                post.save()
+
+        print(f'post save with index update: {timeit(save):.2f} ms')
+    finally:
+        if args.db is None:
+            os.remove(db_name)
+
+
+if __name__ == '__main__':
+    main()
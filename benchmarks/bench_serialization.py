@@ -0,0 +1,90 @@
+"""Compare serialization of posts for the JSON API.
+
+Turns the newest posts into JSON the naive way, building model instances
+with their author and group and converting them with `model_to_dict`,
+and the way the API does it, from `.values()` rows of the same fields,
+encoded with the standard `json` module and with `orjson`. Reports the
+median time and rows per second of pages of several sizes.
+
+Usage:
+    python benchmarks/bench_serialization.py [--posts 20000] [--db PATH]
+"""
+
+import argparse
+import json
+import os
+from unittest import mock
+
+from common import seed, setup_django, timeit
+
+PAGE_SIZES = (20, 100, 1000)
+
+
+def main() -> None:
+    """Run benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--posts', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--db', help='database file, temporary by default; '
+                                     'an already seeded one is reused')
+    args = parser.parse_args()
+
+    os.environ.setdefault('YATUBE_CACHE', 'locmem')
+    db_name = setup_django(args.db)
+    from django.core.management import call_command
+    from django.core.serializers.json import DjangoJSONEncoder
+    from django.forms.models import model_to_dict
+
+    from api import encoding
+    from api.serializers import POSTS
+    from posts.models import Post
+
+    names = list(POSTS.fields)
+
+    def naive(size: int) -> bytes:
+        rows = []
+        for post in Post.objects.select_related('author', 'group')[:size]:
+            row = model_to_dict(post, fields=(
+                'id', 'text', 'pub_date', 'comments_count'))
+            row.update(
+                pub_date=post.pub_date,
+                author=post.author.username,
+                group=post.group.slug if post.group else None,
+                image=post.image.url if post.image else None,
+                thumbnail=post.thumbnail.url if post.thumbnail else None,
+            )
+            rows.append(row)
+        return json.dumps(rows, cls=DjangoJSONEncoder).encode()
+
+    def lean(size: int) -> bytes:
+        queryset = POSTS.values(Post.objects.for_feed(), names)[:size]
+        return encoding.dumps(POSTS.serialize(queryset, names))
+
+    try:
+        call_command('migrate', verbosity=0)
+        if not Post.objects.exists():
+            seed(args.posts, args.posts // 10, 20, 0, 0)
+        print(f'{Post.objects.count()} posts, orjson '
+              f'{"installed" if encoding.orjson else "missing"}')
+        for size in PAGE_SIZES:
+            timings = {'model_to_dict + json': timeit(
+                lambda: naive(size), args.repeat)}
+            with mock.patch.object(encoding, 'orjson', None):
+                timings['values + json'] = timeit(
+                    lambda: lean(size), args.repeat)
+            if encoding.orjson:
+                timings['values + orjson'] = timeit(
+                    lambda: lean(size), args.repeat)
+            baseline = timings['model_to_dict + json']
+            print(f'\n--- {size} rows')
+            for title, duration in timings.items():
+                print(f'{title:>22} {duration:9.2f} ms '
+                      f'{size / duration * 1000:10.0f} rows/s '
+                      f'x{baseline / duration:5.1f}')
+    finally:
+        if args.db is None and db_name is not None:
+            os.remove(db_name)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""Show database queries of the main page around cache expiry.
+
+Threads request the main page in a loop while the cached feed block
+expires every --timeout seconds. With a plain get-or-set cache every
+request arriving during a rebuild renders the block again; with
+`caching.get_or_build` exactly one request rebuilds it and the others are
+served the stale copy, so the spike of feed queries at expiry disappears.
+
+Usage:
+    python benchmarks/bench_stampede.py [--threads 16] [--seconds 3]
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import Counter
+from unittest import mock
+
+from common import seed, setup_django
+
+BUCKET = 0.1
+
+
+def naive_get_or_build(key, build, timeout, version=None):
+    """Get a cached value, building it in every request that misses."""
+    from django.conf import settings
+    from django.core.cache import caches
+
+    cache = caches[settings.FEED_VERSION_CACHE]
+    entry = cache.get(key)
+    if entry is not None and entry[1] == version and entry[2] > time.time():
+        return entry[0]
+    started = time.time()
+    value = build()
+    cache.set(key, (value, version, time.time() + timeout,
+                    time.time() - started), timeout * 2)
+    return value
+
+
+def load(threads: int, seconds: float) -> Counter:
+    """Request the main page from many threads.
+
+    Args:
+        threads: amount of concurrent clients;
+        seconds: duration of the test.
+
+    Returns:
+        amount of feed queries per time bucket.
+    """
+    from django.db import connection
+    from django.test import Client
+
+    queries = Counter()
+    lock = threading.Lock()
+    start = time.time()
+    barrier = threading.Barrier(threads)
+
+    def count_feed_queries(execute, sql, params, many, context):
+        if 'FROM "posts_post"' in sql and 'COUNT(*)' not in sql:
+            with lock:
+                queries[int((time.time() - start) / BUCKET)] += 1
+        return execute(sql, params, many, context)
+
+    def client() -> None:
+        browser = Client()
+        barrier.wait()
+        with connection.execute_wrapper(count_feed_queries):
+            while time.time() - start < seconds:
+                browser.get('/')
+        connection.close()
+
+    workers = [threading.Thread(target=client) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return queries
+
+
+def report(title: str, queries: Counter, seconds: float) -> None:
+    """Print feed queries per time bucket."""
+    buckets = [queries[bucket] for bucket in range(int(seconds / BUCKET))]
+    print(
+        f'{title:>14}: {sum(buckets):4d} feed queries, '
+        f'peak {max(buckets):3d} per {BUCKET * 1000:.0f} ms'
+    )
+    print(' ' * 16 + ' '.join(f'{amount:d}' for amount in buckets))
+
+
+def main() -> None:
+    """Run benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=3)
+    parser.add_argument('--timeout', type=int, default=1)
+    parser.add_argument('--posts', type=int, default=10000)
+    args = parser.parse_args()
+
+    cache_dir = tempfile.mkdtemp()
+    os.environ['YATUBE_CACHE'] = 'sqlite'
+    os.environ['YATUBE_CACHE_LOCATION'] = os.path.join(
+        cache_dir, 'cache.sqlite3')
+    db_name = setup_django()
+    from django.conf import settings
+    from django.core.cache import cache
+    from django.core.management import call_command
+
+    from posts import caching
+
+    settings.FRAGMENT_CACHE_TIMEOUT = args.timeout
+    try:
+        call_command('migrate', verbosity=0)
+        seed(args.posts, 100, 10, 0, 0)
+        print(
+            f'{args.threads} threads for {args.seconds} s, '
+            f'feed block fresh for {args.timeout} s'
+        )
+        for title, get_or_build in (
+            ('get-or-set', naive_get_or_build),
+            ('get_or_build', caching.get_or_build),
+        ):
+            cache.clear()
+            with mock.patch.object(caching, 'get_or_build', get_or_build):
+                queries = load(args.threads, args.seconds)
+            report(title, queries, args.seconds)
+    finally:
+        os.remove(db_name)
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""Measure peak memory of a worker handling one image upload.
+
+Every upload is posted to the post creation view in a fresh forked
+process, and the growth of its peak RSS is reported. The bounded
+pipeline streams files to disk, rejects the 100-megapixel PNG by its
+header and decodes JPEG photos at a reduced scale; the unbounded one
+keeps small files in memory, accepts any image and decodes it fully to
+render the thumbnail, like the form did before.
+
+Usage:
+    python benchmarks/bench_upload.py [--repeat 3]
+"""
+
+import argparse
+import multiprocessing
+import os
+import resource
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from statistics import median
+from unittest import mock
+
+from common import setup_django
+
+IMAGES = (
+    ('bomb.png', (10000, 10000), 'PNG'),
+    ('photo.jpg', (6000, 4000), 'JPEG'),
+    ('small.jpg', (1200, 800), 'JPEG'),
+)
+
+UNBOUNDED_SETTINGS = {
+    'FILE_UPLOAD_HANDLERS': [
+        'django.core.files.uploadhandler.MemoryFileUploadHandler',
+        'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+    ],
+    'UPLOAD_MAX_SIZE': 2 ** 40,
+    'IMAGE_MAX_PIXELS': 10 ** 12,
+}
+
+
+def make_image(path: str, size, pil_format: str) -> int:
+    """Write a test image, a flat one for PNG and a noisy one for JPEG."""
+    from PIL import Image
+
+    if pil_format == 'PNG':
+        image = Image.new('RGB', size, 'teal')
+    else:
+        noise = Image.effect_noise(size, 12)
+        image = Image.merge('RGB', (noise, noise.rotate(180), noise))
+    image.save(path, pil_format, quality=85)
+    return os.path.getsize(path)
+
+
+def upload(path: str, username: str, bounded: bool):
+    """Post an image and get the growth of peak RSS in MB and the status."""
+    from django.contrib.auth import get_user_model
+    from django.db import connection
+    from django.test import Client, override_settings
+    from PIL import Image
+
+    from posts import uploads
+
+    connection.close()
+    browser = Client()
+    browser.force_login(get_user_model().objects.get(username=username))
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    with open(path, 'rb') as image:
+        if bounded:
+            response = browser.post('/create/', {'text': 'x', 'image': image})
+        else:
+            with override_settings(**UNBOUNDED_SETTINGS), \
+                    mock.patch.object(uploads, 'sanitize', lambda f: f), \
+                    mock.patch.object(Image, 'MAX_IMAGE_PIXELS', None):
+                response = browser.post(
+                    '/create/', {'text': 'x', 'image': image})
+    after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    accepted = response.status_code == 302
+    return (after - before) / 1024, 'accepted' if accepted else 'rejected'
+
+
+def main() -> None:
+    """Run benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    media_dir = tempfile.mkdtemp()
+    db_name = setup_django()
+    from django.conf import settings
+    from django.contrib.auth import get_user_model
+    from django.core.management import call_command
+
+    settings.MEDIA_ROOT = media_dir
+    settings.THUMBNAIL_WORKERS = 0
+    settings.ALLOWED_HOSTS = ['testserver']
+    context = multiprocessing.get_context('fork')
+    try:
+        call_command('migrate', verbosity=0)
+        get_user_model().objects.create_user(username='uploader')
+        for name, size, pil_format in IMAGES:
+            path = os.path.join(media_dir, name)
+            with ProcessPoolExecutor(1, mp_context=context) as executor:
+                file_size = executor.submit(
+                    make_image, path, size, pil_format).result()
+            print(f'{name}: {size[0]}x{size[1]}, '
+                  f'{file_size / 2 ** 20:.1f} MB file')
+            for bounded in (False, True):
+                results = []
+                for _ in range(args.repeat):
+                    with ProcessPoolExecutor(1, mp_context=context) as pool:
+                        results.append(pool.submit(
+                            upload, path, 'uploader', bounded).result())
+                title = 'bounded' if bounded else 'unbounded'
+                print(f'{title:>12}: peak RSS +'
+                      f'{median(rss for rss, _ in results):7.1f} MB, '
+                      f'{results[0][1]}')
+    finally:
+        os.remove(db_name)
+        shutil.rmtree(media_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+"""Measure bursts of comments and subscriptions with and without write-behind.
+
+Every worker process plays a server worker with a logged-in user who
+comments a few hot posts and, with the given share of requests, follows
+or unfollows a random author, all through the WSGI application
+in-process. The burst runs once with writes made by the requests and
+once with WRITE_BEHIND, with this process running the flusher that saves
+the queue. Reports accepted requests per second, failed requests and
+latencies, and sustained throughput: writes saved to the database per
+second until the queue has been drained.
+
+Usage:
+    python benchmarks/bench_writes.py [--workers 8] [--seconds 10]
+        [--hot-posts 3] [--follow-share 0.2] [--db PATH]
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import tempfile
+import threading
+import time
+from statistics import quantiles
+from typing import Dict, List, Tuple
+
+from common import WSGIClient, seed, setup_django
+
+
+def worker(args: Tuple) -> Dict[str, List]:
+    """Send writes until the deadline in a forked process.
+
+    Args:
+        args: worker number, deadline, share of subscriptions, whether
+            writes are queued and sampled arguments.
+
+    Returns:
+        latencies in ms of accepted requests and amount of failed ones.
+    """
+    number, deadline, follow_share, write_behind, sample = args
+    from django.conf import settings
+    from django.contrib.auth import get_user_model
+
+    settings.WRITE_BEHIND = write_behind
+    settings.WRITE_BEHIND_FLUSHER = False
+    rng = random.Random(number)
+    user = get_user_model().objects.get(username=sample['usernames'][number])
+    client = WSGIClient(user)
+    results = {'timings': [], 'errors': 0}
+    while time.time() < deadline:
+        started = time.perf_counter()
+        if rng.random() < follow_share:
+            action = rng.choice(('follow', 'unfollow'))
+            response = client.get(
+                f'/profile/{rng.choice(sample["usernames"])}/{action}/')
+        else:
+            response = client.post(
+                f'/posts/{rng.choice(sample["post_ids"])}/comment',
+                {'text': f'Комментарий {rng.random()}'})
+        elapsed = (time.perf_counter() - started) * 1000
+        if response.status >= 500:
+            results['errors'] += 1
+        else:
+            results['timings'].append(elapsed)
+    return results
+
+
+def percentiles(timings: List[float]) -> str:
+    """Format p50, p95 and p99 of latencies."""
+    if len(timings) < 2:
+        return 'no requests'
+    cuts = quantiles(timings, n=100, method='inclusive')
+    return (f'p50 {cuts[49]:7.1f}  p95 {cuts[94]:7.1f}  '
+            f'p99 {cuts[98]:7.1f} ms')
+
+
+def main() -> None:
+    """Run the burst with writes made by requests and queued."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--hot-posts', type=int, default=3)
+    parser.add_argument('--follow-share', type=float, default=0.2)
+    parser.add_argument('--posts', type=int, default=1000)
+    parser.add_argument('--db', help='database file, temporary by default; '
+                                     'an already seeded one is reused')
+    args = parser.parse_args()
+
+    os.environ.setdefault('YATUBE_CACHE', 'locmem')
+    queue_dir = tempfile.mkdtemp()
+    db_name = setup_django(args.db)
+    from django.conf import settings
+    from django.contrib.auth import get_user_model
+    from django.core.management import call_command
+    from django.db import connections
+
+    from posts import writes
+    from posts.models import Comment, Follow, Post
+
+    settings.WRITE_BEHIND_QUEUE = os.path.join(queue_dir, 'writes.sqlite3')
+    try:
+        call_command('migrate', verbosity=0)
+        if not Post.objects.exists():
+            seed(args.posts, max(args.workers, args.posts // 10), 20,
+                 args.posts, args.posts)
+        sample = {
+            'usernames': list(get_user_model().objects.order_by(
+                'pk').values_list('username', flat=True)[:args.workers]),
+            'post_ids': list(Post.objects.order_by('?').values_list(
+                'pk', flat=True)[:args.hot_posts]),
+        }
+        print(f'{args.workers} workers, {args.hot_posts} hot posts, '
+              f'{args.follow_share:.0%} subscriptions, '
+              f'{args.seconds:g} s per mode')
+        for write_behind in (False, True):
+            saved_before = Comment.objects.count() + Follow.objects.count()
+            connections.close_all()
+            deadline = time.time() + args.seconds
+            tasks = [
+                (number, deadline, args.follow_share, write_behind, sample)
+                for number in range(args.workers)
+            ]
+            started = time.perf_counter()
+            context = multiprocessing.get_context('fork')
+            with context.Pool(args.workers) as pool:
+                burst = pool.map_async(worker, tasks)
+                stop = threading.Event()
+                flusher = threading.Thread(
+                    target=writes.run_flusher, args=(stop,))
+                if write_behind:
+                    flusher.start()
+                results = burst.get()
+            if write_behind:
+                while len(writes.get_queue()):
+                    time.sleep(0.01)
+                stop.set()
+                flusher.join()
+            drained = time.perf_counter() - started
+            timings = [ms for result in results for ms in result['timings']]
+            errors = sum(result['errors'] for result in results)
+            saved = (Comment.objects.count() + Follow.objects.count()
+                     - saved_before)
+            title = 'write-behind' if write_behind else 'writes in requests'
+            print(f'\n--- {title}: '
+                  f'{len(timings) / args.seconds:.0f} req/s accepted, '
+                  f'{errors} failed')
+            print(f'  latency  {percentiles(timings)}')
+            print(f'  drained in {drained:.1f} s, '
+                  f'net rows saved {saved}, '
+                  f'{len(timings) / drained:.0f} writes/s sustained')
+    finally:
+        if args.db is None and db_name is not None:
+            os.remove(db_name)
+            for suffix in ('-wal', '-shm'):
+                if os.path.exists(db_name + suffix):
+                    os.remove(db_name + suffix)
+        for name in os.listdir(queue_dir):
+            os.remove(os.path.join(queue_dir, name))
+        os.rmdir(queue_dir)
+
+
+if __name__ == '__main__':
+    main()
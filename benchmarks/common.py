@@ -0,0 +1,184 @@
+"""Shared helpers for YaTube benchmarks.
+
+Benchmarks are plain scripts run from the repository root, e.g.
+`python benchmarks/bench_indexes.py`. Each of them works on its own
+throwaway SQLite database and never touches `db.sqlite3`.
+"""
+
+import io
+import os
+import re
+import sys
+import tempfile
+import time
+from statistics import median
+from typing import Callable, Dict, List, NamedTuple
+from urllib.parse import urlencode
+from wsgiref.util import setup_testing_defaults
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROJECT_DIR = os.path.join(ROOT_DIR, 'yatube')
+
+CSRF_TOKEN = 'x' * 64
+
+SERVER_TIMING_QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+def vocabulary(size: int = 20000, seed_value: int = 0) -> List[str]:
+    """Get words of seeded texts, the most frequent ones first."""
+    from posts.synthetic import vocabulary as synthetic_vocabulary
+
+    return synthetic_vocabulary(size, seed_value)
+
+
+def setup_django(db_name: str = None) -> str:
+    """Configure Django to use a separate SQLite database.
+
+    With YATUBE_DATABASE=postgresql the configured database is used as is.
+
+    Args:
+        db_name: path to the database file, a temporary one by default.
+
+    Returns:
+        path to the database file, None for PostgreSQL.
+    """
+    if PROJECT_DIR not in sys.path:
+        sys.path.insert(0, PROJECT_DIR)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+    import django
+    from django.conf import settings
+
+    if settings.DATABASE != 'sqlite':
+        db_name = None
+    else:
+        if db_name is None:
+            handle, db_name = tempfile.mkstemp(suffix='.sqlite3')
+            os.close(handle)
+        settings.DATABASES['default']['NAME'] = db_name
+    settings.DEBUG = False
+    django.setup()
+    return db_name
+
+
+def seed(
+    posts: int, users: int, groups: int, comments: int, follows: int,
+    seed_value: int = 0,
+) -> None:
+    """Fill the database with synthetic data with `seed_yatube`.
+
+    Args:
+        posts: amount of posts;
+        users: amount of users;
+        groups: amount of groups;
+        comments: amount of comments;
+        follows: amount of subscriptions tried, repeated ones are skipped;
+        seed_value: seed of the random generator.
+    """
+    from django.core.management import call_command
+
+    call_command(
+        'seed_yatube', posts=posts, users=users, groups=groups,
+        comments=comments, follows=follows, seed=seed_value,
+        stdout=io.StringIO(),
+    )
+
+
+def timeit(func: Callable[[], object], repeat: int = 5) -> float:
+    """Get median wall time of a call in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return median(timings)
+
+
+class Response(NamedTuple):
+    """Response of the WSGI application."""
+
+    status: int
+    headers: Dict[str, str]
+    body: bytes
+
+    @property
+    def queries(self) -> int:
+        """Get amount of SQL queries from the Server-Timing header."""
+        match = SERVER_TIMING_QUERIES.search(
+            self.headers.get('Server-Timing', ''))
+        return int(match.group(1)) if match else 0
+
+
+class WSGIClient:
+    """Client calling the WSGI application of the project in-process.
+
+    Requests go through the same middleware, URL resolver and views as
+    under a real server, without a socket in between.
+    """
+
+    def __init__(self, user=None) -> None:
+        """Create client.
+
+        Args:
+            user: user to log in as, anonymous by default.
+        """
+        from yatube.wsgi import application
+
+        self.application = application
+        self.cookies = {'csrftoken': CSRF_TOKEN}
+        if user is not None:
+            self.login(user)
+
+    def login(self, user) -> None:
+        """Start an authenticated session of a user."""
+        from importlib import import_module
+
+        from django.conf import settings
+        from django.contrib.auth import (BACKEND_SESSION_KEY,
+                                         HASH_SESSION_KEY, SESSION_KEY)
+
+        session = import_module(settings.SESSION_ENGINE).SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.save()
+        self.cookies[settings.SESSION_COOKIE_NAME] = session.session_key
+
+    def request(self, method: str, path: str, data: dict = None) -> Response:
+        """Make a request, POST data is sent as a form with a CSRF token."""
+        path, _, query = path.partition('?')
+        environ = {
+            'REQUEST_METHOD': method,
+            'PATH_INFO': path,
+            'QUERY_STRING': query,
+            'HTTP_COOKIE': '; '.join(
+                f'{name}={value}' for name, value in self.cookies.items()),
+        }
+        if data is not None:
+            body = urlencode({**data, 'csrfmiddlewaretoken': CSRF_TOKEN})
+            environ.update({
+                'CONTENT_TYPE': 'application/x-www-form-urlencoded',
+                'CONTENT_LENGTH': str(len(body)),
+                'wsgi.input': io.BytesIO(body.encode()),
+            })
+        setup_testing_defaults(environ)
+        started = {}
+
+        def start_response(status, headers):
+            started['status'] = int(status.split()[0])
+            started['headers'] = dict(headers)
+
+        result = self.application(environ, start_response)
+        try:
+            body = b''.join(result)
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        return Response(started['status'], started['headers'], body)
+
+    def get(self, path: str) -> Response:
+        """Make a GET request."""
+        return self.request('GET', path)
+
+    def post(self, path: str, data: dict) -> Response:
+        """Make a POST request."""
+        return self.request('POST', path, data)
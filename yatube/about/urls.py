@@ -2,7 +2,7 @@
 
 from django.urls import path
 
-from yatube.about import views
+from about import views
 
 app_name = 'about'
 
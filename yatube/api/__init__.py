@@ -0,0 +1 @@
+"""JSON API app."""
@@ -0,0 +1,13 @@
+"""Module with forms of API app."""
+
+from django import forms
+
+from posts.forms import PostForm
+from posts.models import Group
+
+
+class ApiPostForm(PostForm):
+    """Post form taking the group by its slug, as the API shows it."""
+
+    group = forms.ModelChoiceField(
+        Group.objects.all(), required=False, to_field_name='slug')
@@ -0,0 +1,150 @@
+"""Module with serialization of models through `.values()`.
+
+Lists are serialized from the dicts `.values()` returns, so no model
+instance is built for a row: the queryset selects only the columns of the
+requested fields, joins only the tables they need, and every row is
+turned into a response dict by a single comprehension. Related objects
+are represented by their public keys, usernames of authors and slugs of
+groups, and files by their urls. The `following` field of profiles needs
+the `is_following` annotation.
+"""
+
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional
+
+from django.db.models.query import QuerySet
+
+from core.storage import content_storage
+
+
+class InvalidFields(ValueError):
+    """Requested fields that a resource does not have."""
+
+
+class Field(NamedTuple):
+    """Public field of a resource."""
+
+    lookup: str
+    convert: Optional[Callable[[Any], Any]] = None
+
+
+def file_url(name: str) -> Optional[str]:
+    """Get url of a stored file, None for an empty file field."""
+    return content_storage.url(name) if name else None
+
+
+class Resource:
+    """Public representation of a model listed with `.values()`."""
+
+    def __init__(
+        self, fields: Dict[str, Field], date_field: Optional[str] = None,
+    ) -> None:
+        """Create resource.
+
+        Args:
+            fields: public fields by name, in the order of the output;
+            date_field: datetime field lists are paginated by, it is
+                always selected along with `pk` for cursors.
+        """
+        self.fields = fields
+        self.date_field = date_field
+
+    def select(self, names: Optional[str]) -> List[str]:
+        """Parse field selection of a request.
+
+        Args:
+            names: comma-separated field names, all fields if empty.
+
+        Returns:
+            names of the selected fields.
+
+        Raises:
+            InvalidFields: if some of the names are not fields.
+        """
+        selected = list(dict.fromkeys(
+            name.strip() for name in (names or '').split(',') if name.strip()))
+        if not selected:
+            return list(self.fields)
+        unknown = [name for name in selected if name not in self.fields]
+        if unknown:
+            raise InvalidFields(
+                f'Unknown fields: {", ".join(unknown)}. '
+                f'Available: {", ".join(self.fields)}.')
+        return selected
+
+    def values(self, queryset: QuerySet, names: Iterable[str]) -> QuerySet:
+        """Get rows of the selected fields.
+
+        Args:
+            queryset: objects of the resource;
+            names: names of the selected fields.
+
+        Returns:
+            queryset of dicts keyed by lookups.
+        """
+        lookups = dict.fromkeys(self.fields[name].lookup for name in names)
+        lookups['pk'] = None
+        if self.date_field:
+            lookups[self.date_field] = None
+        return queryset.values(*lookups)
+
+    def serialize(
+        self, rows: Iterable[Dict[str, Any]], names: Iterable[str],
+    ) -> List[Dict[str, Any]]:
+        """Turn rows of `values` into response dicts.
+
+        Args:
+            rows: dicts keyed by lookups;
+            names: names of the selected fields.
+
+        Returns:
+            dicts keyed by field names.
+        """
+        fields = [
+            (name, self.fields[name].lookup, self.fields[name].convert)
+            for name in names
+        ]
+        return [
+            {
+                name: row[lookup] if convert is None else convert(row[lookup])
+                for name, lookup, convert in fields
+            }
+            for row in rows
+        ]
+
+
+POSTS = Resource({
+    'id': Field('pk'),
+    'text': Field('text'),
+    'pub_date': Field('pub_date'),
+    'author': Field('author__username'),
+    'group': Field('group__slug'),
+    'image': Field('image', file_url),
+    'thumbnail': Field('thumbnail', file_url),
+    'comments_count': Field('comments_count'),
+}, date_field='pub_date')
+
+COMMENTS = Resource({
+    'id': Field('pk'),
+    'post': Field('post_id'),
+    'author': Field('author__username'),
+    'text': Field('text'),
+    'created': Field('created'),
+}, date_field='created')
+
+GROUPS = Resource({
+    'id': Field('pk'),
+    'title': Field('title'),
+    'slug': Field('slug'),
+    'description': Field('description'),
+})
+
+PROFILES = Resource({
+    'id': Field('pk'),
+    'username': Field('username'),
+    'first_name': Field('first_name'),
+    'last_name': Field('last_name'),
+    'posts_count': Field('stats__posts_count'),
+    'followers_count': Field('stats__followers_count'),
+    'following_count': Field('stats__following_count'),
+    'following': Field('is_following'),
+})
@@ -0,0 +1,35 @@
+from datetime import datetime, timezone
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from api import encoding
+from api.serializers import POSTS, InvalidFields
+
+
+class SerializersTest(SimpleTestCase):
+    def test_fields_are_selected_in_order(self):
+        """Поля выбираются в заданном порядке без повторов"""
+        self.assertEqual(POSTS.select(None), list(POSTS.fields))
+        self.assertEqual(POSTS.select(' text, id,text,'), ['text', 'id'])
+        with self.assertRaises(InvalidFields):
+            POSTS.select('id,author__password')
+
+    def test_rows_are_serialized(self):
+        """Строки values превращаются в словари с публичными именами"""
+        rows = [{'pk': 1, 'author__username': 'author', 'image': '',
+                 'pub_date': None}]
+        self.assertEqual(
+            POSTS.serialize(rows, ['id', 'author', 'image']),
+            [{'id': 1, 'author': 'author', 'image': None}])
+
+    def test_encoders_agree(self):
+        """orjson и стандартный json дают одинаковые данные"""
+        data = {'text': 'Текст', 'date': datetime(
+            2021, 1, 2, 3, 4, 5, tzinfo=timezone.utc), 'list': [1, None]}
+        fast = encoding.dumps(data)
+        with mock.patch.object(encoding, 'orjson', None):
+            slow = encoding.dumps(data)
+            self.assertEqual(encoding.loads(slow), encoding.loads(fast))
+        self.assertIn('Текст'.encode(), fast)
+        self.assertEqual(encoding.loads(fast)['date'], '2021-01-02T03:04:05Z')
@@ -0,0 +1,199 @@
+import json
+import os
+import tempfile
+
+from django.core.cache import caches
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import writes
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class ApiViewsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост {number}')
+            for number in range(5)
+        ]
+        cls.post = cls.posts[-1]
+
+    def setUp(self):
+        caches['shared'].clear()
+        caches['default'].clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def send(self, client, method, url, data):
+        return getattr(client, method)(
+            url, json.dumps(data), content_type='application/json')
+
+    def test_posts_are_listed_with_cursors(self):
+        """Посты отдаются страницами с курсорами, от новых к старым"""
+        url = reverse('api:posts')
+        response = self.client.get(url, {'limit': 2})
+        self.assertEqual(response['Content-Type'], 'application/json')
+        data = response.json()
+        self.assertEqual(
+            [post['id'] for post in data['results']],
+            [self.posts[4].pk, self.posts[3].pk])
+        self.assertIsNone(data['previous'])
+        self.assertEqual(data['results'][0], {
+            'id': self.post.pk,
+            'text': 'Пост 4',
+            'pub_date': data['results'][0]['pub_date'],
+            'author': 'author',
+            'group': 'group',
+            'image': None,
+            'thumbnail': None,
+            'comments_count': 0,
+        })
+        data = self.client.get(data['next']).json()
+        self.assertEqual(
+            [post['id'] for post in data['results']],
+            [self.posts[2].pk, self.posts[1].pk])
+        data = self.client.get(data['previous']).json()
+        self.assertEqual(data['results'][0]['id'], self.posts[4].pk)
+
+    def test_fields_are_selected(self):
+        """Параметр fields выбирает поля, неизвестные поля дают 400"""
+        response = self.client.get(
+            reverse('api:posts'), {'fields': 'id,text'})
+        self.assertEqual(
+            response.json()['results'][0],
+            {'id': self.post.pk, 'text': 'Пост 4'})
+        response = self.client.get(
+            reverse('api:posts'), {'fields': 'id,password'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('password', response.json()['detail'])
+
+    def test_list_queries(self):
+        """Страница постов группы не строит объекты по строкам"""
+        url = reverse('api:group_posts', kwargs={'slug': self.group.slug})
+        self.client.get(url)
+        with self.assertNumQueries(3):
+            response = self.client.get(url, {'limit': 100})
+        self.assertEqual(len(response.json()['results']), 5)
+
+    def test_unchanged_list_is_not_queried(self):
+        """Неизменный список отвечает 304"""
+        url = reverse('api:posts')
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_post_is_created(self):
+        """Пост создается из JSON, группа задается по slug"""
+        response = self.send(self.reader_client, 'post', reverse('api:posts'),
+                             {'text': 'Новый пост', 'group': 'group'})
+        self.assertEqual(response.status_code, 201)
+        post = Post.objects.get(pk=response.json()['id'])
+        self.assertEqual(
+            (post.author, post.group, post.text),
+            (self.reader, self.group, 'Новый пост'))
+
+    def test_invalid_requests(self):
+        """Ошибки отдаются в JSON с подходящим статусом"""
+        url = reverse('api:posts')
+        cases = (
+            (self.client.post(url, {'text': 'Текст'}), 401),
+            (self.send(self.reader_client, 'post', url, {'text': ''}), 400),
+            (self.reader_client.post(
+                url, '[', content_type='application/json'), 400),
+            (self.reader_client.delete(url), 405),
+            (self.client.get(url, {'limit': 1000}), 400),
+            (self.client.get(
+                reverse('api:post_detail', kwargs={'post_id': 0})), 404),
+            (self.send(self.reader_client, 'patch', reverse(
+                'api:post_detail', kwargs={'post_id': self.post.pk}),
+                {'text': 'Чужой'}), 403),
+        )
+        for response, status in cases:
+            with self.subTest(status=status):
+                self.assertEqual(response.status_code, status)
+                self.assertIn('detail', response.json())
+
+    def test_post_is_edited_by_author(self):
+        """Автор меняет текст поста, группа сохраняется"""
+        url = reverse('api:post_detail', kwargs={'post_id': self.post.pk})
+        response = self.send(
+            self.author_client, 'patch', url, {'text': 'Новый текст'})
+        self.assertEqual(response.json()['text'], 'Новый текст')
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertEqual((post.text, post.group), ('Новый текст', self.group))
+
+    def test_comments(self):
+        """Комментарии создаются и отдаются от новых к старым"""
+        url = reverse('api:comments', kwargs={'post_id': self.post.pk})
+        for text in ('Первый', 'Второй'):
+            response = self.send(
+                self.reader_client, 'post', url, {'text': text})
+            self.assertEqual(response.status_code, 201)
+        data = self.client.get(url).json()
+        self.assertEqual(
+            [(comment['author'], comment['text'])
+             for comment in data['results']],
+            [('reader', 'Второй'), ('reader', 'Первый')])
+        self.assertEqual(Comment.objects.count(), 2)
+        response = self.client.get(
+            reverse('api:comments', kwargs={'post_id': 0}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_comment_is_queued_with_write_behind(self):
+        """С отложенной записью комментарий ставится в очередь"""
+        url = reverse('api:comments', kwargs={'post_id': self.post.pk})
+        with tempfile.TemporaryDirectory() as directory, override_settings(
+                WRITE_BEHIND=True, WRITE_BEHIND_FLUSHER=False,
+                WRITE_BEHIND_QUEUE=os.path.join(directory, 'writes.sqlite3')):
+            response = self.send(
+                self.reader_client, 'post', url, {'text': 'В очереди'})
+            self.assertEqual(response.status_code, 202)
+            self.assertEqual(
+                (response.json()['id'], response.json()['text']),
+                (None, 'В очереди'))
+            self.assertFalse(Comment.objects.exists())
+            writes.flush()
+        self.assertEqual(
+            list(Comment.objects.values_list('text', 'author')),
+            [('В очереди', self.reader.pk)])
+
+    def test_follow(self):
+        """Подписка и отписка через API меняют ленту и профиль"""
+        url = reverse('api:follow', kwargs={'username': 'author'})
+        profile_url = reverse('api:profile', kwargs={'username': 'author'})
+        self.assertEqual(self.reader_client.post(url).status_code, 204)
+        self.assertTrue(Follow.objects.filter(
+            user=self.reader, author=self.author).exists())
+        profile = self.reader_client.get(profile_url).json()
+        self.assertEqual(
+            (profile['following'], profile['followers_count']), (True, 1))
+        feed = self.reader_client.get(reverse('api:follow_feed')).json()
+        self.assertEqual(len(feed['results']), 5)
+        self.assertEqual(self.reader_client.delete(url).status_code, 204)
+        self.assertFalse(Follow.objects.exists())
+        self.assertFalse(
+            self.reader_client.get(profile_url).json()['following'])
+        self.assertEqual(self.author_client.post(url).status_code, 400)
+        self.assertEqual(
+            self.client.get(reverse('api:follow_feed')).status_code, 401)
+
+    def test_groups(self):
+        """Группы отдаются списком и по slug"""
+        data = self.client.get(reverse('api:groups')).json()
+        self.assertEqual(data['results'], [{
+            'id': self.group.pk, 'title': 'Группа', 'slug': 'group',
+            'description': 'Описание',
+        }])
+        response = self.client.get(
+            reverse('api:group_detail', kwargs={'slug': 'group'}),
+            {'fields': 'title'})
+        self.assertEqual(response.json(), {'title': 'Группа'})
@@ -0,0 +1,332 @@
+"""Module with views of JSON API.
+
+Endpoints list the same querysets as the pages of `posts.views`, save
+objects with the same forms and helpers and answer conditional GET
+requests with the same validators. Lists are serialized through
+`.values()` and paginated with cursors only, `?fields=` selects the fields
+of the objects and `?limit=` the size of the page. Requests are
+authenticated with the session and CSRF-protected like the site, so
+writes need the `csrftoken` cookie echoed in the X-CSRFToken header.
+"""
+
+from functools import wraps
+from typing import Callable, Dict, List, Mapping, Optional
+
+from django.conf import settings
+from django.db.models import Exists, OuterRef
+from django.db.models.query import QuerySet
+from django.http import Http404, HttpRequest, HttpResponse
+from django.shortcuts import get_object_or_404
+
+from core.metrics import query_budget
+from posts import timeline, writes
+from posts.conditional import (conditional_page, group_feeds, index_feeds,
+                               post_feeds, profile_feeds)
+from posts.forms import CommentForm
+from posts.models import Follow, Group, Post, User
+from posts.paginators import CursorPaginator
+from posts.views import (follow_author, save_comment, save_post,
+                         unfollow_author)
+
+from .encoding import CONTENT_TYPE, JSONResponse, loads
+from .forms import ApiPostForm
+from .serializers import (COMMENTS, GROUPS, POSTS, PROFILES, InvalidFields,
+                          Resource)
+
+SAFE_METHODS = ('GET', 'HEAD')
+
+
+class ApiError(Exception):
+    """Error answered with its status and a JSON description."""
+
+    def __init__(self, status: int, detail) -> None:
+        """Create error.
+
+        Args:
+            status: HTTP status of the response;
+            detail: message or data describing the error.
+        """
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+
+
+def error_response(status: int, detail) -> JSONResponse:
+    """Get response describing an error."""
+    return JSONResponse({'detail': detail}, status=status)
+
+
+def api_view(*methods: str) -> Callable:
+    """Make a view an API endpoint.
+
+    Requests with other methods get 405, unauthenticated writes get 401,
+    and errors are answered with JSON instead of error pages.
+
+    Args:
+        methods: allowed HTTP methods, GET allows HEAD too.
+
+    Returns:
+        view decorator.
+    """
+    allowed = set(methods) | ({'HEAD'} if 'GET' in methods else set())
+
+    def decorator(view: Callable) -> Callable:
+        @wraps(view)
+        def endpoint(request: HttpRequest, *args, **kwargs) -> HttpResponse:
+            if request.method not in allowed:
+                response = error_response(
+                    405, f'Method {request.method} is not allowed.')
+                response['Allow'] = ', '.join(sorted(allowed))
+                return response
+            try:
+                if (request.method not in SAFE_METHODS
+                        and not request.user.is_authenticated):
+                    raise ApiError(401, 'Authentication is required.')
+                return view(request, *args, **kwargs)
+            except Http404:
+                return error_response(404, 'Not found.')
+            except InvalidFields as exc:
+                return error_response(400, str(exc))
+            except ApiError as exc:
+                return error_response(exc.status, exc.detail)
+        return endpoint
+    return decorator
+
+
+def payload(request: HttpRequest) -> Mapping:
+    """Get data of a write request, sent as JSON or as a form.
+
+    Raises:
+        ApiError: if the body is not a JSON object.
+    """
+    if request.content_type == CONTENT_TYPE:
+        try:
+            data = loads(request.body)
+        except ValueError:
+            raise ApiError(400, 'Malformed JSON.')
+        if not isinstance(data, dict):
+            raise ApiError(400, 'JSON object expected.')
+        return data
+    if request.method == 'POST':
+        return request.POST
+    raise ApiError(415, f'Content type {CONTENT_TYPE} expected.')
+
+
+def page_size(request: HttpRequest) -> int:
+    """Get size of the page requested with `limit`.
+
+    Raises:
+        ApiError: if the limit is not a number from 1 to API_MAX_PAGE_SIZE.
+    """
+    limit = request.GET.get('limit')
+    if not limit:
+        return settings.API_PAGE_SIZE
+    if not limit.isdigit() or not 0 < int(limit) <= settings.API_MAX_PAGE_SIZE:
+        raise ApiError(
+            400, f'Limit must be from 1 to {settings.API_MAX_PAGE_SIZE}.')
+    return int(limit)
+
+
+def page_url(request: HttpRequest, cursor: Optional[str]) -> Optional[str]:
+    """Get url of the page starting at a cursor, None without cursor."""
+    if cursor is None:
+        return None
+    query = request.GET.copy()
+    query['cursor'] = cursor
+    return request.build_absolute_uri(f'{request.path}?{query.urlencode()}')
+
+
+def paginated(
+    request: HttpRequest, resource: Resource, queryset: QuerySet,
+) -> JSONResponse:
+    """Get response with a page of objects and urls of adjacent pages.
+
+    Args:
+        request: the current request;
+        resource: representation of the objects;
+        queryset: objects to paginate, newest first.
+    """
+    names = resource.select(request.GET.get('fields'))
+    paginator = CursorPaginator(
+        resource.values(queryset, names), page_size(request),
+        resource.date_field)
+    page_obj = paginator.get_page(request.GET.get('cursor'))
+    return JSONResponse({
+        'next': page_url(request, page_obj.next_cursor),
+        'previous': page_url(request, page_obj.previous_cursor),
+        'results': resource.serialize(page_obj, names),
+    })
+
+
+def serialized(
+    resource: Resource, queryset: QuerySet, names: List[str],
+) -> Dict:
+    """Get representation of the only object of a queryset.
+
+    Raises:
+        Http404: if there is no such object.
+    """
+    rows = resource.serialize(resource.values(queryset, names)[:1], names)
+    if not rows:
+        raise Http404
+    return rows[0]
+
+
+def form_errors(form) -> ApiError:
+    """Get error with the validation errors of a form."""
+    return ApiError(400, {
+        field: [error['message'] for error in errors]
+        for field, errors in form.errors.get_json_data().items()
+    })
+
+
+@query_budget(13)
+@api_view('GET', 'POST')
+@conditional_page(index_feeds)
+def posts(request: HttpRequest) -> JSONResponse:
+    """List posts of the main page or create a post."""
+    if request.method == 'POST':
+        form = ApiPostForm(payload(request), files=request.FILES or None)
+        if not form.is_valid():
+            raise form_errors(form)
+        post = save_post(form, request.user)
+        return JSONResponse(serialized(
+            POSTS, Post.objects.filter(pk=post.pk),
+            POSTS.select(request.GET.get('fields'))), status=201)
+    return paginated(request, POSTS, Post.objects.for_feed())
+
+
+@query_budget(10)
+@api_view('GET', 'PATCH')
+@conditional_page(post_feeds)
+def post_detail(request: HttpRequest, post_id: int) -> JSONResponse:
+    """Get a post or change its text and group."""
+    names = POSTS.select(request.GET.get('fields'))
+    if request.method == 'PATCH':
+        post = get_object_or_404(
+            Post.objects.select_related('group'), pk=post_id)
+        if post.author_id != request.user.pk:
+            raise ApiError(403, 'Only the author can edit the post.')
+        data = {
+            'text': post.text,
+            'group': post.group.slug if post.group else '',
+            **payload(request),
+        }
+        form = ApiPostForm(data, instance=post)
+        if not form.is_valid():
+            raise form_errors(form)
+        form.save()
+    return JSONResponse(serialized(
+        POSTS, Post.objects.filter(pk=post_id), names))
+
+
+@query_budget(12)
+@api_view('GET', 'POST')
+@conditional_page(post_feeds)
+def comments(request: HttpRequest, post_id: int) -> JSONResponse:
+    """List comments of a post, newest first, or comment it.
+
+    With WRITE_BEHIND a new comment is queued and answered with 202 and
+    no id yet.
+    """
+    if request.method == 'POST':
+        post = get_object_or_404(Post, pk=post_id)
+        form = CommentForm(payload(request))
+        if not form.is_valid():
+            raise form_errors(form)
+        names = COMMENTS.select(request.GET.get('fields'))
+        if settings.WRITE_BEHIND:
+            comment = writes.submit_comment(
+                request.user, post, form.cleaned_data['text'])
+            return JSONResponse(COMMENTS.serialize([{
+                'pk': None, 'post_id': post.pk,
+                'author__username': request.user.username,
+                'text': comment.text, 'created': comment.created,
+            }], names)[0], status=202)
+        comment = save_comment(form, request.user, post)
+        return JSONResponse(serialized(
+            COMMENTS, post.comments.filter(pk=comment.pk), names),
+            status=201)
+    if not Post.objects.filter(pk=post_id).exists():
+        raise Http404
+    return paginated(request, COMMENTS, Post(pk=post_id).comments.all())
+
+
+@query_budget(1)
+@api_view('GET')
+def groups(request: HttpRequest) -> JSONResponse:
+    """List all groups by title.
+
+    Groups are few and clients pick from all of them, like the post form
+    does, so the list is not paginated.
+    """
+    names = GROUPS.select(request.GET.get('fields'))
+    return JSONResponse({'results': GROUPS.serialize(
+        GROUPS.values(Group.objects.order_by('title'), names), names)})
+
+
+@query_budget(2)
+@api_view('GET')
+@conditional_page(group_feeds)
+def group_detail(request: HttpRequest, slug: str) -> JSONResponse:
+    """Get a group."""
+    return JSONResponse(serialized(
+        GROUPS, Group.objects.filter(slug=slug),
+        GROUPS.select(request.GET.get('fields'))))
+
+
+@query_budget(3)
+@api_view('GET')
+@conditional_page(group_feeds)
+def group_posts(request: HttpRequest, slug: str) -> JSONResponse:
+    """List posts of a group."""
+    group = get_object_or_404(Group.objects.only('pk'), slug=slug)
+    return paginated(request, POSTS, group.posts.for_feed())
+
+
+@query_budget(4)
+@api_view('GET')
+@conditional_page(profile_feeds)
+def profile(request: HttpRequest, username: str) -> JSONResponse:
+    """Get a profile with counters and subscription of the current user."""
+    names = PROFILES.select(request.GET.get('fields'))
+    users = User.objects.filter(username=username)
+    if 'following' in names:
+        users = users.annotate(is_following=Exists(Follow.objects.filter(
+            user=request.user.pk, author=OuterRef('pk'))))
+    return JSONResponse(serialized(PROFILES, users, names))
+
+
+@query_budget(4)
+@api_view('GET')
+@conditional_page(profile_feeds)
+def profile_posts(request: HttpRequest, username: str) -> JSONResponse:
+    """List posts of an author."""
+    author = get_object_or_404(User.objects.only('pk'), username=username)
+    return paginated(request, POSTS, author.posts.for_feed())
+
+
+@query_budget(10)
+@api_view('POST', 'DELETE')
+def follow(request: HttpRequest, username: str) -> HttpResponse:
+    """Follow an author with POST or unfollow with DELETE.
+
+    Both are idempotent and answer with 204 No Content.
+    """
+    author = get_object_or_404(User, username=username)
+    if request.method == 'DELETE':
+        unfollow_author(request.user, author)
+    elif author == request.user:
+        raise ApiError(400, 'Users cannot follow themselves.')
+    else:
+        follow_author(request.user, author)
+    return HttpResponse(status=204)
+
+
+@query_budget(5)
+@api_view('GET')
+def follow_feed(request: HttpRequest) -> JSONResponse:
+    """List posts of the authors the current user follows."""
+    if not request.user.is_authenticated:
+        raise ApiError(401, 'Authentication is required.')
+    return paginated(request, POSTS, timeline.feed(request.user))
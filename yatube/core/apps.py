@@ -5,3 +5,7 @@ class CoreConfig(AppConfig):
     """Configuration class for Core app."""
     
     name = 'core'
+
+    def ready(self) -> None:
+        """Connect signal handlers."""
+        from . import database  # noqa: F401
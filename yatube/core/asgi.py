@@ -0,0 +1,158 @@
+"""Module with ASGI adapter of the WSGI application.
+
+Django 2.2 handles requests only through WSGI. `ASGIHandler` lets an ASGI
+server, like uvicorn, run it: the event loop receives requests and sends
+responses of any amount of connections, while the application runs in a
+pool of threads, so a request waiting for the database blocks its thread
+only. Request bodies over FILE_UPLOAD_MAX_MEMORY_SIZE are spooled to a
+temporary file, and responses are sent chunk by chunk, so files of
+`core.wsgi.FileServer` are never read into memory whole.
+"""
+
+import asyncio
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Tuple
+
+from django.conf import settings
+
+
+class ASGIHandler:
+    """ASGI application running a WSGI application in threads."""
+
+    def __init__(self, application: Callable, threads: int) -> None:
+        """Create handler.
+
+        Args:
+            application: WSGI application;
+            threads: amount of requests handled at once.
+        """
+        self.application = application
+        self.executor = ThreadPoolExecutor(
+            max_workers=threads, thread_name_prefix='asgi')
+
+    async def __call__(self, scope: dict, receive: Callable,
+                       send: Callable) -> None:
+        """Handle an ASGI connection."""
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self.http(scope, receive, send)
+        else:
+            raise ValueError(f'Unsupported ASGI scope type {scope["type"]}.')
+
+    async def lifespan(self, receive: Callable, send: Callable) -> None:
+        """Acknowledge startup and shutdown of the server."""
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def http(self, scope: dict, receive: Callable,
+                   send: Callable) -> None:
+        """Handle an HTTP request."""
+        body = tempfile.SpooledTemporaryFile(
+            max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE)
+        try:
+            while True:
+                message = await receive()
+                if message['type'] == 'http.disconnect':
+                    return
+                body.write(message.get('body', b''))
+                if not message.get('more_body'):
+                    break
+            body.seek(0)
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(
+                self.executor, self.respond, environ(scope, body), send, loop)
+        finally:
+            body.close()
+
+    def respond(self, environ: dict, send: Callable,
+                loop: asyncio.AbstractEventLoop) -> None:
+        """Call the WSGI application and send its response in a pool thread.
+
+        The response body is iterated and closed in the thread that called
+        the application: Django sends `request_finished` on closing, which
+        closes the database connections of the current thread. Messages
+        are sent through the event loop, and the thread waits for each one,
+        so a slow client holds back reading of the body.
+
+        Args:
+            environ: WSGI environ of the request;
+            send: ASGI callable sending messages to the client;
+            loop: event loop of the connection.
+        """
+        response = {}
+
+        def start_response(status: str, headers: List[Tuple[str, str]],
+                           exc_info=None) -> Callable:
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [
+                (name.lower().encode('latin-1'), value.encode('latin-1'))
+                for name, value in headers
+            ]
+            return lambda data: None
+
+        def send_message(message: dict) -> None:
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        result = self.application(environ, start_response)
+        try:
+            chunks = (chunk for chunk in result if chunk)
+            chunk = next(chunks, None)
+            send_message({'type': 'http.response.start',
+                          'status': response['status'],
+                          'headers': response['headers']})
+            while chunk is not None:
+                send_message({'type': 'http.response.body',
+                              'body': chunk, 'more_body': True})
+                chunk = next(chunks, None)
+            send_message({'type': 'http.response.body'})
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+
+
+def environ(scope: dict, body) -> dict:
+    """Build WSGI environ of an ASGI HTTP scope.
+
+    Args:
+        scope: scope of the connection;
+        body: file with the request body.
+    """
+    server = scope.get('server') or ('localhost', 80)
+    result = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': scope['path'].encode().decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f'HTTP/{scope.get("http_version", "1.1")}',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    if scope.get('client'):
+        result['REMOTE_ADDR'] = scope['client'][0]
+        result['REMOTE_PORT'] = str(scope['client'][1])
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = f'HTTP_{name}'
+        value = value.decode('latin-1')
+        if name in result:
+            separator = '; ' if name == 'HTTP_COOKIE' else ','
+            value = f'{result[name]}{separator}{value}'
+        result[name] = value
+    return result
@@ -0,0 +1,406 @@
+"""Module with cache backends shared by all worker processes.
+
+`SQLiteCache` keeps entries in one SQLite file, so every worker on a host
+sees the same cache without running a cache server. `TieredCache` puts a
+small in-process LRU in front of any shared backend: hot keys are served
+from process memory and only misses go to the shared tier.
+"""
+
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+MISSING = object()
+
+CULL_EVERY = 100
+
+
+class SQLiteCache(BaseCache):
+    """Cache backend storing pickled values in a SQLite file.
+
+    The table is created on first use, so no `createcachetable` is needed.
+    The database runs in WAL mode: readers of all processes never wait for
+    a writer, and writers wait for each other at most `timeout` seconds.
+    """
+
+    def __init__(self, location: str, params: dict) -> None:
+        """Create cache.
+
+        Args:
+            location: path to the database file;
+            params: cache settings.
+        """
+        super().__init__(params)
+        self._path = location
+        self._local = threading.local()
+
+    @property
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(
+                self._path, timeout=5, isolation_level=None,
+                check_same_thread=False,
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS cache '
+                '(key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)'
+            )
+            self._local.connection = connection
+            self._local.sets = 0
+        return connection
+
+    def _key(self, key: str, version: Optional[int]) -> str:
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    @staticmethod
+    def _alive(expires: Optional[float]) -> bool:
+        return expires is None or expires > time.time()
+
+    def get(self, key, default=None, version=None):
+        """Get value of a key or default if it is missing or expired."""
+        row = self._connection.execute(
+            'SELECT value, expires FROM cache WHERE key = ?',
+            (self._key(key, version),)
+        ).fetchone()
+        if row is None or not self._alive(row[1]):
+            return default
+        return pickle.loads(row[0])
+
+    def get_many(self, keys, version=None):
+        """Get values of several keys in one query."""
+        made = {self._key(key, version): key for key in keys}
+        if not made:
+            return {}
+        rows = self._connection.execute(
+            'SELECT key, value, expires FROM cache WHERE key IN ({})'.format(
+                ', '.join('?' * len(made))),
+            list(made)
+        ).fetchall()
+        return {
+            made[key]: pickle.loads(value)
+            for key, value, expires in rows if self._alive(expires)
+        }
+
+    def _write(self, sql: str, key: str, value: Any, timeout) -> int:
+        cursor = self._connection.execute(sql, (
+            key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+            self.get_backend_timeout(timeout),
+        ))
+        self._local.sets += 1
+        if self._local.sets % CULL_EVERY == 0:
+            self._cull()
+        return cursor.rowcount
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        """Store value of a key."""
+        self._write(
+            'INSERT OR REPLACE INTO cache (key, value, expires) '
+            'VALUES (?, ?, ?)',
+            self._key(key, version), value, timeout,
+        )
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        """Store value of a key unless a live value is already stored."""
+        key = self._key(key, version)
+        connection = self._connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.execute(
+                'DELETE FROM cache WHERE key = ? AND expires <= ?',
+                (key, time.time())
+            )
+            added = self._write(
+                'INSERT OR IGNORE INTO cache (key, value, expires) '
+                'VALUES (?, ?, ?)',
+                key, value, timeout,
+            )
+        finally:
+            connection.execute('COMMIT')
+        return added > 0
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        """Set a new expiration time of a live key."""
+        cursor = self._connection.execute(
+            'UPDATE cache SET expires = ? '
+            'WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), self._key(key, version),
+             time.time())
+        )
+        return cursor.rowcount > 0
+
+    def incr(self, key, delta=1, version=None):
+        """Add delta to the value of a key atomically."""
+        key = self._key(key, version)
+        connection = self._connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute(
+                'SELECT value, expires FROM cache WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None or not self._alive(row[1]):
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            connection.execute(
+                'UPDATE cache SET value = ? WHERE key = ?',
+                (pickle.dumps(value, pickle.HIGHEST_PROTOCOL), key)
+            )
+        finally:
+            connection.execute('COMMIT')
+        return value
+
+    def has_key(self, key, version=None):
+        """Check if a live value of a key is stored."""
+        return self.get(key, MISSING, version=version) is not MISSING
+
+    def delete(self, key, version=None):
+        """Remove a key."""
+        self._connection.execute(
+            'DELETE FROM cache WHERE key = ?', (self._key(key, version),)
+        )
+
+    def delete_many(self, keys, version=None):
+        """Remove several keys in one query."""
+        made = [self._key(key, version) for key in keys]
+        if made:
+            self._connection.execute(
+                'DELETE FROM cache WHERE key IN ({})'.format(
+                    ', '.join('?' * len(made))),
+                made
+            )
+
+    def clear(self):
+        """Remove all keys."""
+        self._connection.execute('DELETE FROM cache')
+
+    def _cull(self) -> None:
+        connection = self._connection
+        connection.execute(
+            'DELETE FROM cache WHERE expires <= ?', (time.time(),)
+        )
+        count = connection.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count > self._max_entries:
+            connection.execute(
+                'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+                'ORDER BY expires IS NULL, expires LIMIT ?)',
+                (count - self._max_entries
+                 + self._max_entries // self._cull_frequency,)
+            )
+
+
+class LocalStore:
+    """Thread-safe LRU of pickled values living in process memory."""
+
+    def __init__(self, max_entries: int) -> None:
+        """Create store.
+
+        Args:
+            max_entries: amount of entries kept, least recently used ones
+                are evicted first.
+        """
+        self.max_entries = max_entries
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+        self.local_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Any:
+        """Get value of a key or MISSING."""
+        with self.lock:
+            item = self.data.get(key)
+            if item is None:
+                return MISSING
+            expires, pickled = item
+            if expires <= time.monotonic():
+                del self.data[key]
+                return MISSING
+            self.data.move_to_end(key)
+            self.local_hits += 1
+        return pickle.loads(pickled)
+
+    def set(self, key: str, value: Any, timeout: float) -> None:
+        """Store value of a key for timeout seconds."""
+        if timeout <= 0:
+            self.delete(key)
+            return
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self.lock:
+            self.data[key] = (time.monotonic() + timeout, pickled)
+            self.data.move_to_end(key)
+            while len(self.data) > self.max_entries:
+                self.data.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        """Remove a key."""
+        with self.lock:
+            self.data.pop(key, None)
+
+    def clear(self) -> None:
+        """Remove all keys."""
+        with self.lock:
+            self.data.clear()
+
+
+_stores: Dict[Tuple[str, int], LocalStore] = {}
+_stores_lock = threading.Lock()
+
+
+class TieredCache(BaseCache):
+    """Two-level cache: in-process LRU in front of a shared backend.
+
+    LOCATION is the alias of the shared cache. Keys are built by the shared
+    cache, so its KEY_PREFIX and VERSION apply to both levels. Writes go
+    through to the shared cache, and other processes may serve their local
+    copy of an overwritten key for up to LOCAL_TIMEOUT seconds, so keys
+    that must change everywhere at once should be read from the shared
+    cache directly. LOCAL_TIMEOUT of 0 turns the local level off.
+    """
+
+    def __init__(self, location: str, params: dict) -> None:
+        """Create cache.
+
+        Args:
+            location: alias of the shared cache;
+            params: cache settings, MAX_ENTRIES limits the local level.
+        """
+        super().__init__(params)
+        self._alias = location
+        options = params.get('OPTIONS', {})
+        self.local_timeout = float(options.get('LOCAL_TIMEOUT', 5))
+        with _stores_lock:
+            self.store = _stores.setdefault(
+                (location, self._max_entries), LocalStore(self._max_entries)
+            )
+
+    @property
+    def shared(self) -> BaseCache:
+        """Get shared cache of the current thread."""
+        return caches[self._alias]
+
+    def _local_key(self, key: str, version: Optional[int]) -> str:
+        return self.shared.make_key(key, version=version)
+
+    def _local_timeout(self, timeout) -> float:
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.shared.default_timeout
+        if timeout is None:
+            return self.local_timeout
+        return min(timeout, self.local_timeout)
+
+    def get(self, key, default=None, version=None):
+        """Get value from the local level, then from the shared one."""
+        local_key = self._local_key(key, version)
+        if self.local_timeout:
+            value = self.store.get(local_key)
+            if value is not MISSING:
+                return value
+        value = self.shared.get(key, MISSING, version=version)
+        if value is MISSING:
+            self.store.misses += 1
+            return default
+        self.store.shared_hits += 1
+        if self.local_timeout:
+            self.store.set(local_key, value, self.local_timeout)
+        return value
+
+    def get_many(self, keys, version=None):
+        """Get values from the local level, then the rest in one batch."""
+        found = {}
+        missing: List[str] = []
+        for key in keys:
+            value = (
+                self.store.get(self._local_key(key, version))
+                if self.local_timeout else MISSING
+            )
+            if value is MISSING:
+                missing.append(key)
+            else:
+                found[key] = value
+        if missing:
+            shared = self.shared.get_many(missing, version=version)
+            self.store.shared_hits += len(shared)
+            self.store.misses += len(missing) - len(shared)
+            if self.local_timeout:
+                for key, value in shared.items():
+                    self.store.set(
+                        self._local_key(key, version), value,
+                        self.local_timeout
+                    )
+            found.update(shared)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        """Store value in both levels."""
+        self.shared.set(key, value, timeout, version=version)
+        if self.local_timeout:
+            self.store.set(
+                self._local_key(key, version), value,
+                self._local_timeout(timeout)
+            )
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        """Store several values in both levels."""
+        failed = self.shared.set_many(data, timeout, version=version) or []
+        if self.local_timeout:
+            for key, value in data.items():
+                if key not in failed:
+                    self.store.set(
+                        self._local_key(key, version), value,
+                        self._local_timeout(timeout)
+                    )
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        """Store value unless the shared level already has the key."""
+        added = self.shared.add(key, value, timeout, version=version)
+        if added and self.local_timeout:
+            self.store.set(
+                self._local_key(key, version), value,
+                self._local_timeout(timeout)
+            )
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        """Set a new expiration time of a key in the shared level."""
+        return self.shared.touch(key, timeout, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        """Add delta to the value in the shared level."""
+        value = self.shared.incr(key, delta, version=version)
+        if self.local_timeout:
+            self.store.set(
+                self._local_key(key, version), value, self.local_timeout
+            )
+        return value
+
+    def has_key(self, key, version=None):
+        """Check if any level has the key."""
+        return self.get(key, MISSING, version=version) is not MISSING
+
+    def delete(self, key, version=None):
+        """Remove a key from both levels."""
+        self.store.delete(self._local_key(key, version))
+        return self.shared.delete(key, version=version)
+
+    def delete_many(self, keys: Iterable[str], version=None):
+        """Remove several keys from both levels."""
+        keys = list(keys)
+        for key in keys:
+            self.store.delete(self._local_key(key, version))
+        self.shared.delete_many(keys, version=version)
+
+    def clear(self):
+        """Remove all keys from both levels."""
+        self.store.clear()
+        self.shared.clear()
@@ -0,0 +1,91 @@
+"""Module with concurrent execution of independent queries of a request.
+
+Django 2.2 runs views synchronously, so a view waits for every query in
+turn. `gather` sends queries that do not depend on each other to a pool
+of QUERY_WORKERS threads, each with database connections of its own, and
+waits for all of them at once, so a page takes about as long as its
+slowest query instead of the sum of them. Queries of the pool threads are
+measured as queries of the request. Inside a transaction, and with
+QUERY_WORKERS set to 0, calls run one by one in the calling thread: other
+connections would not see the changes of the transaction.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Callable, List, Optional
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+
+from . import metrics
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+_local = threading.local()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Get pool of QUERY_WORKERS threads running queries."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.QUERY_WORKERS,
+            thread_name_prefix='queries',
+        )
+    return _executor
+
+
+def in_transaction() -> bool:
+    """Check if any connection of the current thread is in a transaction."""
+    return any(
+        connection.in_atomic_block for connection in connections.all())
+
+
+def run(call: Callable[[], Any],
+        request_metrics: Optional[metrics.RequestMetrics]) -> Any:
+    """Run a call in a pool thread on behalf of a request.
+
+    Connections of the thread are closed when they outlive CONN_MAX_AGE
+    or break, like connections of request threads are between requests.
+    """
+    close_old_connections()
+    _local.in_pool = True
+    try:
+        if request_metrics is None:
+            return call()
+        with request_metrics.measure():
+            return call()
+    finally:
+        _local.in_pool = False
+
+
+def gather(*calls: Callable[[], Any]) -> List[Any]:
+    """Run independent calls concurrently.
+
+    The first call runs in the calling thread while the others run in the
+    pool. Calls made from pool threads run one by one, so pool threads
+    never wait for each other.
+
+    Args:
+        calls: functions without arguments, usually evaluating querysets.
+
+    Returns:
+        results of the calls in their order.
+
+    Raises:
+        Exception: the exception of the first failed call, once all of
+            them have finished.
+    """
+    if (len(calls) < 2 or not settings.QUERY_WORKERS
+            or getattr(_local, 'in_pool', False) or in_transaction()):
+        return [call() for call in calls]
+    request_metrics = metrics.current()
+    futures = [
+        get_executor().submit(run, call, request_metrics)
+        for call in calls[1:]
+    ]
+    try:
+        first = calls[0]()
+    finally:
+        wait(futures)
+    return [first, *(future.result() for future in futures)]
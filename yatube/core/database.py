@@ -0,0 +1,22 @@
+"""Module with tuning of database connections.
+
+SQLite is tuned on every new connection with SQLITE_PRAGMAS: in WAL mode
+readers never wait for a writer and a commit is a single append, a busy
+timeout makes writers queue for the lock instead of failing at once, and
+memory-mapped reads with a larger page cache save system calls. Pragmas
+go to the driver connection directly, so they are not counted as queries
+of the request that opened it.
+"""
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+@receiver(connection_created)
+def tune_sqlite(sender, connection, **kwargs) -> None:
+    """Apply SQLITE_PRAGMAS to a new SQLite connection."""
+    if connection.vendor != 'sqlite':
+        return
+    for name, value in settings.SQLITE_PRAGMAS.items():
+        connection.connection.execute(f'PRAGMA {name} = {value}')
@@ -0,0 +1,259 @@
+"""Module with per-view request metrics and query budgets.
+
+`RequestMetricsMiddleware` counts SQL queries and measures the time spent
+in the database, in template rendering and in the whole request, reports
+them to the client in a Server-Timing header and adds them to per-view
+totals, which `core.views.metrics` exposes in the Prometheus text format.
+Totals are kept by every process on its own, so every worker is scraped as
+a separate target.
+
+Views declare how many queries a request may take with `query_budget`.
+Requests over the budget are logged and counted, and `budget_exceeded` is
+sent, which `core.pytest_plugin` turns into failing tests.
+"""
+
+import logging
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+from django.db import connections
+from django.dispatch import Signal
+from django.http import HttpRequest, HttpResponse
+from django.template.backends.django import DjangoTemplates, Template
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, float('inf'))
+
+UNRESOLVED_VIEW = '<unresolved>'
+
+# Sent with `view_name`, `path`, `queries` and `budget` arguments when a
+# request takes more queries than its view declares.
+budget_exceeded = Signal()
+
+_local = threading.local()
+
+
+def query_budget(queries: int) -> Callable:
+    """Declare the most queries a request to a view may take.
+
+    Args:
+        queries: amount of queries, including session and user lookups.
+
+    Returns:
+        view decorator.
+    """
+    def decorator(view: Callable) -> Callable:
+        view.query_budget = queries
+        return view
+    return decorator
+
+
+class RequestMetrics:
+    """Measurements of the request handled by the current thread."""
+
+    def __init__(self) -> None:
+        """Create empty measurements."""
+        self.lock = threading.Lock()
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.total_time = 0.0
+
+    def execute(self, execute, sql, params, many, context):
+        """Database execute wrapper counting and timing queries."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            with self.lock:
+                self.db_time += time.perf_counter() - started
+                self.queries += 1
+
+    @contextmanager
+    def measure(self) -> Iterator['RequestMetrics']:
+        """Measure queries of all connections of the current thread.
+
+        Threads running queries for the request, like the ones of
+        `core.concurrency.gather`, enter it too, so their queries are
+        counted against the budget of the view.
+        """
+        previous = current()
+        _local.metrics = self
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(self.execute))
+                yield self
+        finally:
+            _local.metrics = previous
+
+    def server_timing(self) -> str:
+        """Get value of a Server-Timing header, durations in ms."""
+        return ', '.join((
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries"',
+            f'tpl;dur={self.template_time * 1000:.1f}',
+            f'total;dur={self.total_time * 1000:.1f}',
+        ))
+
+
+def current() -> Optional[RequestMetrics]:
+    """Get measurements of the request handled by the current thread."""
+    return getattr(_local, 'metrics', None)
+
+
+class ViewTotals:
+    """Totals of the requests to a view."""
+
+    def __init__(self) -> None:
+        """Create empty totals."""
+        self.requests = 0
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.total_time = 0.0
+        self.budget_exceeded = 0
+        self.latency_buckets = [0] * len(LATENCY_BUCKETS)
+
+    def add(self, metrics: RequestMetrics, over_budget: bool) -> None:
+        """Add measurements of a request."""
+        self.requests += 1
+        self.queries += metrics.queries
+        self.db_time += metrics.db_time
+        self.template_time += metrics.template_time
+        self.total_time += metrics.total_time
+        self.budget_exceeded += over_budget
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            if metrics.total_time <= bound:
+                self.latency_buckets[index] += 1
+
+
+class Registry:
+    """Per-view totals of the requests handled by the process."""
+
+    def __init__(self) -> None:
+        """Create empty registry."""
+        self.lock = threading.Lock()
+        self.views: Dict[str, ViewTotals] = {}
+
+    def add(self, view_name: str, metrics: RequestMetrics,
+            over_budget: bool) -> None:
+        """Add measurements of a request to the totals of its view."""
+        with self.lock:
+            self.views.setdefault(view_name, ViewTotals()).add(
+                metrics, over_budget)
+
+    def clear(self) -> None:
+        """Drop all totals."""
+        with self.lock:
+            self.views.clear()
+
+    def exposition(self) -> str:
+        """Get totals in the Prometheus text exposition format."""
+        with self.lock:
+            views = sorted(self.views.items())
+            lines: List[str] = []
+            for name, kind, help_text, value in (
+                ('requests_total', 'counter', 'Requests handled.',
+                 lambda totals: totals.requests),
+                ('db_queries_total', 'counter', 'SQL queries executed.',
+                 lambda totals: totals.queries),
+                ('db_duration_seconds_total', 'counter',
+                 'Time spent in SQL queries.',
+                 lambda totals: totals.db_time),
+                ('template_duration_seconds_total', 'counter',
+                 'Time spent rendering templates.',
+                 lambda totals: totals.template_time),
+                ('query_budget_exceeded_total', 'counter',
+                 'Requests over the query budget of their view.',
+                 lambda totals: totals.budget_exceeded),
+            ):
+                lines.append(f'# HELP yatube_{name} {help_text}')
+                lines.append(f'# TYPE yatube_{name} {kind}')
+                lines.extend(
+                    f'yatube_{name}{{view="{view}"}} {value(totals)}'
+                    for view, totals in views
+                )
+            lines.append('# HELP yatube_request_duration_seconds '
+                         'Time taken by requests.')
+            lines.append('# TYPE yatube_request_duration_seconds histogram')
+            for view, totals in views:
+                for bound, count in zip(LATENCY_BUCKETS,
+                                        totals.latency_buckets):
+                    le = '+Inf' if bound == float('inf') else bound
+                    lines.append(f'yatube_request_duration_seconds_bucket'
+                                 f'{{view="{view}",le="{le}"}} {count}')
+                lines.append(f'yatube_request_duration_seconds_sum'
+                             f'{{view="{view}"}} {totals.total_time}')
+                lines.append(f'yatube_request_duration_seconds_count'
+                             f'{{view="{view}"}} {totals.requests}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+class RequestMetricsMiddleware:
+    """Middleware measuring requests, placed first to cover all others."""
+
+    def __init__(self, get_response: Callable) -> None:
+        """Create middleware."""
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        """Handle a request, measuring it."""
+        metrics = RequestMetrics()
+        started = time.perf_counter()
+        with metrics.measure():
+            response = self.get_response(request)
+        metrics.total_time = time.perf_counter() - started
+        match = getattr(request, 'resolver_match', None)
+        view_name = match.view_name if match else UNRESOLVED_VIEW
+        budget = getattr(match.func, 'query_budget', None) if match else None
+        over_budget = budget is not None and metrics.queries > budget
+        if over_budget:
+            logger.warning('%s took %d queries, over the budget of %d',
+                           request.path, metrics.queries, budget)
+            budget_exceeded.send(
+                sender=self.__class__, view_name=view_name,
+                path=request.path, queries=metrics.queries, budget=budget)
+        registry.add(view_name, metrics, over_budget)
+        response['Server-Timing'] = metrics.server_timing()
+        return response
+
+
+class TimedTemplate(Template):
+    """Template adding its rendering time to the request measurements."""
+
+    def render(self, context=None, request=None) -> str:
+        """Render the template, measuring it."""
+        metrics = current()
+        if metrics is None:
+            return super().render(context, request)
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.template_time += time.perf_counter() - started
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Django template backend measuring rendering.
+
+    Only templates rendered by views are timed; included and extended
+    ones are rendered inside them.
+    """
+
+    def from_string(self, template_code: str) -> TimedTemplate:
+        """Compile a template from a string."""
+        return TimedTemplate(
+            super().from_string(template_code).template, self)
+
+    def get_template(self, template_name: str) -> TimedTemplate:
+        """Find a template by name."""
+        return TimedTemplate(
+            super().get_template(template_name).template, self)
@@ -0,0 +1,50 @@
+"""Module with pytest plugin failing tests on exceeded query budgets.
+
+Enabled in the root conftest.py. Every request a test makes through the
+Django test client is checked against the `query_budget` of its view.
+Tests exceeding a budget on purpose are marked `allow_budget_exceeded`.
+Like `core.testing.TestRunner`, the plugin keeps the shared cache tier in
+a temporary directory and removes WAL files of the test database.
+"""
+
+import pytest
+
+from .metrics import budget_exceeded
+from .testing import isolated_caches, remove_wal_files
+
+
+def pytest_configure(config) -> None:
+    """Register the marker of tests allowed to exceed query budgets."""
+    config.addinivalue_line(
+        'markers',
+        'allow_budget_exceeded: do not fail the test on exceeded budgets',
+    )
+
+
+def pytest_sessionfinish(session, exitstatus) -> None:
+    """Remove WAL files left by the test database."""
+    remove_wal_files()
+
+
+@pytest.fixture(autouse=True, scope='session')
+def test_caches():
+    """Keep the SQLite shared cache tier in a temporary directory."""
+    with isolated_caches():
+        yield
+
+
+@pytest.fixture(autouse=True)
+def query_budgets(request):
+    """Fail the test if a request takes more queries than its view may."""
+    exceeded = []
+
+    def collect(sender, view_name, path, queries, budget, **kwargs):
+        exceeded.append(
+            f'{path} ({view_name}): {queries} queries, budget {budget}')
+
+    budget_exceeded.connect(collect, weak=False)
+    yield exceeded
+    budget_exceeded.disconnect(collect)
+    allowed = request.node.get_closest_marker('allow_budget_exceeded')
+    if exceeded and allowed is None:
+        pytest.fail('Query budget exceeded:\n' + '\n'.join(exceeded))
@@ -0,0 +1,79 @@
+"""Module with storage of collected static files.
+
+`CompressedManifestStaticFilesStorage` stores every file under a name with
+the hash of its content, like `ManifestStaticFilesStorage`, and writes
+gzip and, with the `brotli` package installed, brotli compressed copies
+next to compressible files, so `core.wsgi.FileServer` sends them without
+compressing anything per request.
+"""
+
+import gzip
+from typing import Dict, Iterator, Tuple
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = (
+    '.css', '.js', '.map', '.json', '.svg', '.txt', '.html', '.xml',
+    '.ico', '.ttf', '.otf', '.eot',
+)
+
+MIN_COMPRESSED_SIZE = 256
+
+MAX_COMPRESSION_RATIO = 0.95
+
+
+def compress(content: bytes) -> Dict[str, bytes]:
+    """Compress content with every available encoding.
+
+    Args:
+        content: file content.
+
+    Returns:
+        compressed content by file extension, only encodings that make
+        the content notably smaller.
+    """
+    encoded = {'.gz': gzip.compress(content, 9, mtime=0)}
+    if brotli is not None:
+        encoded['.br'] = brotli.compress(content, quality=11)
+    return {
+        extension: data for extension, data in encoded.items()
+        if len(data) <= len(content) * MAX_COMPRESSION_RATIO
+    }
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Static files storage with hashed names and precompressed copies."""
+
+    def post_process(
+        self, paths, dry_run: bool = False, **options,
+    ) -> Iterator[Tuple[str, str, bool]]:
+        """Hash names of collected files, then compress the final files."""
+        processed_names = {}
+        for name, hashed_name, processed in super().post_process(
+                paths, dry_run, **options):
+            yield name, hashed_name, processed
+            if not isinstance(processed, Exception):
+                processed_names[name] = hashed_name
+        if dry_run:
+            return
+        for name, hashed_name in processed_names.items():
+            for stored_name in {name, hashed_name}:
+                if stored_name.lower().endswith(COMPRESSIBLE_EXTENSIONS):
+                    self.compress_file(stored_name)
+
+    def compress_file(self, name: str) -> None:
+        """Write compressed copies of a stored file next to it."""
+        with self.open(name) as file:
+            content = file.read()
+        if len(content) < MIN_COMPRESSED_SIZE:
+            return
+        for extension, data in compress(content).items():
+            if self.exists(name + extension):
+                self.delete(name + extension)
+            self._save(name + extension, ContentFile(data))
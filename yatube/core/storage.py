@@ -0,0 +1,92 @@
+"""Module with storage naming media files by their content.
+
+`ContentAddressedStorage` stores every file under the SHA-256 hash of its
+content, so identical uploads share one file and names never collide.
+Files are never overwritten or deleted when a model changes; the
+`collect_media_garbage` command removes the ones nothing refers to.
+"""
+
+import hashlib
+import os
+import posixpath
+import uuid
+from typing import Iterator, Tuple
+
+from django.core.files.base import File
+from django.core.files.storage import FileSystemStorage
+
+HASH_CHUNK_SIZE = 64 * 2 ** 10
+
+SHARD_LEVELS = 2
+
+TEMPORARY_PREFIX = '.incoming-'
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """File system storage naming files by the hash of their content.
+
+    A file saved as `posts/photo.JPG` is stored as
+    `posts/3f/a2/3fa2...e1.jpg`: the directory and the extension come from
+    the name the field generates, and SHARD_LEVELS directories named by
+    the leading bytes of the hash keep any directory from growing too
+    large. Saving content that is already stored writes nothing.
+    """
+
+    def get_available_name(self, name: str, max_length: int = None) -> str:
+        """Get the name as is, the stored name depends on the content."""
+        return name
+
+    def _save(self, name: str, content: File) -> str:
+        directory, extension = posixpath.split(name)[0], (
+            os.path.splitext(name)[1].lower())
+        digest = hashlib.sha256()
+        for chunk in content.chunks(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+        content_hash = digest.hexdigest()
+        name = posixpath.join(
+            directory,
+            *(content_hash[2 * level:2 * level + 2]
+              for level in range(SHARD_LEVELS)),
+            content_hash + extension,
+        )
+        if self.exists(name):
+            # A fresh timestamp keeps `collect_media_garbage` from deleting
+            # an orphaned file that is being reused.
+            os.utime(self.path(name))
+            return name
+        # Writes go to a unique file moved into place at once, so readers
+        # never see a partial file and concurrent saves of the same content
+        # do not clash.
+        temporary = super()._save(
+            posixpath.join(posixpath.dirname(name),
+                           f'{TEMPORARY_PREFIX}{uuid.uuid4().hex}'),
+            content,
+        )
+        os.replace(self.path(temporary), self.path(name))
+        return name
+
+    def walk(self, directory: str = '') -> Iterator[Tuple[str, float]]:
+        """Iterate over stored files.
+
+        Args:
+            directory: directory to walk recursively.
+
+        Yields:
+            name and modification timestamp of every file, including
+            partially written ones.
+        """
+        root = self.path(directory)
+        for path, _, files in os.walk(root):
+            for file_name in files:
+                full_path = os.path.join(path, file_name)
+                try:
+                    modified = os.path.getmtime(full_path)
+                except FileNotFoundError:
+                    continue
+                yield posixpath.join(
+                    directory,
+                    *os.path.relpath(full_path, root).split(os.sep),
+                ), modified
+
+
+content_storage = ContentAddressedStorage()
@@ -0,0 +1,76 @@
+"""Module with the test environment of the project.
+
+Tests run with the production settings, so they go through the pools of
+threads, the flusher of queued writes and both cache tiers, and tests of
+the fallbacks turn the settings off themselves. Only the SQLite shared
+cache tier moves to a temporary directory of the run, so tests never see
+entries of the development server or of previous runs.
+
+The test database is an SQLite file, so requests made by threads of the
+pools in tests see the same data, and it runs in WAL mode like the
+production one. Connections of pool threads outlive the test database,
+so SQLite keeps its -wal and -shm files after the run, which
+`remove_wal_files` deletes.
+
+`TestRunner` sets this up for `manage.py test`, `core.pytest_plugin`
+for pytest.
+"""
+
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from typing import Iterator
+
+from django.conf import settings
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+SQLITE_CACHE = 'core.caches.SQLiteCache'
+
+
+@contextmanager
+def isolated_caches() -> Iterator[None]:
+    """Keep the SQLite shared cache tier in a temporary directory."""
+    directory = tempfile.mkdtemp(prefix='yatube-cache-')
+    caches = {
+        alias: {**cache, 'LOCATION': os.path.join(directory, alias)}
+        if cache['BACKEND'] == SQLITE_CACHE else cache
+        for alias, cache in settings.CACHES.items()
+    }
+    try:
+        with override_settings(CACHES=caches):
+            yield
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def remove_wal_files() -> None:
+    """Delete -wal and -shm files left by SQLite test databases."""
+    for database in settings.DATABASES.values():
+        name = database.get('TEST', {}).get('NAME')
+        if database['ENGINE'] != 'django.db.backends.sqlite3' or not name:
+            continue
+        for suffix in ('-wal', '-shm'):
+            if os.path.exists(name + suffix):
+                os.remove(name + suffix)
+
+
+class TestRunner(DiscoverRunner):
+    """Test runner with isolated caches and cleaned up test databases."""
+
+    def setup_test_environment(self, **kwargs) -> None:
+        """Move the shared cache tier to a temporary directory."""
+        super().setup_test_environment(**kwargs)
+        self.caches = isolated_caches()
+        self.caches.__enter__()
+
+    def teardown_test_environment(self, **kwargs) -> None:
+        """Remove the temporary shared cache tier."""
+        self.caches.__exit__(None, None, None)
+        super().teardown_test_environment(**kwargs)
+
+    def teardown_databases(self, old_config, **kwargs) -> None:
+        """Destroy test databases with their WAL files."""
+        super().teardown_databases(old_config, **kwargs)
+        remove_wal_files()
@@ -0,0 +1,109 @@
+import asyncio
+import threading
+
+from django.test import SimpleTestCase
+
+from core.asgi import ASGIHandler
+
+
+def echo_application(environ, start_response):
+    start_response('201 Created', [
+        ('Content-Type', 'text/plain'),
+        ('X-Thread', threading.current_thread().name),
+    ])
+    body = environ['wsgi.input'].read()
+    return [b'', environ['REQUEST_METHOD'].encode(), b' ',
+            environ['PATH_INFO'].encode('latin-1'), b'?',
+            environ['QUERY_STRING'].encode(), b' ',
+            environ.get('HTTP_COOKIE', '').encode(), b' ', body]
+
+
+class ThreadBody:
+    """Response body recording threads that iterate and close it."""
+
+    def __init__(self) -> None:
+        self.threads = []
+
+    def __iter__(self):
+        for chunk in (b'first', b'', b'second'):
+            self.threads.append(threading.current_thread())
+            yield chunk
+
+    def close(self) -> None:
+        self.threads.append(threading.current_thread())
+
+
+def call(handler, scope, messages):
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(handler(scope, receive, send))
+    return sent
+
+
+class ASGIHandlerTest(SimpleTestCase):
+    def setUp(self):
+        self.handler = ASGIHandler(echo_application, threads=2)
+
+    def tearDown(self):
+        self.handler.executor.shutdown()
+
+    def test_request_runs_in_pool_thread(self):
+        """Запрос передается WSGI-приложению в потоке пула"""
+        sent = call(self.handler, {
+            'type': 'http', 'method': 'POST', 'path': '/пост/',
+            'query_string': b'page=2',
+            'headers': [(b'cookie', b'a=1'), (b'cookie', b'b=2')],
+        }, [
+            {'type': 'http.request', 'body': b'te', 'more_body': True},
+            {'type': 'http.request', 'body': b'xt'},
+        ])
+        start, *bodies = sent
+        self.assertEqual(start['status'], 201)
+        self.assertIn((b'content-type', b'text/plain'), start['headers'])
+        self.assertTrue(dict(start['headers'])[b'x-thread'].startswith(
+            b'asgi'))
+        self.assertEqual(
+            b''.join(body.get('body', b'') for body in bodies),
+            'POST /пост/?page=2 a=1; b=2 text'.encode())
+        self.assertFalse(bodies[-1].get('more_body'))
+
+    def test_response_is_sent_from_application_thread(self):
+        """Тело ответа читается и закрывается в потоке приложения"""
+        body = ThreadBody()
+        threads = []
+
+        def application(environ, start_response):
+            threads.append(threading.current_thread())
+            start_response('200 OK', [])
+            return body
+
+        handler = ASGIHandler(application, threads=2)
+        self.addCleanup(handler.executor.shutdown)
+        sent = call(handler, {'type': 'http', 'method': 'GET', 'path': '/'},
+                    [{'type': 'http.request'}])
+        self.assertEqual(
+            [message.get('body') for message in sent[1:]],
+            [b'first', b'second', None])
+        self.assertEqual(len(body.threads), 4)
+        self.assertEqual(set(body.threads), set(threads))
+
+    def test_disconnected_client_is_skipped(self):
+        """Запрос отключившегося клиента не выполняется"""
+        sent = call(self.handler, {
+            'type': 'http', 'method': 'GET', 'path': '/'},
+            [{'type': 'http.disconnect'}])
+        self.assertEqual(sent, [])
+
+    def test_lifespan(self):
+        """Сервер получает подтверждение запуска и остановки"""
+        sent = call(self.handler, {'type': 'lifespan'}, [
+            {'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}])
+        self.assertEqual(
+            [message['type'] for message in sent],
+            ['lifespan.startup.complete', 'lifespan.shutdown.complete'])
@@ -0,0 +1,122 @@
+import os
+import shutil
+import tempfile
+import time
+
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+
+from core.caches import SQLiteCache
+
+TEMP_DIR = tempfile.mkdtemp()
+
+
+class SQLiteCacheTest(SimpleTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+    def setUp(self):
+        self.path = os.path.join(TEMP_DIR, f'{self.id()}.sqlite3')
+        self.cache = SQLiteCache(
+            self.path, {'OPTIONS': {'MAX_ENTRIES': 10, 'CULL_FREQUENCY': 2}})
+
+    def other_process_cache(self):
+        return SQLiteCache(self.path, {})
+
+    def test_values_are_shared_between_instances(self):
+        """Значения видны другим экземплярам с тем же файлом"""
+        self.cache.set('key', {'posts': [1, 2]})
+        self.cache.set('none', None)
+        other = self.other_process_cache()
+        self.assertEqual(other.get('key'), {'posts': [1, 2]})
+        self.assertEqual(
+            other.get_many(['key', 'none', 'missing']),
+            {'key': {'posts': [1, 2]}, 'none': None}
+        )
+        other.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_add_incr_and_expiration(self):
+        """add, incr и истечение срока работают как у встроенных кешей"""
+        self.assertTrue(self.cache.add('counter', 1))
+        self.assertFalse(self.other_process_cache().add('counter', 5))
+        self.assertEqual(self.cache.incr('counter', 2), 3)
+        self.assertEqual(self.other_process_cache().get('counter'), 3)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+        self.cache.set('short', 'value', 0.01)
+        time.sleep(0.02)
+        self.assertFalse(self.cache.has_key('short'))
+        self.assertTrue(self.cache.add('short', 'new'))
+        self.assertEqual(self.cache.get('short'), 'new')
+
+    def test_cull_keeps_size_bounded(self):
+        """Старые записи удаляются при переполнении"""
+        for number in range(300):
+            self.cache.set(f'key{number}', number)
+        self.cache._cull()
+        count = self.cache._connection.execute(
+            'SELECT COUNT(*) FROM cache').fetchone()[0]
+        self.assertLessEqual(count, 10)
+        self.assertEqual(self.cache.get('key299'), 299)
+
+
+@override_settings(CACHES={
+    'default': {
+        'BACKEND': 'core.caches.TieredCache',
+        'LOCATION': 'shared',
+        'OPTIONS': {'MAX_ENTRIES': 2, 'LOCAL_TIMEOUT': 60},
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'tiered-test',
+        'KEY_PREFIX': 'yatube',
+        'VERSION': 1,
+    },
+})
+class TieredCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.cache = caches['default']
+        self.shared = caches['shared']
+        self.cache.clear()
+
+    def test_local_level_serves_hot_keys(self):
+        """Повторное чтение обслуживается из памяти процесса"""
+        self.shared.set('key', 'value')
+        self.assertEqual(self.cache.get('key'), 'value')
+        self.shared.set('key', 'changed')
+        self.assertEqual(self.cache.get('key'), 'value')
+        self.cache.set('key', 'new')
+        self.assertEqual(self.shared.get('key'), 'new')
+        self.assertEqual(self.cache.get('key'), 'new')
+
+    def test_local_level_is_bounded_lru(self):
+        """Локальный уровень хранит только последние ключи"""
+        for key in ('first', 'second', 'third'):
+            self.cache.set(key, key)
+        self.shared.delete_many(['first', 'second', 'third'])
+        self.assertIsNone(self.cache.get('first'))
+        self.assertEqual(
+            self.cache.get_many(['second', 'third']),
+            {'second': 'second', 'third': 'third'}
+        )
+
+    def test_key_version_separates_entries(self):
+        """Версия ключа общего кеша действует на оба уровня"""
+        self.cache.set('key', 'old')
+        self.cache.set('key', 'new', version=2)
+        self.assertEqual(self.cache.get('key'), 'old')
+        self.assertEqual(self.cache.get('key', version=2), 'new')
+        self.assertEqual(self.shared.get('key', version=2), 'new')
+
+    def test_writes_go_through_to_shared_level(self):
+        """add, incr и delete меняют общий уровень"""
+        self.assertTrue(self.cache.add('counter', 1))
+        self.assertFalse(self.cache.add('counter', 1))
+        self.assertEqual(self.cache.incr('counter'), 2)
+        self.assertEqual(self.shared.get('counter'), 2)
+        self.cache.delete('counter')
+        self.assertIsNone(self.shared.get('counter'))
+        self.assertIsNone(self.cache.get('counter'))
@@ -0,0 +1,112 @@
+import threading
+
+from django.db import transaction
+from django.test import (SimpleTestCase, TransactionTestCase,
+                         override_settings)
+from django.urls import reverse
+
+from core.concurrency import gather
+from posts.models import Follow, Group, Post, User
+
+
+def thread_name():
+    return threading.current_thread().name
+
+
+@override_settings(QUERY_WORKERS=2)
+class GatherTest(SimpleTestCase):
+    def test_calls_run_concurrently(self):
+        """Вызовы выполняются в пуле, результаты идут по порядку"""
+        barrier = threading.Barrier(3, timeout=5)
+
+        def wait(value):
+            barrier.wait()
+            return value, thread_name()
+
+        results = gather(*(lambda value=value: wait(value)
+                           for value in range(3)))
+        self.assertEqual([value for value, _ in results], [0, 1, 2])
+        self.assertEqual(results[0][1], thread_name())
+        self.assertTrue(all(name.startswith('queries')
+                            for _, name in results[1:]))
+
+    def test_exception_is_raised(self):
+        """Исключение вызова передается после завершения всех вызовов"""
+        finished = []
+
+        def fail():
+            raise ValueError('fail')
+
+        with self.assertRaisesMessage(ValueError, 'fail'):
+            gather(lambda: None, fail, lambda: finished.append(True))
+        self.assertEqual(finished, [True])
+
+    def test_nested_calls_run_in_place(self):
+        """Вызовы из потока пула выполняются в нем же"""
+        _, names = gather(
+            lambda: None, lambda: gather(thread_name, thread_name))
+        self.assertEqual(len(set(names)), 1)
+
+    @override_settings(QUERY_WORKERS=0)
+    def test_disabled_pool(self):
+        """Без потоков пула вызовы выполняются по очереди"""
+        self.assertEqual(
+            gather(thread_name, thread_name), [thread_name()] * 2)
+
+
+class ConcurrentViewsTest(TransactionTestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        for number in range(15):
+            Post.objects.create(
+                author=self.author, group=self.group, text=f'Пост {number}')
+        Follow.objects.follow(self.reader, self.author)
+        self.client.force_login(self.reader)
+
+    def test_pages_are_rendered(self):
+        """Страницы с параллельными запросами выводят те же данные"""
+        post = Post.objects.first()
+        cases = (
+            (reverse('posts:index'), 10),
+            (reverse('posts:index') + '?page=2', 5),
+            (reverse('posts:index') + '?page=99', 5),
+            (reverse('posts:group_list', kwargs={'slug': 'group'}), 10),
+            (reverse('posts:profile', kwargs={'username': 'author'}), 10),
+        )
+        for url, amount in cases:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                page_obj = response.context['page_obj']
+                self.assertEqual(len(page_obj), amount)
+                self.assertEqual(page_obj.paginator.count, 15)
+        response = self.client.get(
+            reverse('posts:profile', kwargs={'username': 'author'}))
+        self.assertTrue(response.context['following'])
+        self.assertEqual(response.context['author'], self.author)
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}))
+        self.assertEqual(response.context['post'], post)
+
+    def test_queries_of_pool_are_counted(self):
+        """Запросы потоков пула учитываются в запросах страницы"""
+        response = self.client.get(
+            reverse('posts:group_list', kwargs={'slug': 'group'}))
+        self.assertIn('desc="6 queries"', response['Server-Timing'])
+
+    def test_missing_group(self):
+        """Несуществующая группа дает 404"""
+        response = self.client.get(
+            reverse('posts:group_list', kwargs={'slug': 'missing'}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_transaction_keeps_queries_in_place(self):
+        """В транзакции запросы идут через ее соединение"""
+        with transaction.atomic():
+            Group.objects.create(title='Новая', slug='new', description='')
+            self.assertEqual(gather(
+                lambda: Group.objects.count(),
+                lambda: Group.objects.filter(slug='new').exists(),
+            ), [2, True])
@@ -0,0 +1,36 @@
+from unittest import mock
+
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from core.database import tune_sqlite
+
+
+class TuneSQLiteTest(TestCase):
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_new_connection_is_tuned(self):
+        """Новое соединение с SQLite получает настройки из SQLITE_PRAGMAS"""
+        self.assertEqual(self.pragma('busy_timeout'), 5000)
+        self.assertEqual(self.pragma('synchronous'), 1)
+        self.assertEqual(self.pragma('temp_store'), 2)
+        self.assertEqual(self.pragma('cache_size'), -64 * 2 ** 10)
+
+    def test_pragmas_come_from_settings(self):
+        """Настройки берутся из SQLITE_PRAGMAS"""
+        with override_settings(SQLITE_PRAGMAS={'busy_timeout': 1234}):
+            tune_sqlite(sender=None, connection=connection)
+        self.assertEqual(self.pragma('busy_timeout'), 1234)
+        with override_settings(SQLITE_PRAGMAS={'busy_timeout': 5000}):
+            tune_sqlite(sender=None, connection=connection)
+
+
+class OtherDatabasesTest(SimpleTestCase):
+    def test_other_databases_are_left_alone(self):
+        """Соединения с другими СУБД не меняются"""
+        other = mock.Mock(vendor='postgresql')
+        tune_sqlite(sender=None, connection=other)
+        other.connection.execute.assert_not_called()
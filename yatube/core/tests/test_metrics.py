@@ -0,0 +1,98 @@
+from unittest import mock
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core import metrics
+from posts import views
+
+User = get_user_model()
+
+
+class RequestMetricsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='user')
+
+    def setUp(self):
+        metrics.registry.clear()
+        self.client.force_login(self.user)
+
+    def test_server_timing_header(self):
+        """Ответ содержит время запросов к базе, шаблона и всего запроса"""
+        response = self.client.get(reverse('posts:search'))
+        self.assertRegex(
+            response['Server-Timing'],
+            r'^db;dur=[\d.]+;desc="\d+ queries", '
+            r'tpl;dur=[\d.]+, total;dur=[\d.]+$'
+        )
+
+    def test_totals_are_kept_by_view(self):
+        """Запросы учитываются по имени представления"""
+        with self.assertNumQueries(2):
+            self.client.get(reverse('posts:search'))
+        self.client.get(reverse('posts:search'))
+        totals = metrics.registry.views['posts:search']
+        self.assertEqual(totals.requests, 2)
+        self.assertEqual(totals.queries, 4)
+        self.assertGreater(totals.template_time, 0)
+        self.assertEqual(totals.latency_buckets[-1], 2)
+        self.client.get('/missing/')
+        self.assertIn(metrics.UNRESOLVED_VIEW, metrics.registry.views)
+
+    def test_metrics_endpoint(self):
+        """Метрики отдаются в текстовом формате Prometheus"""
+        self.client.get(reverse('posts:search'))
+        with override_settings(METRICS_TOKEN='secret'):
+            response = self.client.get(
+                reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(
+            response['Content-Type'], 'text/plain; version=0.0.4')
+        content = response.content.decode()
+        self.assertIn('yatube_requests_total{view="posts:search"} 1', content)
+        self.assertIn('yatube_db_queries_total{view="posts:search"} 2',
+                      content)
+        self.assertIn(
+            'yatube_request_duration_seconds_bucket'
+            '{view="posts:search",le="+Inf"} 1', content)
+
+    def test_metrics_endpoint_needs_token(self):
+        """Метрики не видны без токена и закрыты, если токен не задан"""
+        for token, authorization in (
+            ('', ''), ('', 'Bearer '), ('secret', ''),
+            ('secret', 'Bearer wrong'),
+        ):
+            with self.subTest(token=token, authorization=authorization):
+                with override_settings(METRICS_TOKEN=token):
+                    response = self.client.get(
+                        reverse('metrics'), HTTP_AUTHORIZATION=authorization)
+                self.assertEqual(response.status_code, 404)
+
+    @pytest.mark.allow_budget_exceeded
+    def test_exceeded_budget_is_reported(self):
+        """Превышение бюджета запросов логируется, считается и сообщается"""
+        received = []
+        metrics.budget_exceeded.connect(
+            lambda **kwargs: received.append(kwargs), weak=False,
+            dispatch_uid='test')
+        try:
+            with mock.patch.object(views.search, 'query_budget', 1), \
+                    self.assertLogs('core.metrics', 'WARNING'):
+                self.client.get(reverse('posts:search'))
+        finally:
+            metrics.budget_exceeded.disconnect(dispatch_uid='test')
+        self.assertEqual(len(received), 1)
+        self.assertEqual(received[0]['view_name'], 'posts:search')
+        self.assertEqual(received[0]['queries'], 2)
+        self.assertEqual(received[0]['budget'], 1)
+        self.assertEqual(
+            metrics.registry.views['posts:search'].budget_exceeded, 1)
+
+    def test_views_of_posts_declare_budgets(self):
+        """Представления постов объявляют бюджет запросов"""
+        for view in (views.index, views.group_posts, views.profile,
+                     views.post_detail, views.follow_index, views.search):
+            with self.subTest(view=view.__name__):
+                self.assertIsInstance(view.query_budget, int)
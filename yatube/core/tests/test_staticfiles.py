@@ -0,0 +1,65 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+
+from core import staticfiles
+
+TEMP_DIR = tempfile.mkdtemp()
+SOURCE_DIR = os.path.join(TEMP_DIR, 'static')
+STATIC_ROOT = os.path.join(TEMP_DIR, 'collected')
+CSS = 'body { color: #333; }\n' * 100
+
+
+@override_settings(
+    STATICFILES_DIRS=[SOURCE_DIR],
+    STATICFILES_FINDERS=[
+        'django.contrib.staticfiles.finders.FileSystemFinder'],
+    STATIC_ROOT=STATIC_ROOT,
+    STATICFILES_STORAGE=(
+        'core.staticfiles.CompressedManifestStaticFilesStorage'),
+)
+class CompressedManifestStaticFilesStorageTest(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        os.makedirs(os.path.join(SOURCE_DIR, 'css'))
+        with open(os.path.join(SOURCE_DIR, 'css', 'site.css'), 'w') as file:
+            file.write(CSS)
+        with open(os.path.join(SOURCE_DIR, 'logo.png'), 'wb') as file:
+            file.write(b'\x89PNG' + bytes(1000))
+        call_command('collectstatic', interactive=False, verbosity=0,
+                     stdout=StringIO())
+        with open(os.path.join(STATIC_ROOT, 'staticfiles.json')) as file:
+            cls.paths = json.load(file)['paths']
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+    def test_files_are_named_by_content(self):
+        """Собранные файлы получают имена с хешем содержимого"""
+        hashed_name = self.paths['css/site.css']
+        self.assertRegex(hashed_name, r'^css/site\.[0-9a-f]{12}\.css$')
+        self.assertTrue(
+            os.path.exists(os.path.join(STATIC_ROOT, hashed_name)))
+
+    def test_compressible_files_get_compressed_copies(self):
+        """Рядом с текстовыми файлами лежат сжатые копии"""
+        path = os.path.join(STATIC_ROOT, self.paths['css/site.css'])
+        with gzip.open(path + '.gz') as file:
+            self.assertEqual(file.read().decode(), CSS)
+        self.assertEqual(
+            os.path.exists(path + '.br'), staticfiles.brotli is not None)
+        self.assertFalse(os.path.exists(
+            os.path.join(STATIC_ROOT, self.paths['logo.png']) + '.gz'))
+
+    def test_incompressible_content_is_not_compressed(self):
+        """Сжатие, не уменьшающее файл, не сохраняется"""
+        self.assertEqual(staticfiles.compress(os.urandom(1000)), {})
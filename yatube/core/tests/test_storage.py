@@ -0,0 +1,64 @@
+import hashlib
+import os
+import shutil
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.test import SimpleTestCase
+
+from core.storage import ContentAddressedStorage
+
+TEMP_DIR = tempfile.mkdtemp()
+
+
+class ContentAddressedStorageTest(SimpleTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+    def setUp(self):
+        self.storage = ContentAddressedStorage(
+            os.path.join(TEMP_DIR, self.id()))
+
+    def test_file_is_named_by_content(self):
+        """Файл хранится под хешем содержимого в шардированных папках"""
+        content_hash = hashlib.sha256(b'content').hexdigest()
+        name = self.storage.save('posts/Photo.JPG', ContentFile(b'content'))
+        self.assertEqual(
+            name,
+            f'posts/{content_hash[:2]}/{content_hash[2:4]}/{content_hash}.jpg'
+        )
+        with self.storage.open(name) as file:
+            self.assertEqual(file.read(), b'content')
+
+    def test_identical_files_are_stored_once(self):
+        """Одинаковые файлы хранятся один раз, разные не сталкиваются"""
+        first = self.storage.save('posts/a.gif', ContentFile(b'same'))
+        second = self.storage.save('posts/b.gif', ContentFile(b'same'))
+        other = self.storage.save('posts/a.gif', ContentFile(b'other'))
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        self.assertEqual(
+            sorted(name for name, _ in self.storage.walk('posts')),
+            sorted([first, other])
+        )
+
+    def test_uploaded_temporary_file_is_moved(self):
+        """Загруженный во временный файл контент переносится без копии"""
+        upload = TemporaryUploadedFile('big.png', 'image/png', 4, None)
+        upload.write(b'data')
+        upload.seek(0)
+        name = self.storage.save('posts/big.png', upload)
+        self.assertFalse(os.path.exists(upload.temporary_file_path()))
+        upload.close()
+        self.assertEqual(self.storage.size(name), 4)
+        self.assertEqual(len(list(self.storage.walk())), 1)
+
+    def test_reused_file_is_touched(self):
+        """Повторное сохранение обновляет время изменения файла"""
+        name = self.storage.save('posts/a.gif', ContentFile(b'same'))
+        os.utime(self.storage.path(name), (0, 0))
+        self.storage.save('posts/b.gif', ContentFile(b'same'))
+        self.assertGreater(os.path.getmtime(self.storage.path(name)), 0)
@@ -0,0 +1,172 @@
+import email.utils
+import os
+import shutil
+import tempfile
+from wsgiref.util import setup_testing_defaults
+
+from django.test import SimpleTestCase, override_settings
+
+from core.wsgi import (IMMUTABLE_CACHE_CONTROL, MUTABLE_CACHE_CONTROL,
+                       FileServer)
+
+TEMP_DIR = tempfile.mkdtemp()
+STATIC_ROOT = os.path.join(TEMP_DIR, 'static')
+MEDIA_ROOT = os.path.join(TEMP_DIR, 'media')
+CONTENT_HASH = 'ab' * 32
+HASHED_CSS = 'css/site.0123456789ab.css'
+
+
+def write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as file:
+        file.write(content)
+
+
+def django_application(environ, start_response):
+    start_response('404 Not Found', [('Content-Type', 'text/plain')])
+    return [b'django']
+
+
+@override_settings(
+    DEBUG=False, STATIC_ROOT=STATIC_ROOT, MEDIA_ROOT=MEDIA_ROOT,
+    STATIC_URL='/static/', MEDIA_URL='/media/',
+)
+class FileServerTest(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        write(os.path.join(STATIC_ROOT, HASHED_CSS), b'body {}')
+        write(os.path.join(STATIC_ROOT, HASHED_CSS + '.gz'), b'gzipped')
+        write(os.path.join(STATIC_ROOT, HASHED_CSS + '.br'), b'brotli')
+        write(os.path.join(STATIC_ROOT, 'staticfiles.json'),
+              f'{{"paths": {{"css/site.css": "{HASHED_CSS}"}}}}'.encode())
+        write(os.path.join(STATIC_ROOT, 'robots.txt'), b'User-agent: *')
+        write(os.path.join(MEDIA_ROOT, 'posts', f'{CONTENT_HASH}.gif'),
+              b'GIF89a')
+        write(os.path.join(MEDIA_ROOT, 'posts', 'old.gif'), b'GIF89a')
+        write(os.path.join(TEMP_DIR, 'secret.txt'), b'secret')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+    def setUp(self):
+        self.server = FileServer(django_application)
+
+    def request(self, path, method='GET', **headers):
+        environ = {'PATH_INFO': path, 'REQUEST_METHOD': method}
+        environ.update(
+            (f'HTTP_{name.upper()}', value) for name, value in headers.items())
+        setup_testing_defaults(environ)
+        response = {}
+
+        def start_response(status, headers):
+            response['status'] = status
+            response['headers'] = dict(headers)
+
+        body = self.server(environ, start_response)
+        response['body'] = b''.join(body)
+        if hasattr(body, 'close'):
+            body.close()
+        return response
+
+    def test_hashed_static_file_is_immutable(self):
+        """Файл с хешем в имени кешируется навсегда"""
+        response = self.request(f'/static/{HASHED_CSS}')
+        self.assertEqual(response['status'], '200 OK')
+        self.assertEqual(response['body'], b'body {}')
+        headers = response['headers']
+        self.assertEqual(headers['Cache-Control'], IMMUTABLE_CACHE_CONTROL)
+        self.assertEqual(headers['Content-Type'], 'text/css; charset=utf-8')
+        self.assertEqual(headers['Content-Length'], '7')
+        self.assertEqual(headers['Vary'], 'Accept-Encoding')
+        self.assertIn('ETag', headers)
+        self.assertEqual(
+            self.request('/static/robots.txt')['headers']['Cache-Control'],
+            MUTABLE_CACHE_CONTROL
+        )
+
+    def test_precompressed_copy_is_chosen_by_accept_encoding(self):
+        """Сжатая копия выбирается по Accept-Encoding"""
+        for accept_encoding, encoding, body in (
+            ('gzip, deflate, br', 'br', b'brotli'),
+            ('gzip', 'gzip', b'gzipped'),
+            ('gzip;q=0, identity', None, b'body {}'),
+        ):
+            with self.subTest(accept_encoding=accept_encoding):
+                response = self.request(f'/static/{HASHED_CSS}',
+                                        accept_encoding=accept_encoding)
+                self.assertEqual(
+                    response['headers'].get('Content-Encoding'), encoding)
+                self.assertEqual(response['body'], body)
+
+    def test_conditional_request_is_not_modified(self):
+        """Повторный запрос с ETag или датой получает 304"""
+        headers = self.request(f'/static/{HASHED_CSS}')['headers']
+        for conditional in (
+            {'if_none_match': headers['ETag']},
+            {'if_none_match': f'"other", W/{headers["ETag"]}'},
+            {'if_modified_since': headers['Last-Modified']},
+        ):
+            with self.subTest(**conditional):
+                response = self.request(
+                    f'/static/{HASHED_CSS}', **conditional)
+                self.assertEqual(response['status'], '304 Not Modified')
+                self.assertEqual(response['body'], b'')
+        past = email.utils.formatdate(0, usegmt=True)
+        response = self.request(
+            f'/static/{HASHED_CSS}',
+            if_none_match='"other"', if_modified_since=past)
+        self.assertEqual(response['status'], '200 OK')
+
+    def test_head_request_has_no_body(self):
+        """HEAD-запрос возвращает только заголовки"""
+        response = self.request(f'/static/{HASHED_CSS}', 'HEAD')
+        self.assertEqual(response['status'], '200 OK')
+        self.assertEqual(response['headers']['Content-Length'], '7')
+        self.assertEqual(response['body'], b'')
+        self.assertEqual(
+            self.request(f'/static/{HASHED_CSS}', 'POST')['status'],
+            '405 Method Not Allowed'
+        )
+
+    def test_media_files_are_served(self):
+        """Медиафайлы отдаются, с хешем в имени кешируются навсегда"""
+        response = self.request(f'/media/posts/{CONTENT_HASH}.gif')
+        self.assertEqual(response['body'], b'GIF89a')
+        self.assertEqual(response['headers']['Content-Type'], 'image/gif')
+        self.assertEqual(
+            response['headers']['Cache-Control'], IMMUTABLE_CACHE_CONTROL)
+        self.assertEqual(
+            self.request('/media/posts/old.gif')['headers']['Cache-Control'],
+            MUTABLE_CACHE_CONTROL
+        )
+
+    def test_other_requests_go_to_django(self):
+        """Остальные запросы и пути вне папок передаются Django"""
+        for path in (
+            '/', '/static/missing.css', '/media/posts/missing.gif',
+            '/media/../secret.txt', '/media/posts/../../secret.txt',
+            '/media/posts/', '/static/staticfiles.json.gz',
+        ):
+            with self.subTest(path=path):
+                self.assertEqual(self.request(path)['body'], b'django')
+
+    def test_file_wrapper_of_server_is_used(self):
+        """Тело отдается через wsgi.file_wrapper сервера для sendfile"""
+        wrapped = []
+
+        def file_wrapper(file, block_size):
+            wrapped.append(file.name)
+            with file:
+                return iter([file.read()])
+
+        response = {}
+        environ = {'PATH_INFO': f'/static/{HASHED_CSS}',
+                   'wsgi.file_wrapper': file_wrapper}
+        setup_testing_defaults(environ)
+        body = self.server(environ, lambda status, headers: response.update(
+            status=status))
+        self.assertEqual(b''.join(body), b'body {}')
+        self.assertEqual(wrapped, [os.path.join(STATIC_ROOT, HASHED_CSS)])
@@ -1,7 +1,11 @@
 """Module with core views of the project."""
 
-from django.http import HttpResponse
+from django.conf import settings
+from django.http import Http404, HttpResponse
 from django.shortcuts import render
+from django.utils.crypto import constant_time_compare
+
+from .metrics import registry
 
 
 def page_not_found(request, exception) -> HttpResponse:
@@ -22,3 +26,19 @@ def server_error(request) -> HttpResponse:
 def permission_denied_view(request, exception) -> HttpResponse:
     """Render PermissionDenied page."""
     return render(request, 'core/403.html', status=403)
+
+
+def metrics(request) -> HttpResponse:
+    """Expose request metrics of the process to Prometheus.
+
+    Only clients sending METRICS_TOKEN as a bearer token get them, others
+    see no such page. Without the setting the page is disabled, as behind
+    a reverse proxy the address of the client tells nothing.
+    """
+    token = settings.METRICS_TOKEN
+    authorization = request.META.get('HTTP_AUTHORIZATION', '')
+    if not token or not constant_time_compare(
+            authorization, f'Bearer {token}'):
+        raise Http404
+    return HttpResponse(
+        registry.exposition(), content_type='text/plain; version=0.0.4')
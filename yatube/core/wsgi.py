@@ -0,0 +1,226 @@
+"""Module with WSGI middleware serving static and media files.
+
+`FileServer` answers requests for collected static files and uploaded
+media straight from the disk, before Django's request handling starts, so
+no middleware, URL resolver or view runs for them. Bodies go through the
+server's `wsgi.file_wrapper`, which gunicorn and uWSGI send with
+sendfile(2). Names carrying a hash of the content, static files listed in
+the manifest and media stored by `ContentAddressedStorage`, never change
+and are cached by browsers for a year.
+"""
+
+import email.utils
+import json
+import mimetypes
+import os
+import re
+import stat
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional
+from wsgiref.util import FileWrapper
+
+from django.conf import settings
+
+BLOCK_SIZE = 64 * 2 ** 10
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+MUTABLE_CACHE_CONTROL = 'public, max-age=60'
+
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+CONTENT_HASH = re.compile(r'(^|/)[0-9a-f]{64}\.\w+$')
+
+Headers = List[tuple]
+
+
+class StaticFile(NamedTuple):
+    """File on the disk with the headers of responses sending it."""
+
+    path: str
+    size: int
+    headers: Headers
+
+
+def file_headers(
+    path: str, content_type: str, immutable: bool,
+) -> Optional[StaticFile]:
+    """Get headers of a response with a file.
+
+    Args:
+        path: absolute path of the file;
+        content_type: type of the original file, even for a compressed one;
+        immutable: whether the file under this name never changes.
+
+    Returns:
+        file with its headers, None if it is no regular file.
+    """
+    try:
+        file_stat = os.stat(path)
+    except OSError:
+        return None
+    if not stat.S_ISREG(file_stat.st_mode):
+        return None
+    return StaticFile(path, file_stat.st_size, [
+        ('Content-Type', content_type),
+        ('Content-Length', str(file_stat.st_size)),
+        ('Last-Modified', email.utils.formatdate(
+            file_stat.st_mtime, usegmt=True)),
+        ('ETag', f'"{file_stat.st_mtime_ns:x}-{file_stat.st_size:x}"'),
+        ('Cache-Control',
+         IMMUTABLE_CACHE_CONTROL if immutable else MUTABLE_CACHE_CONTROL),
+    ])
+
+
+def file_variants(path: str, immutable: bool) -> Dict[str, StaticFile]:
+    """Get a file and its precompressed copies by content encoding.
+
+    Args:
+        path: absolute path of the original file;
+        immutable: whether the file under this name never changes.
+
+    Returns:
+        files by encoding, with '' for the original, empty if there is no
+        such file.
+    """
+    content_type = mimetypes.guess_type(path)[0] or (
+        'application/octet-stream')
+    if content_type.startswith('text/') or content_type in (
+            'application/javascript', 'application/json'):
+        content_type += '; charset=utf-8'
+    original = file_headers(path, content_type, immutable)
+    if original is None:
+        return {}
+    variants = {'': original}
+    for encoding, extension in ENCODINGS:
+        compressed = file_headers(path + extension, content_type, immutable)
+        if compressed is not None:
+            compressed.headers.append(('Content-Encoding', encoding))
+            variants[encoding] = compressed
+    if len(variants) > 1:
+        for variant in variants.values():
+            variant.headers.append(('Vary', 'Accept-Encoding'))
+    return variants
+
+
+def accepted_encodings(header: str) -> set:
+    """Get content encodings a client accepts from Accept-Encoding."""
+    encodings = set()
+    for item in header.split(','):
+        encoding, _, parameter = item.partition(';')
+        name, _, value = parameter.partition('=')
+        try:
+            quality = float(value) if name.strip() == 'q' else 1
+        except ValueError:
+            quality = 1
+        if quality > 0:
+            encodings.add(encoding.strip().lower())
+    return encodings
+
+
+class FileServer:
+    """WSGI middleware sending static and media files from the disk.
+
+    Collected static files are indexed once, when the middleware is
+    created, as they only change on deploy; with DEBUG on they are left to
+    Django, which finds them in app directories. Media files are looked up
+    on every request. Requests for missing files go on to the wrapped
+    application.
+    """
+
+    def __init__(self, application: Callable) -> None:
+        """Create middleware.
+
+        Args:
+            application: WSGI application handling all other requests.
+        """
+        self.application = application
+        self.static_files = self.index_static_files()
+
+    def index_static_files(self) -> Dict[str, Dict[str, StaticFile]]:
+        """Find collected static files and their headers by URL."""
+        root = settings.STATIC_ROOT
+        if settings.DEBUG or not root or not os.path.isdir(root):
+            return {}
+        hashed_names = set()
+        try:
+            with open(os.path.join(root, 'staticfiles.json')) as manifest:
+                hashed_names.update(json.load(manifest)['paths'].values())
+        except (OSError, ValueError, KeyError):
+            pass
+        files = {}
+        for directory, _, file_names in os.walk(root):
+            for file_name in file_names:
+                path = os.path.join(directory, file_name)
+                name = os.path.relpath(path, root).replace(os.sep, '/')
+                if name.endswith(tuple(extension for _, extension
+                                       in ENCODINGS)):
+                    continue
+                variants = file_variants(path, name in hashed_names)
+                if variants:
+                    files[settings.STATIC_URL + name] = variants
+        return files
+
+    def find_media_file(self, url: str) -> Dict[str, StaticFile]:
+        """Find an uploaded file by URL, never outside MEDIA_ROOT."""
+        name = url[len(settings.MEDIA_URL):]
+        root = os.path.realpath(settings.MEDIA_ROOT)
+        path = os.path.realpath(os.path.join(root, *name.split('/')))
+        if not path.startswith(root + os.sep) or '/.' in f'/{name}':
+            return {}
+        return file_variants(path, bool(CONTENT_HASH.search(name)))
+
+    def __call__(self, environ: dict, start_response: Callable) -> Iterable:
+        """Send a file or pass the request to the application."""
+        url = environ.get('PATH_INFO', '')
+        variants = self.static_files.get(url)
+        if (variants is None and settings.MEDIA_URL
+                and url.startswith(settings.MEDIA_URL)):
+            variants = self.find_media_file(url)
+        if not variants:
+            return self.application(environ, start_response)
+        if environ['REQUEST_METHOD'] not in ('GET', 'HEAD'):
+            start_response('405 Method Not Allowed', [
+                ('Allow', 'GET, HEAD'), ('Content-Length', '0')])
+            return []
+        accepted = accepted_encodings(environ.get('HTTP_ACCEPT_ENCODING', ''))
+        static_file = next(
+            (variants[encoding] for encoding, _ in ENCODINGS
+             if encoding in variants and encoding in accepted),
+            variants[''],
+        )
+        if self.not_modified(environ, static_file):
+            start_response('304 Not Modified', [
+                header for header in static_file.headers
+                if header[0] in ('ETag', 'Cache-Control', 'Vary')
+            ])
+            return []
+        try:
+            file = open(static_file.path, 'rb')
+        except OSError:
+            return self.application(environ, start_response)
+        start_response('200 OK', list(static_file.headers))
+        if environ['REQUEST_METHOD'] == 'HEAD':
+            file.close()
+            return []
+        file_wrapper = environ.get('wsgi.file_wrapper', FileWrapper)
+        return file_wrapper(file, BLOCK_SIZE)
+
+    @staticmethod
+    def not_modified(environ: dict, static_file: StaticFile) -> bool:
+        """Check conditional headers of a request against a file."""
+        headers = dict(static_file.headers)
+        if_none_match = environ.get('HTTP_IF_NONE_MATCH')
+        if if_none_match is not None:
+            return if_none_match.strip() == '*' or headers['ETag'] in (
+                tag.strip().replace('W/', '', 1)
+                for tag in if_none_match.split(',')
+            )
+        if_modified_since = environ.get('HTTP_IF_MODIFIED_SINCE')
+        if if_modified_since is None:
+            return False
+        try:
+            since = email.utils.parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        modified = email.utils.parsedate_to_datetime(headers['Last-Modified'])
+        return modified <= since
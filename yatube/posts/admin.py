@@ -2,7 +2,7 @@
 
 from django.contrib import admin
 
-from .models import Comment, Follow, Group, Post
+from .models import Comment, Follow, Group, Post, UserStats
 
 
 @admin.register(Post)
@@ -40,3 +40,17 @@ class FollowAdmin(admin.ModelAdmin):
     list_display = ('user', 'author')
     search_fields = ('user', 'author')
     list_filter = ('user', 'author')
+
+
+@admin.register(UserStats)
+class UserStatsAdmin(admin.ModelAdmin):
+    """Admin panel configuration for UserStats model."""
+
+    list_display = (
+        'user', 'posts_count', 'followers_count', 'following_count',
+        'comments_count'
+    )
+    search_fields = ('user__username',)
+    readonly_fields = (
+        'posts_count', 'followers_count', 'following_count', 'comments_count'
+    )
@@ -5,3 +5,7 @@ class PostsConfig(AppConfig):
     """Configuration class for Posts app."""
     
     name = 'posts'
+
+    def ready(self) -> None:
+        """Connect signal handlers."""
+        from . import signals  # noqa: F401
@@ -0,0 +1,225 @@
+"""Module with versioned keys for cached fragments of post feeds.
+
+Rendered feed blocks are cached under the version of their feed (the main
+page, a group or an author) and rendered posts are cached under the post
+itself, so a change shows up immediately: signal handlers bump only the
+versions of the feeds that contain the changed post. Changes that may
+touch any fragment, like a renamed group or user, bump the global version.
+Versions are read from FEED_VERSION_CACHE, which must be shared by all
+processes, while fragments can be served from a per-process cache level:
+their keys never get new content. A version is the time of the last change
+of its feed in milliseconds, so `conditional` also derives ETag and
+Last-Modified headers of whole pages from them.
+
+Feed blocks are the expensive fragments, so they are built with
+`get_or_build`: the version is stored inside the entry instead of the key,
+and when an entry gets stale exactly one request rebuilds it while the
+others keep serving the stale copy.
+"""
+
+import math
+import random
+import time
+from typing import Any, Callable, Dict, Hashable, Optional, Union
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.paginator import Page
+
+from .paginators import CursorPage
+
+GLOBAL_VERSION = 'fragments'
+INDEX_FEED = 'index'
+
+EARLY_EXPIRATION_BETA = 1.0
+REBUILD_WAIT = 1.0
+REBUILD_POLL = 0.05
+
+
+def group_feed(group_id: Optional[int]) -> Optional[str]:
+    """Get name of the feed of a group."""
+    return None if group_id is None else f'group:{group_id}'
+
+
+def author_feed(author_id: int) -> str:
+    """Get name of the feed of an author."""
+    return f'author:{author_id}'
+
+
+def post_feed(post_id: int) -> str:
+    """Get name of the page of a post with its comments."""
+    return f'post:{post_id}'
+
+
+def version_key(name: str) -> str:
+    """Get cache key holding the version of a feed."""
+    return f'feed-version:{name}'
+
+
+def new_version() -> int:
+    """Get a version that is newer than any one issued before.
+
+    Versions start from the current time in milliseconds, so a version
+    evicted from the cache is never reissued to stale fragments.
+    """
+    return int(time.time() * 1000)
+
+
+def bump(*names: Optional[str]) -> None:
+    """Invalidate fragments of feeds.
+
+    Versions are increased atomically, at least by one and up to the
+    current time, so they never go back even when processes race.
+
+    Args:
+        names: names of the feeds, None values are skipped.
+    """
+    cache = caches[settings.FEED_VERSION_CACHE]
+    keys = [version_key(name) for name in filter(None, names)]
+    versions = cache.get_many(keys)
+    now = new_version()
+    for key in keys:
+        try:
+            cache.incr(key, max(1, now - versions.get(key, now)))
+        except ValueError:
+            cache.set(key, now, None)
+
+
+def bump_post_feeds(
+    post_id: int, author_id: int, *group_ids: Optional[int],
+) -> None:
+    """Invalidate fragments of all feeds that show a post.
+
+    Args:
+        post_id: primary key of the post;
+        author_id: primary key of the author of the post;
+        group_ids: primary keys of the groups the post belongs or belonged to.
+    """
+    bump(
+        INDEX_FEED, post_feed(post_id), author_feed(author_id),
+        *(group_feed(group_id) for group_id in group_ids)
+    )
+
+
+def feed_versions(*names: str) -> Dict[str, int]:
+    """Get current versions of feeds, starting missing ones.
+
+    Args:
+        names: names of the feeds.
+
+    Returns:
+        versions by feed name.
+    """
+    keys = {name: version_key(name) for name in names}
+    cache = caches[settings.FEED_VERSION_CACHE]
+    versions = cache.get_many(keys.values())
+    if len(versions) < len(keys):
+        for key in keys.values():
+            if key not in versions:
+                cache.add(key, new_version(), None)
+        versions = cache.get_many(keys.values())
+    return {name: versions[key] for name, key in keys.items()}
+
+
+def page_key(page_obj: Union[Page, CursorPage]) -> Union[int, str]:
+    """Get value that tells pages of the same feed apart."""
+    if isinstance(page_obj, CursorPage):
+        return page_obj.cursor or ''
+    return page_obj.number
+
+
+def fragments_context(
+    feed: Optional[str], page_obj: Union[Page, CursorPage],
+) -> dict:
+    """Get template context for cached fragments of a feed page.
+
+    Args:
+        feed: name of the feed, None for a feed that is not cached as a whole;
+        page_obj: page of the feed.
+
+    Returns:
+        versions of fragments, the key of the page and the cache timeout.
+    """
+    versions = feed_versions(GLOBAL_VERSION, *filter(None, [feed]))
+    fragments_version = versions[GLOBAL_VERSION]
+    return {
+        'fragment_timeout': settings.FRAGMENT_CACHE_TIMEOUT,
+        'fragments_version': fragments_version,
+        'feed': feed,
+        'feed_version': (
+            f'{fragments_version}.{versions[feed]}'
+            if feed is not None else None
+        ),
+        'page_key': page_key(page_obj),
+    }
+
+
+def is_fresh(expires: float, build_time: float) -> bool:
+    """Decide if a cached entry is still served without a rebuild.
+
+    Expiration is probabilistic: the closer the entry is to `expires` and
+    the longer it took to build, the more likely it is treated as stale,
+    so rebuilds are spread in time instead of all happening at expiry.
+
+    Args:
+        expires: time the entry expires at;
+        build_time: seconds it took to build the entry.
+
+    Returns:
+        True if the entry should be served as is.
+    """
+    early = build_time * EARLY_EXPIRATION_BETA * -math.log(
+        1 - random.random())
+    return time.time() + early < expires
+
+
+def get_or_build(
+    key: str, build: Callable[[], Any], timeout: int,
+    version: Hashable = None,
+) -> Any:
+    """Get a cached value, rebuilding it by at most one request at a time.
+
+    A stale entry, either expired or of another version, is rebuilt by the
+    request that takes the rebuild lock, other requests keep serving it.
+    Entries are stored twice as long as they are fresh to have a stale copy
+    to serve. Requests finding no entry at all wait for the one rebuilding
+    it for up to REBUILD_WAIT seconds and build it themselves after that.
+
+    Args:
+        key: cache key;
+        build: function making the value;
+        timeout: seconds the value is fresh;
+        version: version of the data the value is built from.
+
+    Returns:
+        cached or built value.
+    """
+    cache = caches[settings.FEED_VERSION_CACHE]
+    entry = cache.get(key)
+    if entry is not None:
+        value, entry_version, expires, build_time = entry
+        if entry_version == version and is_fresh(expires, build_time):
+            return value
+    lock_key = f'{key}:rebuild'
+    locked = cache.add(lock_key, True, settings.FRAGMENT_REBUILD_TIMEOUT)
+    if not locked:
+        if entry is not None:
+            return entry[0]
+        deadline = time.time() + REBUILD_WAIT
+        while time.time() < deadline:
+            time.sleep(REBUILD_POLL)
+            entry = cache.get(key)
+            if entry is not None and entry[1] == version:
+                return entry[0]
+    try:
+        started = time.time()
+        value = build()
+        finished = time.time()
+        cache.set(
+            key, (value, version, finished + timeout, finished - started),
+            timeout * 2
+        )
+    finally:
+        if locked:
+            cache.delete(lock_key)
+    return value
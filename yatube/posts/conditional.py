@@ -0,0 +1,121 @@
+"""Module with conditional GET support of feed and post pages.
+
+ETag and Last-Modified of a page are derived from the versions `caching`
+keeps for the feeds the page shows and from the user it is rendered for,
+so a browser reloading an unchanged page gets 304 Not Modified before any
+post is queried or any template is rendered. Versions advance to the time
+of every change, which makes the newest of them the time the page was
+last modified. Pages are marked `private, no-cache`: browsers store them,
+but revalidate them on every visit.
+"""
+
+import hashlib
+import time
+from functools import wraps
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from django.http import HttpRequest
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from . import caching, lookups
+from .models import Group
+
+PageFeeds = Callable[..., Optional[Iterable[str]]]
+
+
+def validators(request: HttpRequest, feeds: Iterable[str]) -> Tuple[str, int]:
+    """Get validators of a page.
+
+    The session key is a part of the ETag too: pages of logged-in users
+    carry forms with the CSRF token, which changes on every login along
+    with the session, so a page cached before it has to be rendered again.
+
+    Args:
+        request: request of the page;
+        feeds: names of the feeds shown on the page.
+
+    Returns:
+        weak ETag and the time of the last change as a timestamp.
+    """
+    versions = caching.feed_versions(caching.GLOBAL_VERSION, *feeds)
+    state = ';'.join(
+        [f'user={request.user.pk or 0}',
+         f'session={request.session.session_key or ""}']
+        + [f'{name}={version}' for name, version in sorted(versions.items())]
+    )
+    etag = f'W/"{hashlib.md5(state.encode()).hexdigest()}"'
+    last_modified = min(max(versions.values()) // 1000, int(time.time()))
+    return etag, last_modified
+
+
+def conditional_page(feeds: PageFeeds) -> Callable:
+    """Make a view answer conditional GET requests.
+
+    Args:
+        feeds: function called with the arguments of the view, returning
+            names of the feeds the page shows, None if there is no page.
+
+    Returns:
+        view decorator.
+    """
+    def decorator(view: Callable) -> Callable:
+        @wraps(view)
+        def conditional_view(request: HttpRequest, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            page_feeds = feeds(request, *args, **kwargs)
+            if page_feeds is None:
+                return view(request, *args, **kwargs)
+            etag, last_modified = validators(request, page_feeds)
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = view(request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                response['ETag'] = etag
+                response['Last-Modified'] = http_date(last_modified)
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return conditional_view
+    return decorator
+
+
+def index_feeds(request: HttpRequest) -> List[str]:
+    """Get feeds shown on the main page."""
+    return [caching.INDEX_FEED]
+
+
+def group_feeds(request: HttpRequest, slug: str) -> Optional[List[str]]:
+    """Get feeds shown on the page of a group."""
+    group_id = Group.objects.filter(slug=slug).values_list(
+        'pk', flat=True).first()
+    return None if group_id is None else [caching.group_feed(group_id)]
+
+
+def profile_feeds(
+    request: HttpRequest, username: str,
+) -> Optional[List[str]]:
+    """Get feeds shown on the profile page of an author.
+
+    The feed of an author also changes with the counters of the profile.
+    """
+    author = lookups.profile_author(request, username)
+    return None if author is None else [caching.author_feed(author.pk)]
+
+
+def post_feeds(request: HttpRequest, post_id: int) -> Optional[List[str]]:
+    """Get feeds shown on the page of a post.
+
+    The page shows the amount of posts of the author, which changes with
+    the feed of the author.
+    """
+    post = lookups.detail_post(request, post_id)
+    if post is None:
+        return None
+    return [caching.post_feed(post_id), caching.author_feed(post.author_id)]
+
+
+def comment_feeds(request: HttpRequest, post_id: int) -> List[str]:
+    """Get feeds shown on a page of comments of a post."""
+    return [caching.post_feed(post_id)]
@@ -1,12 +1,18 @@
 """Module with forms."""
 
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 
-from yatube.posts.models import Comment, Post
+from posts import uploads
+from posts.models import Comment, Post
 
 
 class PostForm(forms.ModelForm):
-    """Class of Post form."""
+    """Class of Post form.
+
+    Uploaded images are checked by their header before the image field
+    opens them and are stored re-encoded by `uploads.sanitize`.
+    """
 
     class Meta:
         """Meta-class for PostForm class."""
@@ -19,6 +25,24 @@ class PostForm(forms.ModelForm):
             'image': 'Картинка к посту'
         }
 
+    def full_clean(self) -> None:
+        """Validate the form, rejecting oversized images undecoded."""
+        image = self.files.get('image') if self.is_bound else None
+        error = image and uploads.check(image)
+        if error:
+            self.files = self.files.copy()
+            del self.files['image']
+        super().full_clean()
+        if error:
+            self.add_error('image', error)
+
+    def clean_image(self):
+        """Strip metadata of a newly uploaded image."""
+        image = self.cleaned_data['image']
+        if isinstance(image, UploadedFile):
+            return uploads.sanitize(image)
+        return image
+
 
 class CommentForm(forms.ModelForm):
     """Class of Comment form."""
@@ -0,0 +1,72 @@
+"""Module with lookups of the objects profile and post pages show.
+
+Each lookup fetches an object with everything its page needs besides the
+lists in a single query, and is made once per request: `conditional`
+validates the page with the same object the view then renders.
+"""
+
+from functools import wraps
+from typing import Callable, Optional
+
+from django.db.models import BooleanField, Exists, F, OuterRef, Value
+from django.db.models.functions import Coalesce
+from django.http import HttpRequest
+
+from .models import Follow, Post, User
+
+
+def once_per_request(lookup: Callable) -> Callable:
+    """Make a lookup return the same object for the same request."""
+    @wraps(lookup)
+    def cached_lookup(request: HttpRequest, *args):
+        results = request.__dict__.setdefault('_posts_lookups', {})
+        key = (lookup.__name__, *args)
+        if key not in results:
+            results[key] = lookup(request, *args)
+        return results[key]
+    return cached_lookup
+
+
+@once_per_request
+def profile_author(request: HttpRequest, username: str) -> Optional[User]:
+    """Get the author of a profile page.
+
+    The author comes with `posts_num`, the amount of posts from the
+    denormalized counters, and `is_following`, whether the current user
+    follows the author.
+
+    Args:
+        request: the current request;
+        username: username of the author.
+
+    Returns:
+        author, None if there is no such user.
+    """
+    if request.user.is_authenticated:
+        following = Exists(Follow.objects.filter(
+            user=request.user, author=OuterRef('pk')))
+    else:
+        following = Value(False, output_field=BooleanField())
+    return User.objects.select_related('stats').annotate(
+        posts_num=Coalesce(F('stats__posts_count'), 0),
+        is_following=following,
+    ).filter(username=username).first()
+
+
+@once_per_request
+def detail_post(request: HttpRequest, post_id: int) -> Optional[Post]:
+    """Get the post of a post page.
+
+    The post comes with its author, group and `author_posts_num`, the
+    amount of posts of the author from the denormalized counters.
+
+    Args:
+        request: the current request;
+        post_id: primary key of the post.
+
+    Returns:
+        post, None if there is no such post.
+    """
+    return Post.objects.select_related('author', 'group').annotate(
+        author_posts_num=Coalesce(F('author__stats__posts_count'), 0),
+    ).filter(pk=post_id).first()
@@ -0,0 +1,59 @@
+"""Command to delete media files no post refers to."""
+
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.storage import content_storage
+from posts.models import Post
+
+IMAGE_DIRECTORY = 'posts'
+
+
+class Command(BaseCommand):
+    """Delete orphaned post images and thumbnails.
+
+    Files are shared between posts and never deleted when a post is
+    edited or deleted, so images and thumbnails nothing refers to anymore
+    pile up in the storage, along with files left by interrupted saves.
+    Files younger than --min-age are kept, as a post may be about to be
+    saved with them.
+    """
+
+    help = 'Delete post images and thumbnails no post refers to.'
+
+    def add_arguments(self, parser) -> None:
+        """Add command arguments."""
+        parser.add_argument(
+            '--min-age', type=int, default=60 * 60,
+            help='seconds since the last change of a file to delete it',
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='only report the files to delete',
+        )
+
+    def handle(self, *args, **options) -> None:
+        """Run the command."""
+        started = time.time()
+        referenced = set()
+        posts = Post.objects.exclude(image='').values_list(
+            'image', 'thumbnail', 'thumbnail_variants')
+        for image, thumbnail, variants in posts.iterator():
+            referenced.update((image, thumbnail))
+            for files in json.loads(variants or '{}').values():
+                referenced.update(name for name, _ in files)
+        deleted = freed = 0
+        for name, modified in content_storage.walk(IMAGE_DIRECTORY):
+            if name in referenced or modified > started - options['min_age']:
+                continue
+            deleted += 1
+            freed += content_storage.size(name)
+            if not options['dry_run']:
+                content_storage.delete(name)
+        action = 'to delete' if options['dry_run'] else 'deleted'
+        self.stdout.write(
+            f'orphaned files {action}: {deleted}, '
+            f'{freed / 2 ** 20:.1f} MB'
+        )
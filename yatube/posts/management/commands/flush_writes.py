@@ -0,0 +1,51 @@
+"""Command to save comments and subscriptions of the write-behind queue."""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import writes
+
+
+class Command(BaseCommand):
+    """Apply the write-behind queue to the database.
+
+    Saves all queued writes and exits, or with --watch keeps saving new
+    ones until interrupted, for deployments whose web processes run
+    without WRITE_BEHIND_FLUSHER. Refuses to run while another flusher
+    holds the lock of the queue.
+    """
+
+    help = 'Save queued comments and subscriptions.'
+
+    def add_arguments(self, parser) -> None:
+        """Add command arguments."""
+        parser.add_argument(
+            '--watch', action='store_true',
+            help='keep saving new writes until interrupted',
+        )
+
+    def handle(self, *args, **options) -> None:
+        """Run the command."""
+        queue = writes.get_queue()
+        if not queue.lock():
+            raise CommandError('Another flusher is saving the queue.')
+        try:
+            if options['watch']:
+                try:
+                    writes.run_flusher()
+                except KeyboardInterrupt:
+                    return
+            started = time.perf_counter()
+            applied = 0
+            while True:
+                batch = writes.flush()
+                if not batch:
+                    break
+                applied += batch
+            self.stdout.write(
+                f'saved writes: {applied} in '
+                f'{time.perf_counter() - started:.1f} s'
+            )
+        finally:
+            queue.unlock()
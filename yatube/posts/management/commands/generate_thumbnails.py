@@ -0,0 +1,81 @@
+"""Command to render missing thumbnails of post images."""
+
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    """Render thumbnail variants of posts in parallel.
+
+    Picks up posts uploaded before thumbnails or their variants existed
+    and posts whose thumbnail was lost, e.g. when a worker process was
+    stopped before rendering it. Every distinct image is rendered once,
+    or not at all when another post already has its thumbnail. Images are
+    decoded and encoded in forked processes, one per CPU core by default,
+    while this process stores the results on the posts.
+    """
+
+    help = 'Render missing thumbnail variants of post images.'
+
+    def add_arguments(self, parser) -> None:
+        """Add command arguments."""
+        parser.add_argument(
+            '--processes', type=int, default=os.cpu_count(),
+            help='amount of rendering processes, 1 renders in this one',
+        )
+        parser.add_argument(
+            '--all', action='store_true',
+            help='render variants of every image again',
+        )
+
+    def handle(self, *args, **options) -> None:
+        """Run the command."""
+        pending = Post.objects.exclude(image='')
+        if not options['all']:
+            pending = pending.filter(
+                Q(thumbnail='') | Q(thumbnail_variants=''))
+        pending = list(pending.values_list('pk', 'image'))
+        images = list(dict.fromkeys(image for _, image in pending))
+        started = time.perf_counter()
+        results = {} if options['all'] else thumbnails.rendered(images)
+        images = [image for image in images if image not in results]
+        if options['processes'] > 1 and len(images) > 1:
+            executor = ProcessPoolExecutor(
+                options['processes'],
+                mp_context=multiprocessing.get_context('fork'),
+            )
+            with executor:
+                results.update(zip(images, executor.map(
+                    thumbnails.store, images, chunksize=8)))
+        else:
+            results.update(zip(images, map(thumbnails.store, images)))
+        rendered = self.save(pending, results)
+        self.stdout.write(
+            f'thumbnails rendered: {rendered} of {len(pending)} '
+            f'in {time.perf_counter() - started:.1f} s'
+        )
+
+    @staticmethod
+    def save(pending, results) -> int:
+        """Store rendered thumbnails on the posts.
+
+        Args:
+            pending: primary keys and image names of the posts;
+            results: values returned by `thumbnails.store` by image name.
+
+        Returns:
+            amount of posts with stored thumbnails.
+        """
+        return sum(
+            results[image] is not None
+            and thumbnails.save(post_id, image, results[image])
+            for post_id, image in pending
+        )
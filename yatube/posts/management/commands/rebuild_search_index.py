@@ -0,0 +1,18 @@
+"""Command to index all posts and comments for search from scratch."""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.search import get_backend
+
+
+class Command(BaseCommand):
+    """Rebuild the search index, e.g. after rows were inserted raw."""
+
+    help = 'Index all posts and comments for search from scratch.'
+
+    def handle(self, *args, **options) -> None:
+        """Run the command."""
+        with transaction.atomic():
+            get_backend().rebuild()
+        self.stdout.write('search index rebuilt')
@@ -0,0 +1,100 @@
+"""Command to recompute denormalized counters of posts and users."""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from posts.models import Comment, Follow, Post, User, UserStats
+
+BATCH_SIZE = 1000
+
+
+def actual_count(model, field: str, outer: str) -> Coalesce:
+    """Get expression that counts related rows of a model.
+
+    Args:
+        model: model whose rows are counted;
+        field: field of the model pointing to the counted object;
+        outer: field of the updated row holding the counted object id.
+
+    Returns:
+        correlated subquery with the amount of rows.
+    """
+    count = model.objects.filter(
+        **{field: OuterRef(outer)}
+    ).order_by().values(field).annotate(
+        count=Count('pk')
+    ).values('count')
+    return Coalesce(Subquery(count, output_field=IntegerField()), 0)
+
+
+def repair(queryset, counter: str, expression: Coalesce) -> int:
+    """Overwrite a counter with its actual value where they differ.
+
+    Args:
+        queryset: rows holding the counter;
+        counter: name of the counter field;
+        expression: expression with the actual value.
+
+    Returns:
+        amount of repaired rows.
+    """
+    return queryset.exclude(
+        **{counter: expression}
+    ).update(**{counter: expression})
+
+
+def create_missing_stats() -> int:
+    """Create zeroed counters for users that have none.
+
+    Returns:
+        amount of created rows.
+    """
+    missing = User.objects.filter(stats__isnull=True).values_list(
+        'pk', flat=True).iterator()
+    created = 0
+    batch = []
+    for user_id in missing:
+        batch.append(UserStats(user_id=user_id))
+        if len(batch) == BATCH_SIZE:
+            UserStats.objects.bulk_create(batch, ignore_conflicts=True)
+            created += len(batch)
+            batch = []
+    UserStats.objects.bulk_create(batch, ignore_conflicts=True)
+    return created + len(batch)
+
+
+class Command(BaseCommand):
+    """Recompute counters and repair the ones that drifted."""
+
+    help = 'Recompute denormalized counters of posts and users.'
+
+    def handle(self, *args, **options) -> None:
+        """Run the command."""
+        with transaction.atomic():
+            repaired = {
+                'user stats created': create_missing_stats(),
+                'post comments_count': repair(
+                    Post.objects.all(), 'comments_count',
+                    actual_count(Comment, 'post', 'pk')
+                ),
+                'user posts_count': repair(
+                    UserStats.objects.all(), 'posts_count',
+                    actual_count(Post, 'author', 'user')
+                ),
+                'user followers_count': repair(
+                    UserStats.objects.all(), 'followers_count',
+                    actual_count(Follow, 'author', 'user')
+                ),
+                'user following_count': repair(
+                    UserStats.objects.all(), 'following_count',
+                    actual_count(Follow, 'user', 'user')
+                ),
+                'user comments_count': repair(
+                    UserStats.objects.all(), 'comments_count',
+                    actual_count(Comment, 'author', 'user')
+                ),
+            }
+        for name, amount in repaired.items():
+            self.stdout.write(f'{name}: {amount}')
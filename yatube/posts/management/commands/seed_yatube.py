@@ -0,0 +1,360 @@
+"""Command to fill the database with synthetic content for load testing."""
+
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from io import StringIO
+from typing import Iterable, Iterator, List, Sequence, Tuple
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from core.storage import content_storage
+from posts import caching, synthetic, thumbnails
+from posts.models import Comment, Follow, Group, Post, TimelineEntry, User
+
+# State of the run, set before generating processes are forked from this
+# one, so they inherit it instead of receiving it with every chunk.
+plan = {}
+
+IMAGE_FIELDS = (
+    'image', 'thumbnail', 'thumbnail_width', 'thumbnail_height',
+    'thumbnail_variants',
+)
+
+POST_FIELDS = (
+    'text', 'pub_date', 'updated', 'author', 'group', *IMAGE_FIELDS,
+    'comments_count',
+)
+
+NO_IMAGE = ('', '', None, None, '')
+
+
+def prepare(
+    model, fields: Sequence[str], rows: Iterable[tuple],
+) -> List[tuple]:
+    """Convert values of rows to database values.
+
+    Args:
+        model: model class the rows belong to;
+        fields: model field names in the order of values in rows;
+        rows: tuples of values.
+    """
+    model_fields = [model._meta.get_field(name) for name in fields]
+    return [
+        tuple(field.get_db_prep_save(value, connection)
+              for field, value in zip(model_fields, row))
+        for row in rows
+    ]
+
+
+def insert(
+    model, fields: Sequence[str], batch: List[tuple],
+    ignore_conflicts: bool = False,
+) -> int:
+    """Insert prepared rows into the table of a model in one transaction.
+
+    Unlike `bulk_create`, keeps the given values of `auto_now_add` fields
+    and skips building model instances.
+
+    Args:
+        model: model class the table belongs to;
+        fields: model field names in the order of values in rows;
+        batch: tuples of database values;
+        ignore_conflicts: whether to skip rows violating constraints.
+
+    Returns:
+        amount of inserted rows.
+    """
+    if not batch:
+        return 0
+    ops = connection.ops
+    opts = model._meta
+    model_fields = [opts.get_field(name) for name in fields]
+    sql = '{insert} {table} ({columns}) VALUES ({values}) {suffix}'.format(
+        insert=ops.insert_statement(ignore_conflicts=ignore_conflicts),
+        table=ops.quote_name(opts.db_table),
+        columns=', '.join(
+            ops.quote_name(field.column) for field in model_fields),
+        values=', '.join(['%s'] * len(fields)),
+        suffix=ops.ignore_conflicts_suffix_sql(
+            ignore_conflicts=ignore_conflicts),
+    )
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.executemany(sql, batch)
+        return cursor.rowcount if cursor.rowcount >= 0 else len(batch)
+
+
+def chunk_range(kind: str, chunk: int) -> range:
+    """Get numbers of the rows of a chunk."""
+    size = plan['batch_size']
+    return range(chunk * size, min((chunk + 1) * size, plan[kind]))
+
+
+def generate_posts(chunk: int) -> List[tuple]:
+    """Generate rows of posts: text, dates, author, group and image."""
+    rng = synthetic.chunk_random(plan['seed'], 'posts', chunk)
+    numbers = chunk_range('posts', chunk)
+    authors = plan['authors'].pick(rng, len(numbers))
+    rows = []
+    for number, author, text in zip(numbers, authors, synthetic.texts(
+            rng, plan['words'], len(numbers), 5, 60)):
+        pub_date = plan['start'] + plan['step'] * number
+        group = (rng.choice(plan['group_ids'])
+                 if plan['group_ids'] and rng.random() < 0.7 else None)
+        image = (rng.choice(plan['images'])
+                 if plan['images'] and rng.random() < plan['image_share']
+                 else NO_IMAGE)
+        rows.append((text, pub_date, pub_date, author, group, *image, 0))
+    return rows
+
+
+def generate_comments(chunk: int) -> List[tuple]:
+    """Generate rows of comments: post, author, text and date."""
+    rng = synthetic.chunk_random(plan['seed'], 'comments', chunk)
+    amount = len(chunk_range('comments', chunk))
+    authors = plan['authors'].pick(rng, amount)
+    rows = []
+    for author, text in zip(authors, synthetic.texts(
+            rng, plan['words'], amount, 2, 20)):
+        number = rng.randrange(plan['posts'])
+        created = plan['start'] + plan['step'] * number + timedelta(
+            seconds=rng.randrange(3 * 24 * 3600))
+        rows.append((plan['first_post_id'] + number, author, text,
+                     min(created, plan['now'])))
+    return rows
+
+
+def generate_follows(chunk: int) -> List[tuple]:
+    """Generate distinct rows of subscriptions: follower and author."""
+    rng = synthetic.chunk_random(plan['seed'], 'follows', chunk)
+    amount = len(chunk_range('follows', chunk))
+    rows = set()
+    for author in plan['authors'].pick(rng, amount):
+        user = rng.choice(plan['authors'].items)
+        if user != author:
+            rows.add((user, author))
+    return sorted(rows)
+
+
+COMMENT_FIELDS = ('post', 'author', 'text', 'created')
+
+FOLLOW_FIELDS = ('user', 'author')
+
+GENERATORS = {
+    'posts': (Post, POST_FIELDS, generate_posts),
+    'comments': (Comment, COMMENT_FIELDS, generate_comments),
+    'follows': (Follow, FOLLOW_FIELDS, generate_follows),
+}
+
+
+def generate(task: Tuple[str, int]) -> List[tuple]:
+    """Generate prepared rows of a chunk of a kind."""
+    kind, chunk = task
+    model, fields, generator = GENERATORS[kind]
+    return prepare(model, fields, generator(chunk))
+
+
+class Command(BaseCommand):
+    """Fill the database with synthetic users, groups, posts and comments.
+
+    Rows are generated in chunks by forked processes, one per CPU core by
+    default, while this process inserts every chunk in a transaction of
+    its own as soon as it is ready. The same seed and sizes give the same
+    content, with dates counted back from the start of the current day.
+    Counters and the search index are rebuilt at the end, and personal
+    feeds are filled with the latest posts of the followed authors.
+    """
+
+    help = 'Fill the database with synthetic content for load testing.'
+
+    def add_arguments(self, parser) -> None:
+        """Add command arguments."""
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=30000)
+        parser.add_argument('--follows', type=int, default=20000)
+        parser.add_argument(
+            '--images', type=int, default=0,
+            help='amount of distinct fake images to attach to posts',
+        )
+        parser.add_argument(
+            '--image-share', type=float, default=0.3,
+            help='share of posts with an image',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--processes', type=int, default=os.cpu_count(),
+            help='amount of generating processes, 1 generates in this one',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=10000,
+            help='rows generated and inserted at once',
+        )
+
+    def handle(self, *args, **options) -> None:
+        """Run the command."""
+        started = time.perf_counter()
+        seed = options['seed']
+        now = timezone.now()
+        start = now.replace(
+            hour=0, minute=0, second=0, microsecond=0) - timedelta(days=365)
+        plan.clear()
+        plan.update(
+            seed=seed,
+            batch_size=options['batch_size'],
+            posts=options['posts'],
+            comments=options['comments'],
+            follows=options['follows'],
+            image_share=options['image_share'],
+            start=start,
+            now=now,
+            step=timedelta(days=365) / max(options['posts'], 1),
+            words=synthetic.PowerLaw(synthetic.vocabulary()),
+        )
+        if not options['users'] and (
+                options['posts'] or options['comments'] or options['follows']):
+            raise CommandError('Content needs at least one user.')
+        prefix = f'user{seed}_'
+        user_fields = (
+            'username', 'password', 'first_name', 'last_name', 'email',
+            'is_superuser', 'is_staff', 'is_active', 'date_joined',
+        )
+        self.report('users', sum(
+            insert(User, user_fields, prepare(User, user_fields, (
+                (f'{prefix}{number}', '!', '', '', '', False, False, True,
+                 start) for number in range(
+                    first, min(first + plan['batch_size'], options['users']))
+            )))
+            for first in range(0, options['users'], plan['batch_size'])
+        ))
+        plan['authors'] = synthetic.PowerLaw(list(
+            User.objects.filter(username__startswith=prefix).order_by(
+                'pk').values_list('pk', flat=True)))
+        group_fields = ('title', 'slug', 'description')
+        self.report('groups', insert(
+            Group, group_fields, prepare(Group, group_fields, (
+                (f'Группа {seed}-{number}', f'group-{seed}-{number}', '')
+                for number in range(options['groups'])
+            )),
+        ))
+        plan['group_ids'] = list(
+            Group.objects.filter(slug__startswith=f'group-{seed}-').order_by(
+                'pk').values_list('pk', flat=True))
+        plan['images'] = self.create_images(seed, options['images'])
+        last_post_id = Post.objects.aggregate(last=Max('pk'))['last'] or 0
+        self.processes = options['processes']
+        self.report('posts', sum(
+            insert(Post, POST_FIELDS, batch)
+            for batch in self.chunks('posts')
+        ))
+        plan['first_post_id'] = Post.objects.filter(
+            pk__gt=last_post_id).aggregate(first=Min('pk'))['first']
+        if plan['first_post_id'] is None:
+            plan['comments'] = 0
+        self.report('comments', sum(
+            insert(Comment, COMMENT_FIELDS, batch)
+            for batch in self.chunks('comments')
+        ))
+        self.report('follows', sum(
+            insert(Follow, FOLLOW_FIELDS, batch, ignore_conflicts=True)
+            for batch in self.chunks('follows')
+        ))
+        self.report('timeline entries', self.fill_timelines())
+        call_command('recount_counters', stdout=StringIO())
+        call_command('rebuild_search_index', stdout=StringIO())
+        caching.bump(caching.GLOBAL_VERSION)
+        self.stdout.write(
+            f'done in {time.perf_counter() - started:.1f} s')
+
+    def chunks(self, kind: str) -> Iterator[List[tuple]]:
+        """Generate prepared rows of a kind chunk by chunk, in order.
+
+        Processes are forked for every kind, after the plan got everything
+        rows of the kind depend on. Only a few chunks are generated ahead
+        of the one being inserted, which bounds the memory the run takes.
+        """
+        count = -(-plan[kind] // plan['batch_size'])
+        if self.processes < 2 or count < 2:
+            yield from (generate((kind, chunk)) for chunk in range(count))
+            return
+        executor = ProcessPoolExecutor(
+            self.processes, mp_context=multiprocessing.get_context('fork'))
+        with executor:
+            pending = deque()
+            for chunk in range(count):
+                pending.append(executor.submit(generate, (kind, chunk)))
+                if len(pending) > 2 * self.processes:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def fill_timelines(self) -> int:
+        """Fill personal feeds of the seeded users with one INSERT.
+
+        Does for all subscriptions at once what following an author does:
+        the follower gets the TIMELINE_BACKFILL_LIMIT latest posts of
+        the author.
+
+        Returns:
+            amount of created timeline entries.
+        """
+        users = plan['authors'].items
+        if not users:
+            return 0
+        ops = connection.ops
+        names = {
+            'entry': TimelineEntry._meta.db_table,
+            'follow': Follow._meta.db_table,
+            'post': Post._meta.db_table,
+        }
+        names = {key: ops.quote_name(name) for key, name in names.items()}
+        sql = (
+            '{insert} {entry} (user_id, post_id, pub_date) '
+            'SELECT follow.user_id, post.id, post.pub_date '
+            'FROM {follow} follow INNER JOIN ('
+            'SELECT id, author_id, pub_date, ROW_NUMBER() OVER ('
+            'PARTITION BY author_id ORDER BY pub_date DESC) AS number '
+            'FROM {post}) post ON post.author_id = follow.author_id '
+            'WHERE follow.user_id BETWEEN %s AND %s AND post.number <= %s '
+            '{suffix}'
+        ).format(
+            insert=ops.insert_statement(ignore_conflicts=True),
+            suffix=ops.ignore_conflicts_suffix_sql(ignore_conflicts=True),
+            **names,
+        )
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(sql, [
+                min(users), max(users), settings.TIMELINE_BACKFILL_LIMIT])
+            return cursor.rowcount
+
+    def create_images(self, seed: int, amount: int) -> List[tuple]:
+        """Store distinct fake images with their thumbnails.
+
+        Returns:
+            values of the image fields of a post for every image.
+        """
+        rng = synthetic.chunk_random(seed, 'images', 0)
+        images = []
+        for _ in range(amount):
+            name = content_storage.save(
+                f'{Post._meta.get_field("image").upload_to}synthetic.jpg',
+                ContentFile(synthetic.image(rng)))
+            fields = {'image': name, **thumbnails.store(name)}
+            images.append(tuple(fields[field] for field in IMAGE_FIELDS))
+        if images:
+            self.report('images', len(images))
+        return images
+
+    def report(self, name: str, amount: int) -> None:
+        """Print amount of created objects."""
+        self.stdout.write(f'{name} created: {amount}')
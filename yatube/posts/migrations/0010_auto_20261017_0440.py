@@ -0,0 +1,68 @@
+# Generated by Django 2.2.16 on 2026-10-17 04:40
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+def count_of(model, field, outer):
+    count = model.objects.filter(
+        **{field: OuterRef(outer)}
+    ).order_by().values(field).annotate(
+        count=Count('pk')
+    ).values('count')
+    return Coalesce(
+        Subquery(count, output_field=models.IntegerField()), 0
+    )
+
+
+def populate_counters(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    Comment = apps.get_model('posts', 'Comment')
+    Follow = apps.get_model('posts', 'Follow')
+    Post = apps.get_model('posts', 'Post')
+    UserStats = apps.get_model('posts', 'UserStats')
+    UserStats.objects.bulk_create(
+        [
+            UserStats(user_id=pk)
+            for pk in User.objects.values_list('pk', flat=True)
+        ],
+        batch_size=1000,
+    )
+    Post.objects.update(comments_count=count_of(Comment, 'post', 'pk'))
+    UserStats.objects.update(
+        posts_count=count_of(Post, 'author', 'user'),
+        followers_count=count_of(Follow, 'author', 'user'),
+        following_count=count_of(Follow, 'user', 'user'),
+        comments_count=count_of(Comment, 'author', 'user'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0009_auto_20261017_0438'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Количество комментариев'),
+        ),
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('posts_count', models.IntegerField(default=0, verbose_name='Количество постов')),
+                ('followers_count', models.IntegerField(default=0, verbose_name='Количество подписчиков')),
+                ('following_count', models.IntegerField(default=0, verbose_name='Количество подписок')),
+                ('comments_count', models.IntegerField(default=0, verbose_name='Количество комментариев')),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 2.2.16 on 2026-10-17 05:05
+
+from django.db import migrations
+
+TOKENIZER = "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'"
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in (
+        f'CREATE VIRTUAL TABLE posts_post_fts USING fts5(text, {TOKENIZER})',
+        'CREATE VIRTUAL TABLE posts_comment_fts '
+        f'USING fts5(text, post_id UNINDEXED, {TOKENIZER})',
+        'INSERT INTO posts_post_fts (rowid, text) '
+        'SELECT id, text FROM posts_post',
+        'INSERT INTO posts_comment_fts (rowid, text, post_id) '
+        'SELECT id, text, post_id FROM posts_comment',
+    ):
+        schema_editor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute('DROP TABLE IF EXISTS posts_post_fts')
+    schema_editor.execute('DROP TABLE IF EXISTS posts_comment_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_post_updated'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 2.2.16 on 2026-10-17 05:10
+
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_post_thumbnail_variants'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, storage=core.storage.ContentAddressedStorage(), upload_to='posts/', verbose_name='Картинка'),
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='thumbnail',
+            field=models.ImageField(blank=True, editable=False, storage=core.storage.ContentAddressedStorage(), upload_to='posts/thumbnails/', verbose_name='Миниатюра'),
+        ),
+    ]
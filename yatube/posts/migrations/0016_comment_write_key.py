@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-17 06:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_content_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='write_key',
+            field=models.CharField(editable=False, max_length=32, null=True, unique=True, verbose_name='Ключ записи из очереди'),
+        ),
+    ]
@@ -1,11 +1,24 @@
 """Module with models of posts app."""
 
+import json
+from typing import Dict, List
+
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import connections, models, transaction
+from django.db.models import F
 from django.db.models.deletion import PROTECT
 
+from core.storage import content_storage
+
 User = get_user_model()
 
+FEED_DEFERRED_FIELDS = (
+    'author__password',
+    'author__last_login',
+    'author__date_joined',
+    'group__description',
+)
+
 
 class Group(models.Model):
     """Model for group."""
@@ -19,6 +32,34 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    """QuerySet of posts with shortcuts for listing pages."""
+
+    def for_feed(self) -> 'PostQuerySet':
+        """Get posts prepared for rendering in a feed.
+
+        Author and group are joined in the same query and columns that the
+        feed templates never show are deferred, so a page of posts is
+        rendered without any per-row queries.
+        """
+        return self.select_related(
+            'author', 'group'
+        ).defer(
+            *FEED_DEFERRED_FIELDS
+        )
+
+    def change_comments_count(self, post_id: int, delta: int) -> None:
+        """Shift the comments counter of a post.
+
+        Args:
+            post_id: primary key of the post;
+            delta: amount to add, negative to subtract.
+        """
+        self.filter(pk=post_id).update(
+            comments_count=F('comments_count') + delta
+        )
+
+
 class Post(models.Model):
     """Model for post."""
 
@@ -30,6 +71,10 @@ class Post(models.Model):
         auto_now_add=True,
         verbose_name='Дата публикации'
     )
+    updated = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения'
+    )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -48,18 +93,77 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=content_storage,
         blank=True
     )
+    thumbnail = models.ImageField(
+        'Миниатюра',
+        upload_to='posts/thumbnails/',
+        storage=content_storage,
+        blank=True,
+        editable=False
+    )
+    thumbnail_width = models.PositiveIntegerField(
+        verbose_name='Ширина миниатюры',
+        null=True,
+        editable=False
+    )
+    thumbnail_height = models.PositiveIntegerField(
+        verbose_name='Высота миниатюры',
+        null=True,
+        editable=False
+    )
+    thumbnail_variants = models.TextField(
+        verbose_name='Варианты миниатюры',
+        blank=True,
+        editable=False
+    )
+    comments_count = models.IntegerField(
+        verbose_name='Количество комментариев',
+        default=0,
+        editable=False
+    )
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         """Meta-class for post model."""
 
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(fields=['-pub_date'], name='post_pub_date_idx'),
+            models.Index(
+                fields=['author', '-pub_date'], name='post_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=['group', '-pub_date'], name='post_group_pub_date_idx'
+            ),
+        ]
 
     def __str__(self) -> str:
         """Get string representation of post object."""
         return self.text[:15]
 
+    @property
+    def thumbnail_sources(self) -> List[Dict[str, str]]:
+        """Get `type` and `srcset` of every format of the thumbnail.
+
+        Formats go from the most compact to JPEG, in the order browsers
+        should pick them.
+        """
+        if not self.thumbnail_variants:
+            return []
+        return [
+            {
+                'type': mime,
+                'srcset': ', '.join(
+                    f'{content_storage.url(name)} {width}w'
+                    for name, width in files
+                ),
+            }
+            for mime, files in json.loads(self.thumbnail_variants).items()
+        ]
+
 
 class Comment(models.Model):
     """Model for comment."""
@@ -84,17 +188,84 @@ class Comment(models.Model):
         verbose_name='Дата публикации',
         auto_now_add=True
     )
+    write_key = models.CharField(
+        verbose_name='Ключ записи из очереди',
+        max_length=32,
+        unique=True,
+        null=True,
+        editable=False
+    )
 
     class Meta:
         """Meta-class for comment model."""
 
         ordering = ['-created']
+        indexes = [
+            models.Index(
+                fields=['post', '-created'], name='comment_post_created_idx'
+            ),
+        ]
 
     def __str__(self) -> str:
         """Get string representation of post object."""
         return self.text[:15]
 
 
+class FollowQuerySet(models.QuerySet):
+    """QuerySet of subscriptions with single-statement follow/unfollow."""
+
+    def follow(self, user: User, author: User) -> bool:
+        """Subscribe user to author.
+
+        Runs a single INSERT that skips an already existing pair on the
+        unique constraint, so concurrent requests never create duplicates.
+
+        Args:
+            user: subscriber;
+            author: author to subscribe to.
+
+        Returns:
+            True if the subscription has been created.
+        """
+        connection = connections[self.db]
+        ops = connection.ops
+        opts = self.model._meta
+        sql = '{insert} {table} ({user}, {author}) VALUES (%s, %s) {suffix}'
+        sql = sql.format(
+            insert=ops.insert_statement(ignore_conflicts=True),
+            table=ops.quote_name(opts.db_table),
+            user=ops.quote_name(opts.get_field('user').column),
+            author=ops.quote_name(opts.get_field('author').column),
+            suffix=ops.ignore_conflicts_suffix_sql(ignore_conflicts=True),
+        )
+        with transaction.atomic(using=self.db), connection.cursor() as cursor:
+            cursor.execute(sql, [user.pk, author.pk])
+            created = cursor.rowcount > 0
+            if created:
+                UserStats.objects.change_follow_counts(user, author, 1)
+        return created
+
+    def unfollow(self, user: User, author: User) -> bool:
+        """Unsubscribe user from author with a single DELETE.
+
+        The row is deleted without signals, so the counters are updated
+        here and callers prune the feed themselves.
+
+        Args:
+            user: subscriber;
+            author: author to unsubscribe from.
+
+        Returns:
+            True if the subscription has been deleted.
+        """
+        with transaction.atomic(using=self.db):
+            deleted = self.filter(user=user, author=author)._raw_delete(
+                self.db)
+            if deleted:
+                UserStats.objects.change_follow_counts(user, author, -1)
+        return deleted > 0
+
+
 class Follow(models.Model):
     """Model for follow."""
 
@@ -111,12 +282,115 @@ class Follow(models.Model):
         verbose_name='Подписка'
     )
 
+    objects = FollowQuerySet.as_manager()
+
     class Meta:
         """Meta-class for follow model."""
 
-        models.UniqueConstraint(
-            fields=['user', 'author'], name='unique_follow')
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'], name='unique_follow'),
+        ]
 
     def __str__(self) -> str:
         """Get string representation of post object."""
         return f'{self.user} follows {self.author}'
+
+
+class TimelineEntry(models.Model):
+    """Model for post delivered to the personal feed of a follower."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Подписчик'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост'
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации'
+    )
+
+    class Meta:
+        """Meta-class for timeline entry model."""
+
+        ordering = ['-pub_date']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='unique_timeline_entry'),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date'], name='timeline_user_pub_date_idx'
+            ),
+        ]
+
+    def __str__(self) -> str:
+        """Get string representation of timeline entry object."""
+        return f'{self.post} for {self.user}'
+
+
+class UserStatsQuerySet(models.QuerySet):
+    """QuerySet of user counters updated with F() expressions."""
+
+    def change(self, user_id: int, **deltas: int) -> None:
+        """Shift counters of a user.
+
+        Args:
+            user_id: primary key of the user;
+            deltas: amounts to add to counters, negative to subtract.
+        """
+        self.filter(user_id=user_id).update(**{
+            name: F(name) + delta for name, delta in deltas.items()
+        })
+
+    def change_follow_counts(
+        self, user: User, author: User, delta: int,
+    ) -> None:
+        """Shift subscription counters of a follower and an author.
+
+        Args:
+            user: subscriber;
+            author: followed author;
+            delta: 1 for a new subscription, -1 for a removed one.
+        """
+        self.change(user.pk, following_count=delta)
+        self.change(author.pk, followers_count=delta)
+
+
+class UserStats(models.Model):
+    """Model for denormalized counters of user."""
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='stats',
+        verbose_name='Пользователь'
+    )
+    posts_count = models.IntegerField(
+        verbose_name='Количество постов',
+        default=0
+    )
+    followers_count = models.IntegerField(
+        verbose_name='Количество подписчиков',
+        default=0
+    )
+    following_count = models.IntegerField(
+        verbose_name='Количество подписок',
+        default=0
+    )
+    comments_count = models.IntegerField(
+        verbose_name='Количество комментариев',
+        default=0
+    )
+
+    objects = UserStatsQuerySet.as_manager()
+
+    def __str__(self) -> str:
+        """Get string representation of user stats object."""
+        return f'Stats of {self.user}'
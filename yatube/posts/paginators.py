@@ -0,0 +1,181 @@
+"""Module with keyset (cursor) pagination."""
+
+import base64
+import binascii
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+from django.db.models import Q
+from django.db.models.query import QuerySet
+from django.utils.dateparse import parse_datetime
+
+FORWARD = 'n'
+BACKWARD = 'p'
+
+
+def encode_cursor(direction: str, date: datetime, pk: int) -> str:
+    """Build an opaque cursor token.
+
+    Args:
+        direction: FORWARD for older objects, BACKWARD for newer ones;
+        date: date of the object the page starts after;
+        pk: primary key of the same object.
+
+    Returns:
+        url-safe token.
+    """
+    raw = f'{direction}|{date.isoformat()}|{pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token: str) -> Optional[Tuple[str, datetime, int]]:
+    """Parse a cursor token built by `encode_cursor`.
+
+    Args:
+        token: token from the query string.
+
+    Returns:
+        direction, date and primary key, or None for a malformed token.
+    """
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        direction, date, pk = raw.split('|')
+        date = parse_datetime(date)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if direction not in (FORWARD, BACKWARD) or date is None:
+        return None
+    return direction, date, pk
+
+
+class CursorPage:
+    """Page of objects produced by `CursorPaginator`."""
+
+    def __init__(
+        self, object_list: List[Any], paginator: 'CursorPaginator',
+        next_cursor: Optional[str], previous_cursor: Optional[str],
+        cursor: Optional[str] = None,
+    ) -> None:
+        """Create page object."""
+        self.object_list = object_list
+        self.paginator = paginator
+        self.cursor = cursor
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self) -> str:
+        """Get string representation of page object."""
+        return f'<CursorPage of {len(self)} objects>'
+
+    def __len__(self) -> int:
+        """Get amount of objects on the page."""
+        return len(self.object_list)
+
+    def __iter__(self):
+        """Iterate over objects on the page."""
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        """Get object of the page by index."""
+        return self.object_list[index]
+
+    def has_next(self) -> bool:
+        """Check if there are older objects."""
+        return self.next_cursor is not None
+
+    def has_previous(self) -> bool:
+        """Check if there are newer objects."""
+        return self.previous_cursor is not None
+
+    def has_other_pages(self) -> bool:
+        """Check if there is any page besides this one."""
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """Paginator that seeks by `(date, pk)` instead of OFFSET.
+
+    Objects are listed newest first. Pages are addressed by opaque cursor
+    tokens, so neither COUNT(*) nor OFFSET is ever executed and the cost of
+    a page does not depend on how deep it is. Querysets of `.values()` are
+    paginated too, as long as they select `pk` and the date field.
+    """
+
+    keyset = True
+
+    def __init__(
+        self, object_list: QuerySet, per_page: int,
+        date_field: str = 'pub_date',
+    ) -> None:
+        """Create paginator.
+
+        Args:
+            object_list: queryset to paginate;
+            per_page: amount of objects on page;
+            date_field: name of the datetime field to order by.
+        """
+        self.object_list = object_list
+        self.per_page = per_page
+        self.date_field = date_field
+
+    def _cursor(self, direction: str, obj: Any) -> str:
+        if isinstance(obj, dict):
+            return encode_cursor(direction, obj[self.date_field], obj['pk'])
+        return encode_cursor(
+            direction, getattr(obj, self.date_field), obj.pk
+        )
+
+    def get_page(self, token: Optional[str]) -> CursorPage:
+        """Get page that starts right after the cursor.
+
+        Args:
+            token: cursor token, an empty or malformed one means first page.
+
+        Returns:
+            page of objects.
+        """
+        cursor = decode_cursor(token) if token else None
+        date_field = self.date_field
+        if cursor is None:
+            direction = FORWARD
+            queryset = self.object_list
+        else:
+            direction, date, pk = cursor
+            if direction == FORWARD:
+                queryset = self.object_list.filter(
+                    Q(**{f'{date_field}__lt': date})
+                    | Q(**{date_field: date, 'pk__lt': pk})
+                )
+            else:
+                queryset = self.object_list.filter(
+                    Q(**{f'{date_field}__gt': date})
+                    | Q(**{date_field: date, 'pk__gt': pk})
+                )
+        if direction == FORWARD:
+            queryset = queryset.order_by(f'-{date_field}', '-pk')
+        else:
+            queryset = queryset.order_by(date_field, 'pk')
+        objects = list(queryset[:self.per_page + 1])
+        has_more = len(objects) > self.per_page
+        objects = objects[:self.per_page]
+        if direction == BACKWARD:
+            objects.reverse()
+        if cursor is None:
+            token = None
+        if not objects:
+            return CursorPage(objects, self, None, None, token)
+        if direction == FORWARD:
+            has_next, has_previous = has_more, cursor is not None
+        else:
+            has_next, has_previous = True, has_more
+        next_cursor = (
+            self._cursor(FORWARD, objects[-1]) if has_next else None
+        )
+        previous_cursor = (
+            self._cursor(BACKWARD, objects[0]) if has_previous else None
+        )
+        return CursorPage(
+            objects, self, next_cursor, previous_cursor, token
+        )
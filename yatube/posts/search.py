@@ -0,0 +1,216 @@
+"""Module with full-text search over posts and their comments.
+
+The backend is chosen with SEARCH_BACKEND. `FTS5Backend` keeps an inverted
+index in SQLite FTS5 tables updated by signal handlers on every save and
+delete of a post or a comment, and ranks results with bm25.
+`DatabaseBackend` needs no index and works on any database, but scans
+every post with `icontains`.
+"""
+
+import re
+from functools import lru_cache
+from typing import List, Sequence, Union
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.db.models.query import QuerySet
+from django.utils.module_loading import import_string
+
+from .models import Comment, Post
+
+POST_TABLE = 'posts_post_fts'
+COMMENT_TABLE = 'posts_comment_fts'
+
+COMMENT_WEIGHT = 0.5
+
+
+def terms(query: str) -> List[str]:
+    """Split a search query into lowercase words."""
+    return re.findall(r'\w+', query.lower())
+
+
+class SearchBackend:
+    """Interface of search backends."""
+
+    def index_post(self, post: Post) -> None:
+        """Add a created or changed post to the index."""
+
+    def remove_post(self, post_id: int) -> None:
+        """Remove a deleted post from the index."""
+
+    def index_comment(self, comment: Comment) -> None:
+        """Add a created or changed comment to the index."""
+
+    def remove_comment(self, comment_id: int) -> None:
+        """Remove a deleted comment from the index."""
+
+    def remove_post_comments(self, post_id: int) -> None:
+        """Remove all comments of a post being deleted from the index."""
+
+    def rebuild(self) -> None:
+        """Index all posts and comments from scratch."""
+
+    def search(self, query: str) -> Union[QuerySet, Sequence[Post]]:
+        """Find posts matching every word of the query.
+
+        Args:
+            query: words to search for.
+
+        Returns:
+            posts prepared for rendering in a feed, best matches first;
+            the result supports `count()` and slicing, so it can be
+            paginated.
+        """
+        raise NotImplementedError
+
+
+class DatabaseBackend(SearchBackend):
+    """Search by scanning texts of posts and comments."""
+
+    def search(self, query: str) -> QuerySet:
+        """Find posts containing every word in the text or a comment."""
+        words = terms(query)
+        if not words:
+            return Post.objects.none()
+        posts = Post.objects.for_feed()
+        for term in words:
+            posts = posts.filter(
+                Q(text__icontains=term)
+                | Q(pk__in=Comment.objects.filter(
+                    text__icontains=term).values('post'))
+            )
+        return posts
+
+
+class RankedPosts:
+    """Lazy list of posts found by `FTS5Backend`, best matches first."""
+
+    RANKED_SQL = (
+        f'SELECT post_id FROM ('
+        f'SELECT rowid AS post_id, bm25({POST_TABLE}) AS rank '
+        f'FROM {POST_TABLE} WHERE {POST_TABLE} MATCH %s '
+        f'UNION ALL '
+        f'SELECT post_id, bm25({COMMENT_TABLE}) * %s '
+        f'FROM {COMMENT_TABLE} WHERE {COMMENT_TABLE} MATCH %s'
+        f') GROUP BY post_id ORDER BY MIN(rank), post_id DESC '
+        f'LIMIT %s OFFSET %s'
+    )
+    COUNT_SQL = (
+        f'SELECT COUNT(*) FROM ('
+        f'SELECT rowid FROM {POST_TABLE} WHERE {POST_TABLE} MATCH %s '
+        f'UNION '
+        f'SELECT post_id FROM {COMMENT_TABLE} WHERE {COMMENT_TABLE} MATCH %s)'
+    )
+
+    def __init__(self, match: str) -> None:
+        """Create list.
+
+        Args:
+            match: FTS5 query expression.
+        """
+        self.match = match
+
+    def count(self) -> int:
+        """Get amount of found posts."""
+        with connection.cursor() as cursor:
+            cursor.execute(self.COUNT_SQL, [self.match, self.match])
+            return cursor.fetchone()[0]
+
+    def __len__(self) -> int:
+        """Get amount of found posts."""
+        return self.count()
+
+    def __getitem__(self, index: slice) -> List[Post]:
+        """Get a slice of found posts with their authors and groups."""
+        start = index.start or 0
+        with connection.cursor() as cursor:
+            cursor.execute(self.RANKED_SQL, [
+                self.match, COMMENT_WEIGHT, self.match,
+                index.stop - start, start,
+            ])
+            ids = [row[0] for row in cursor.fetchall()]
+        posts = Post.objects.for_feed().in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
+
+
+class FTS5Backend(SearchBackend):
+    """Search with SQLite FTS5 index tables.
+
+    Every word of a query matches words starting with it, so inflected
+    forms like "посты" are found by "пост".
+    """
+
+    def _execute(self, sql: str, params: Sequence = ()) -> None:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+
+    def index_post(self, post: Post) -> None:
+        """Replace the indexed text of a post."""
+        self.remove_post(post.pk)
+        self._execute(
+            f'INSERT INTO {POST_TABLE} (rowid, text) VALUES (%s, %s)',
+            [post.pk, post.text]
+        )
+
+    def remove_post(self, post_id: int) -> None:
+        """Remove the indexed text of a post."""
+        self._execute(
+            f'DELETE FROM {POST_TABLE} WHERE rowid = %s', [post_id]
+        )
+
+    def index_comment(self, comment: Comment) -> None:
+        """Replace the indexed text of a comment."""
+        self.remove_comment(comment.pk)
+        self._execute(
+            f'INSERT INTO {COMMENT_TABLE} (rowid, text, post_id) '
+            f'VALUES (%s, %s, %s)',
+            [comment.pk, comment.text, comment.post_id]
+        )
+
+    def remove_comment(self, comment_id: int) -> None:
+        """Remove the indexed text of a comment."""
+        self._execute(
+            f'DELETE FROM {COMMENT_TABLE} WHERE rowid = %s', [comment_id]
+        )
+
+    def remove_post_comments(self, post_id: int) -> None:
+        """Remove the indexed texts of comments of a post.
+
+        Runs before the comments are deleted, so they are found by the
+        index of `posts_comment` instead of a scan of the index table.
+        """
+        self._execute(
+            f'DELETE FROM {COMMENT_TABLE} WHERE rowid IN '
+            f'(SELECT id FROM posts_comment WHERE post_id = %s)', [post_id]
+        )
+
+    def rebuild(self) -> None:
+        """Fill the index tables from posts and comments."""
+        self._execute(f'DELETE FROM {POST_TABLE}')
+        self._execute(f'DELETE FROM {COMMENT_TABLE}')
+        self._execute(
+            f'INSERT INTO {POST_TABLE} (rowid, text) '
+            f'SELECT id, text FROM posts_post'
+        )
+        self._execute(
+            f'INSERT INTO {COMMENT_TABLE} (rowid, text, post_id) '
+            f'SELECT id, text, post_id FROM posts_comment'
+        )
+        self._execute(f"INSERT INTO {POST_TABLE} ({POST_TABLE}) "
+                      f"VALUES ('optimize')")
+        self._execute(f"INSERT INTO {COMMENT_TABLE} ({COMMENT_TABLE}) "
+                      f"VALUES ('optimize')")
+
+    def search(self, query: str) -> RankedPosts:
+        """Find posts by their text or the text of their comments."""
+        words = terms(query)
+        if not words:
+            return Post.objects.none()
+        return RankedPosts(' '.join(f'"{word}"*' for word in words))
+
+
+@lru_cache(maxsize=None)
+def get_backend() -> SearchBackend:
+    """Get search backend set by SEARCH_BACKEND."""
+    return import_string(settings.SEARCH_BACKEND)()
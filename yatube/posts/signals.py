@@ -0,0 +1,221 @@
+"""Module with signal handlers of posts app."""
+
+import threading
+
+from django.db.models import Count
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from . import caching, search, thumbnails, timeline
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+# Posts being deleted in the current thread: comments cascaded with them
+# skip their own handlers, which `uncount_post_comments` runs in bulk.
+_deleting = threading.local()
+
+
+def _post_is_deleted(post_id: int) -> bool:
+    """Check if comments of the post are deleted along with it."""
+    return post_id in getattr(_deleting, 'posts', ())
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance: User, created: bool, **kwargs) -> None:
+    """Create zeroed counters for a new user."""
+    if created and not kwargs.get('raw'):
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance: Post, created: bool, **kwargs) -> None:
+    """Deliver a new post to the feeds of the author's followers."""
+    if created and not kwargs.get('raw'):
+        timeline.fan_out(instance)
+
+
+@receiver(post_save, sender=Post)
+def count_created_post(sender, instance: Post, created: bool, **kwargs):
+    """Increase posts counter of the author."""
+    if created and not kwargs.get('raw'):
+        UserStats.objects.change(instance.author_id, posts_count=1)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance: Post, **kwargs) -> None:
+    """Decrease posts counter of the author."""
+    UserStats.objects.change(instance.author_id, posts_count=-1)
+
+
+@receiver(post_save, sender=Comment)
+def count_created_comment(sender, instance: Comment, created: bool, **kwargs):
+    """Increase comments counters of the post and the author."""
+    if created and not kwargs.get('raw'):
+        Post.objects.change_comments_count(instance.post_id, 1)
+        UserStats.objects.change(instance.author_id, comments_count=1)
+
+
+@receiver(pre_delete, sender=Post)
+def uncount_post_comments(sender, instance: Post, **kwargs) -> None:
+    """Handle all comments of a deleted post at once.
+
+    Decreases comments counters of their authors with one UPDATE per
+    author, invalidates the authors' profiles and removes the comments
+    from the search index, instead of doing it for every comment.
+    """
+    authors = dict(
+        Comment.objects.filter(post_id=instance.pk).order_by().values_list(
+            'author').annotate(Count('pk'))
+    )
+    if authors:
+        for author_id, count in authors.items():
+            UserStats.objects.change(author_id, comments_count=-count)
+        caching.bump(*map(caching.author_feed, authors))
+        search.get_backend().remove_post_comments(instance.pk)
+    if not hasattr(_deleting, 'posts'):
+        _deleting.posts = set()
+    _deleting.posts.add(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def forget_deleted_post(sender, instance: Post, **kwargs) -> None:
+    """Let later comments of the post id run their handlers again."""
+    getattr(_deleting, 'posts', set()).discard(instance.pk)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance: Comment, **kwargs) -> None:
+    """Decrease comments counters of the post and the author."""
+    if _post_is_deleted(instance.post_id):
+        return
+    Post.objects.change_comments_count(instance.post_id, -1)
+    UserStats.objects.change(instance.author_id, comments_count=-1)
+
+
+@receiver(post_save, sender=Follow)
+def count_created_follow(sender, instance: Follow, created: bool, **kwargs):
+    """Increase subscription counters of a follow saved as a model.
+
+    `Follow.objects.follow()` inserts rows without signals and updates
+    the counters itself.
+    """
+    if created and not kwargs.get('raw'):
+        UserStats.objects.change_follow_counts(
+            instance.user, instance.author, 1)
+
+
+@receiver(post_delete, sender=Follow)
+def unfollow_deleted_follow(sender, instance: Follow, **kwargs) -> None:
+    """Update counters, feed and profiles of a follow deleted as a model.
+
+    `Follow.objects.unfollow()` deletes rows without signals and its
+    callers do the same themselves.
+    """
+    user, author = User(pk=instance.user_id), User(pk=instance.author_id)
+    UserStats.objects.change_follow_counts(user, author, -1)
+    timeline.prune(user, author)
+    timeline.refill([author.pk])
+    caching.bump(caching.author_feed(user.pk), caching.author_feed(author.pk))
+
+
+@receiver(pre_save, sender=Post)
+def remember_previous_post(sender, instance: Post, **kwargs) -> None:
+    """Remember the group of an edited post and drop outdated thumbnail."""
+    previous_image = ''
+    if not instance._state.adding:
+        previous = Post.objects.filter(pk=instance.pk).values_list(
+            'group_id', 'image').first()
+        if previous is not None:
+            instance._previous_group_id, previous_image = previous
+    if (instance.image.name or '') != (previous_image or ''):
+        instance.thumbnail = ''
+        instance.thumbnail_width = instance.thumbnail_height = None
+        instance.thumbnail_variants = ''
+        instance._image_changed = True
+
+
+@receiver(post_save, sender=Post)
+def schedule_thumbnail(sender, instance: Post, **kwargs) -> None:
+    """Render the thumbnail of a new image in the background."""
+    if getattr(instance, '_image_changed', False):
+        instance._image_changed = False
+        thumbnails.schedule(instance)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_feeds(sender, instance: Post, **kwargs) -> None:
+    """Invalidate cached fragments of the feeds showing the post."""
+    caching.bump_post_feeds(
+        instance.pk, instance.author_id, instance.group_id,
+        getattr(instance, '_previous_group_id', None)
+    )
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_commented_post_feeds(sender, instance: Comment, **kwargs):
+    """Invalidate the post page and fragments showing comment counts."""
+    if _post_is_deleted(instance.post_id):
+        return
+    post = Post.objects.filter(pk=instance.post_id).values_list(
+        'author_id', 'group_id').first()
+    if post is not None:
+        caching.bump_post_feeds(instance.post_id, *post)
+    caching.bump(caching.author_feed(instance.author_id))
+
+
+@receiver(post_save, sender=Follow)
+def invalidate_follow_profiles(sender, instance: Follow, **kwargs) -> None:
+    """Invalidate profiles showing subscription counters.
+
+    `Follow.objects.follow()` and `unfollow()` send no signals, their
+    callers invalidate the profiles themselves.
+    """
+    caching.bump(caching.author_feed(instance.user_id),
+                 caching.author_feed(instance.author_id))
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group_fragments(sender, **kwargs) -> None:
+    """Invalidate all cached fragments that may show the group."""
+    caching.bump(caching.GLOBAL_VERSION)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_fragments(sender, **kwargs) -> None:
+    """Invalidate all cached fragments that may show the user."""
+    update_fields = kwargs.get('update_fields')
+    if kwargs.get('created') or update_fields == {'last_login'}:
+        return
+    caching.bump(caching.GLOBAL_VERSION)
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance: Post, **kwargs) -> None:
+    """Update the search index with the text of the post."""
+    update_fields = kwargs.get('update_fields')
+    if update_fields is None or 'text' in update_fields:
+        search.get_backend().index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance: Post, **kwargs) -> None:
+    """Remove the post from the search index."""
+    search.get_backend().remove_post(instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+def index_comment(sender, instance: Comment, **kwargs) -> None:
+    """Update the search index with the text of the comment."""
+    search.get_backend().index_comment(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def unindex_comment(sender, instance: Comment, **kwargs) -> None:
+    """Remove the comment from the search index."""
+    if _post_is_deleted(instance.post_id):
+        return
+    search.get_backend().remove_comment(instance.pk)
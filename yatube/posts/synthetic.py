@@ -0,0 +1,103 @@
+"""Module with deterministic synthetic content for load testing.
+
+Texts are made of invented words whose frequencies follow Zipf's law, and
+authors of posts and comments and followed authors are picked with a
+power-law distribution, so a few users produce most of the content, as on
+real sites. Every chunk of rows is generated from its own seed, which
+makes the rows depend only on the seed of the run and not on the amount
+of processes generating them.
+"""
+
+import io
+import random
+from itertools import accumulate
+from typing import Iterator, List, Sequence
+
+from PIL import Image, ImageDraw
+
+SYLLABLES = (
+    'ка', 'ро', 'ми', 'та', 'ну', 'ле', 'во', 'за', 'си', 'по',
+    'де', 'га', 'мо', 'ры', 'ше', 'лу', 'би', 'на', 'ко', 'те',
+)
+
+IMAGE_SIZE = (640, 480)
+
+
+def chunk_random(seed: int, kind: str, chunk: int) -> random.Random:
+    """Get random generator of a chunk of rows.
+
+    Args:
+        seed: seed of the whole run;
+        kind: kind of the rows, e.g. 'posts';
+        chunk: number of the chunk.
+    """
+    return random.Random(f'{seed}:{kind}:{chunk}')
+
+
+def vocabulary(size: int = 20000, seed: int = 0) -> List[str]:
+    """Get distinct invented words, the most frequent ones first."""
+    rng = random.Random(seed)
+    words = {}
+    while len(words) < size:
+        words[''.join(rng.choices(SYLLABLES, k=rng.randint(1, 4)))] = None
+    return list(words)
+
+
+class PowerLaw:
+    """Picker of items with weights inversely proportional to their rank."""
+
+    def __init__(self, items: Sequence) -> None:
+        """Create picker.
+
+        Args:
+            items: items to pick from, the most frequent first.
+        """
+        self.items = items
+        self.cum_weights = list(accumulate(
+            1 / (rank + 1) for rank in range(len(items))))
+
+    def pick(self, rng: random.Random, amount: int) -> list:
+        """Pick items, repeating them.
+
+        Args:
+            rng: random generator;
+            amount: amount of items to pick.
+        """
+        return rng.choices(self.items, cum_weights=self.cum_weights, k=amount)
+
+
+def texts(
+    rng: random.Random, words: PowerLaw, amount: int, low: int, high: int,
+) -> Iterator[str]:
+    """Generate texts of words picked with Zipf's law.
+
+    Args:
+        rng: random generator;
+        words: picker of words;
+        amount: amount of texts;
+        low: least amount of words in a text;
+        high: largest amount of words in a text.
+    """
+    for _ in range(amount):
+        text = ' '.join(words.pick(rng, rng.randint(low, high)))
+        yield text[:1].upper() + text[1:] + '.'
+
+
+def image(rng: random.Random) -> bytes:
+    """Draw a JPEG picture of a few colored shapes on a gradient."""
+    width, height = IMAGE_SIZE
+    start, end = (
+        [rng.randrange(256) for _ in range(3)] for _ in range(2))
+    picture = Image.new('RGB', IMAGE_SIZE)
+    draw = ImageDraw.Draw(picture)
+    for y in range(height):
+        draw.line([(0, y), (width, y)], fill=tuple(
+            a + (b - a) * y // height for a, b in zip(start, end)))
+    for _ in range(rng.randint(3, 8)):
+        x, y = rng.randrange(width), rng.randrange(height)
+        size = rng.randint(20, height // 2)
+        draw.ellipse([x, y, x + size, y + size], fill=tuple(
+            rng.randrange(256) for _ in range(3)))
+    output = io.BytesIO()
+    picture.save(output, 'JPEG', quality=85)
+    return output.getvalue()
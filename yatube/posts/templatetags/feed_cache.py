@@ -0,0 +1,62 @@
+"""Module with the template tag caching blocks of post feeds."""
+
+from django import template
+from django.core.cache.utils import make_template_fragment_key
+
+from posts import caching
+
+register = template.Library()
+
+
+class FeedCacheNode(template.Node):
+    """Node rendering its content through `caching.get_or_build`."""
+
+    def __init__(self, nodelist, timeout, fragment_name, vary_on, version):
+        """Create node."""
+        self.nodelist = nodelist
+        self.timeout = timeout
+        self.fragment_name = fragment_name
+        self.vary_on = vary_on
+        self.version = version
+
+    def render(self, context):
+        """Render cached content or build it under the rebuild lock."""
+        key = make_template_fragment_key(
+            self.fragment_name,
+            [variable.resolve(context) for variable in self.vary_on]
+        )
+        return caching.get_or_build(
+            key, lambda: self.nodelist.render(context),
+            self.timeout.resolve(context), self.version.resolve(context)
+        )
+
+
+@register.tag('feed_cache')
+def do_feed_cache(parser, token):
+    """Cache a block of a feed with stampede protection.
+
+    Usage::
+
+        {% feed_cache timeout fragment_name [var ...] version=version %}
+            ...
+        {% endfeed_cache %}
+
+    Unlike `{% cache %}`, the version is not a part of the key: a block of
+    an outdated version is served to other requests while one of them
+    renders the new one.
+    """
+    nodelist = parser.parse(('endfeed_cache',))
+    parser.delete_first_token()
+    tokens = token.split_contents()
+    if len(tokens) < 4 or not tokens[-1].startswith('version='):
+        raise template.TemplateSyntaxError(
+            f"'{tokens[0]}' tag requires a timeout, a fragment name "
+            "and a version."
+        )
+    return FeedCacheNode(
+        nodelist,
+        parser.compile_filter(tokens[1]),
+        tokens[2],
+        [parser.compile_filter(token) for token in tokens[3:-1]],
+        parser.compile_filter(tokens[-1][len('version='):]),
+    )
@@ -0,0 +1,59 @@
+import time
+from unittest import mock
+
+from django.core.cache import caches
+from django.test import TestCase
+
+from posts import caching
+
+
+class GetOrBuildTest(TestCase):
+    def setUp(self):
+        self.cache = caches['shared']
+        self.cache.clear()
+        self.builds = 0
+
+    def build(self):
+        self.builds += 1
+        return f'build {self.builds}'
+
+    def test_value_is_built_once(self):
+        """Свежее значение не пересобирается"""
+        for _ in range(3):
+            value = caching.get_or_build('key', self.build, 60, version=1)
+        self.assertEqual(value, 'build 1')
+        self.assertEqual(self.builds, 1)
+
+    def test_new_version_is_built_when_lock_is_free(self):
+        """Значение новой версии собирается сразу"""
+        caching.get_or_build('key', self.build, 60, version=1)
+        value = caching.get_or_build('key', self.build, 60, version=2)
+        self.assertEqual(value, 'build 2')
+        self.assertIsNone(self.cache.get('key:rebuild'))
+
+    def test_stale_value_is_served_while_rebuilding(self):
+        """Пока значение пересобирается, отдается устаревшее"""
+        caching.get_or_build('key', self.build, 60, version=1)
+        self.cache.add('key:rebuild', True)
+        self.assertEqual(
+            caching.get_or_build('key', self.build, 60, version=2),
+            'build 1'
+        )
+        self.assertEqual(self.builds, 1)
+
+    def test_missing_value_waits_for_rebuild(self):
+        """Без значения запрос ждет пересборки и собирает его сам"""
+        self.cache.add('key:rebuild', True)
+        with mock.patch.object(caching, 'REBUILD_WAIT', 0.1):
+            value = caching.get_or_build('key', self.build, 60, version=1)
+        self.assertEqual(value, 'build 1')
+        self.assertTrue(self.cache.get('key:rebuild'))
+
+    def test_expiration_is_probabilistic(self):
+        """Значение может быть пересобрано раньше истечения срока"""
+        now = time.time()
+        with mock.patch.object(caching.random, 'random', return_value=0.0):
+            self.assertTrue(caching.is_fresh(now + 10, 1))
+        with mock.patch.object(caching.random, 'random', return_value=0.9999):
+            self.assertFalse(caching.is_fresh(now + 5, 1))
+        self.assertFalse(caching.is_fresh(now - 1, 0))
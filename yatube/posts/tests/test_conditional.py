@@ -0,0 +1,134 @@
+from django.core.cache import caches
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils.http import http_date
+
+from posts.models import Comment, Group, Post, User
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Текст поста')
+
+    def setUp(self):
+        caches['shared'].clear()
+        caches['default'].clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.pages = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        )
+
+    def test_pages_have_validators(self):
+        """Страницы отдают ETag, Last-Modified и требуют перепроверки"""
+        for url in self.pages:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response['ETag'].startswith('W/"'))
+                self.assertIn('Last-Modified', response)
+                self.assertIn('private', response['Cache-Control'])
+                self.assertIn('no-cache', response['Cache-Control'])
+
+    def test_unchanged_page_is_not_rendered(self):
+        """На неизменную страницу приходит 304 без рендеринга шаблона"""
+        for url in self.pages:
+            etag = self.client.get(url)['ETag']
+            for method in (self.client.get, self.client.head):
+                with self.subTest(url=url, method=method.__name__):
+                    response = method(url, HTTP_IF_NONE_MATCH=etag)
+                    self.assertEqual(response.status_code, 304)
+                    self.assertEqual(response.content, b'')
+                    self.assertEqual(response.templates, [])
+                    self.assertEqual(response['ETag'], etag)
+
+    def test_unchanged_main_page_needs_no_queries(self):
+        """Проверка неизменной главной страницы не обращается к базе"""
+        etag = self.client.get(reverse('posts:index'))['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                reverse('posts:index'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_if_modified_since(self):
+        """Страница не изменялась с даты Last-Modified"""
+        url = reverse('posts:index')
+        last_modified = self.client.get(url)['Last-Modified']
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=http_date(0))
+        self.assertEqual(response.status_code, 200)
+
+    def test_pages_change_with_user(self):
+        """Страницы разных пользователей имеют разные ETag"""
+        for url in self.pages:
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                response = self.reader_client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response['ETag'], etag)
+
+    def test_pages_change_with_login(self):
+        """После повторного входа страница отдается с новым CSRF-токеном"""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        response = self.reader_client.get(url)
+        self.assertContains(response, 'csrfmiddlewaretoken')
+        self.reader_client.logout()
+        self.reader_client.force_login(self.reader)
+        response = self.reader_client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+
+    def test_new_post_changes_pages(self):
+        """Новый пост меняет ленты и профиль автора"""
+        etags = {url: self.client.get(url)['ETag'] for url in self.pages}
+        Post.objects.create(
+            author=self.author, group=self.group, text='Новый пост')
+        for url in self.pages:
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etags[url])
+                self.assertEqual(response.status_code, 200)
+
+    def test_comment_changes_post_page(self):
+        """Комментарий меняет страницу поста"""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        etag = self.client.get(url)['ETag']
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Комментарий')
+
+    def test_follow_changes_profiles(self):
+        """Подписка меняет профили подписчика и автора"""
+        urls = [reverse('posts:profile', kwargs={'username': user})
+                for user in (self.author, self.reader)]
+        etags = {url: self.reader_client.get(url)['ETag'] for url in urls}
+        self.reader_client.get(
+            reverse('posts:profile_follow', kwargs={'username': self.author}))
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.reader_client.get(
+                    url, HTTP_IF_NONE_MATCH=etags[url])
+                self.assertEqual(response.status_code, 200)
+
+    def test_missing_pages_are_not_found(self):
+        """Несуществующие страницы отдают 404 без валидаторов"""
+        for url in (
+            reverse('posts:group_list', kwargs={'slug': 'missing'}),
+            reverse('posts:profile', kwargs={'username': 'missing'}),
+            reverse('posts:post_detail', kwargs={'post_id': 0}),
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH='*')
+                self.assertEqual(response.status_code, 404)
+                self.assertNotIn('ETag', response)
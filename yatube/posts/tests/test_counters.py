@@ -0,0 +1,117 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Post, TimelineEntry, UserStats
+
+User = get_user_model()
+
+
+class CountersTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='TestAuthor')
+        self.reader = User.objects.create_user(username='TestReader')
+        self.client_author = Client()
+        self.client_author.force_login(self.author)
+        self.client_reader = Client()
+        self.client_reader.force_login(self.reader)
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_new_user_gets_zero_counters(self):
+        """Новый пользователь получает нулевые счетчики"""
+        stats = self.stats(self.author)
+        self.assertEqual(
+            (stats.posts_count, stats.followers_count,
+             stats.following_count, stats.comments_count),
+            (0, 0, 0, 0)
+        )
+
+    def test_counters_follow_created_and_deleted_objects(self):
+        """Счетчики меняются при создании и удалении объектов"""
+        self.client_author.post(
+            reverse('posts:post_create'), data={'text': 'Тестовый пост'})
+        post = Post.objects.get(author=self.author)
+        self.client_reader.post(
+            reverse('posts:add_comment', kwargs={'post_id': post.pk}),
+            data={'text': 'Комментарий'}
+        )
+        self.client_reader.get(reverse(
+            'posts:profile_follow',
+            kwargs={'username': self.author.username}
+        ))
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+        self.assertEqual(self.stats(self.reader).comments_count, 1)
+
+        self.client_reader.get(reverse(
+            'posts:profile_unfollow',
+            kwargs={'username': self.author.username}
+        ))
+        post.delete()
+        self.assertEqual(self.stats(self.author).posts_count, 0)
+        self.assertEqual(self.stats(self.author).followers_count, 0)
+        self.assertEqual(self.stats(self.reader).following_count, 0)
+        self.assertEqual(self.stats(self.reader).comments_count, 0)
+
+    def test_deleted_follow_updates_counters_and_feed(self):
+        """Удаление подписки вне unfollow() обновляет счетчики и ленту"""
+        Follow.objects.follow(self.reader, self.author)
+        Post.objects.create(text='Тестовый пост', author=self.author)
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=self.reader).exists())
+        Follow.objects.filter(author=self.author).delete()
+        self.assertEqual(self.stats(self.author).followers_count, 0)
+        self.assertEqual(self.stats(self.reader).following_count, 0)
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.reader).exists())
+
+    def test_post_comments_are_uncounted_in_bulk(self):
+        """Комментарии удаляемого поста учитываются одним запросом на автора"""
+        queries = []
+        for comments in (2, 6):
+            post = Post.objects.create(
+                text='Тестовый пост', author=self.author)
+            for number in range(comments):
+                Comment.objects.create(
+                    post=post, text='Комментарий',
+                    author=(self.author, self.reader)[number % 2])
+            with CaptureQueriesContext(connection) as context:
+                post.delete()
+            queries.append(len(context.captured_queries))
+            self.assertEqual(self.stats(self.author).comments_count, 0)
+            self.assertEqual(self.stats(self.reader).comments_count, 0)
+        self.assertEqual(queries[0], queries[1])
+        Comment.objects.create(
+            post=Post.objects.create(text='Новый пост', author=self.author),
+            author=self.reader, text='Комментарий')
+        Comment.objects.get().delete()
+        self.assertEqual(self.stats(self.reader).comments_count, 0)
+
+    def test_recount_counters_repairs_drift(self):
+        """Команда recount_counters исправляет расхождения счетчиков"""
+        post = Post.objects.create(text='Тестовый пост', author=self.author)
+        Comment.objects.bulk_create([
+            Comment(post=post, author=self.reader, text='Комментарий'),
+        ])
+        Follow.objects.bulk_create([
+            Follow(user=self.reader, author=self.author),
+        ])
+        UserStats.objects.filter(user=self.author).update(posts_count=7)
+        UserStats.objects.filter(user=self.reader).delete()
+        call_command('recount_counters', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+        self.assertEqual(self.stats(self.reader).comments_count, 1)
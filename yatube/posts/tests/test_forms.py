@@ -1,3 +1,4 @@
+import hashlib
 import shutil
 import tempfile
 from http import HTTPStatus
@@ -71,10 +72,13 @@ class PostCreateFormTests(TestCase):
         self.assertRedirects(response, reverse(
             'posts:profile', kwargs={'username': self.user.username}))
         self.assertEqual(Post.objects.count(), posts_count + 1)
+        content_hash = hashlib.sha256(small_gif).hexdigest()
+        image_name = (f'posts/{content_hash[:2]}/{content_hash[2:4]}/'
+                      f'{content_hash}.gif')
         self.assertTrue(
             Post.objects.filter(
                 text=form_data['text'],
-                image='posts/small.gif'
+                image=image_name
             ).exists()
         )
         created_post = Post.objects.get(text=form_data['text'])
@@ -82,9 +86,9 @@ class PostCreateFormTests(TestCase):
         self.assertEqual(created_post.group.pk, form_data['group'])
         self.assertEqual(created_post.author, self.user)
         default_upload_path = created_post._meta.get_field('image').upload_to
-        path_to_file = f"{default_upload_path}small.gif"
-        self.assertEqual(
-            created_post.image.name, path_to_file)
+        self.assertTrue(
+            created_post.image.name.startswith(default_upload_path))
+        self.assertEqual(created_post.image.name, image_name)
 
     def test_edit_post(self):
         """Валидная форма меняет содержание записи, не дублируя ее"""
@@ -0,0 +1,112 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import views
+from posts.models import Comment, Post
+from posts.search import DatabaseBackend, FTS5Backend
+from yatube.settings import PAGINATION_NUM
+
+User = get_user_model()
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.post_about_cats = Post.objects.create(
+            text='Коты спят весь день', author=cls.user)
+        cls.post_about_dogs = Post.objects.create(
+            text='Собаки гуляют во дворе', author=cls.user)
+        cls.post_with_comment = Post.objects.create(
+            text='Фотографии с прогулки', author=cls.user)
+        Comment.objects.create(
+            post=cls.post_with_comment, author=cls.user,
+            text='Какие красивые коты')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def found(self, query):
+        response = self.client.get(reverse('posts:search'), {'q': query})
+        return list(response.context['page_obj'])
+
+    def test_search_ranks_posts_by_text_and_comments(self):
+        """Поиск находит посты по тексту и комментариям"""
+        self.assertEqual(
+            self.found('КОТЫ'),
+            [self.post_about_cats, self.post_with_comment]
+        )
+        self.assertEqual(self.found('собак двор'), [self.post_about_dogs])
+        self.assertEqual(self.found('коты собаки'), [])
+
+    def test_empty_query_finds_nothing(self):
+        """Пустой запрос ничего не находит"""
+        for query in ('', '   ', '!!!'):
+            with self.subTest(query=query):
+                self.assertEqual(self.found(query), [])
+
+    def test_index_follows_changes(self):
+        """Индекс обновляется при изменении и удалении постов"""
+        post_about_dogs = Post.objects.get(pk=self.post_about_dogs.pk)
+        post_about_dogs.text = 'Коты прогнали собак'
+        post_about_dogs.save()
+        self.assertIn(post_about_dogs, self.found('коты'))
+        self.assertEqual(self.found('двор'), [])
+        Comment.objects.filter(post=self.post_with_comment).delete()
+        Post.objects.get(pk=self.post_about_cats.pk).delete()
+        self.assertEqual(self.found('коты'), [post_about_dogs])
+
+    def test_deleted_post_takes_comments_from_index(self):
+        """Удаление поста удаляет его комментарии из индекса"""
+        Post.objects.get(pk=self.post_with_comment.pk).delete()
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM posts_comment_fts')
+            self.assertEqual(cursor.fetchone(), (0,))
+
+    def test_logged_in_search_fits_query_budget(self):
+        """Поиск авторизованного пользователя укладывается в бюджет"""
+        self.client.force_login(self.user)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('posts:search'), {'q': 'коты'})
+        self.assertEqual(len(response.context['page_obj']), 2)
+        self.assertEqual(
+            len(context.captured_queries), views.search.query_budget)
+
+    def test_results_are_paginated(self):
+        """Результаты поиска разбиты на страницы"""
+        for number in range(PAGINATION_NUM + 2):
+            Post.objects.create(text=f'Котенок номер {number}',
+                                author=self.user)
+        response = self.client.get(reverse('posts:search'), {'q': 'кот'})
+        self.assertEqual(response.context['page_obj'].paginator.count,
+                         PAGINATION_NUM + 4)
+        self.assertEqual(len(response.context['page_obj']), PAGINATION_NUM)
+        self.assertContains(response, '?q=%D0%BA%D0%BE%D1%82&amp;page=2')
+        response = self.client.get(
+            reverse('posts:search'), {'q': 'кот', 'page': 2})
+        self.assertEqual(len(response.context['page_obj']), 4)
+
+    def test_backends_find_same_posts(self):
+        """Поиск без индекса находит те же посты"""
+        for query in ('спят', 'гуляют двор', 'прогулки', 'красивые'):
+            with self.subTest(query=query):
+                self.assertEqual(
+                    set(DatabaseBackend().search(query)),
+                    set(FTS5Backend().search(query)[:PAGINATION_NUM])
+                )
+
+    def test_rebuild_command_restores_index(self):
+        """Команда восстанавливает индекс"""
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM posts_post_fts')
+        self.assertEqual(self.found('собаки'), [])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.found('собаки'), [self.post_about_dogs])
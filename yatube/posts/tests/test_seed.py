@@ -0,0 +1,113 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db.models import Count, F
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from posts.models import (Comment, Follow, Group, Post, TimelineEntry, User,
+                          UserStats)
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SIZES = {'users': 30, 'groups': 3, 'posts': 250, 'comments': 200,
+         'follows': 100, 'batch_size': 40, 'processes': 1}
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class SeedCommandTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def seed(self, **options):
+        call_command('seed_yatube', stdout=StringIO(), **{**SIZES, **options})
+
+    def rows(self):
+        return list(Post.objects.order_by('pk').values_list(
+            'text', 'pub_date', 'author__username', 'group__slug'))
+
+    def test_objects_are_created(self):
+        """Команда создает пользователей, группы, посты и комментарии"""
+        self.seed()
+        self.assertEqual(User.objects.count(), 30)
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(Post.objects.count(), 250)
+        self.assertEqual(Comment.objects.count(), 200)
+        self.assertGreater(Follow.objects.count(), 50)
+        self.assertFalse(Follow.objects.filter(user=F('author')).exists())
+
+    def test_counters_are_recounted(self):
+        """Счетчики созданных объектов пересчитываются"""
+        self.seed()
+        author = Post.objects.values('author').annotate(
+            count=Count('pk')).order_by('-count').first()
+        self.assertEqual(
+            UserStats.objects.get(user_id=author['author']).posts_count,
+            author['count']
+        )
+        post = Post.objects.filter(comments__isnull=False).first()
+        self.assertEqual(post.comments_count, post.comments.count())
+
+    def test_authors_follow_power_law(self):
+        """Несколько авторов пишут большую часть постов"""
+        self.seed()
+        counts = list(Post.objects.values('author').annotate(
+            count=Count('pk')).order_by('-count').values_list(
+                'count', flat=True))
+        self.assertGreater(sum(counts[:5]), 250 / 3)
+
+    def test_dates_are_kept(self):
+        """Посты получают даты в течение года, а не время вставки"""
+        self.seed()
+        dates = Post.objects.order_by('pk').values_list(
+            'pub_date', flat=True)
+        self.assertLess(dates[0], dates[len(dates) - 1])
+        self.assertGreater(
+            (dates[len(dates) - 1] - dates[0]).days, 300)
+
+    def test_comments_are_not_dated_in_future(self):
+        """Комментарии не датируются позже текущего момента"""
+        self.seed(comments=1000)
+        self.assertFalse(
+            Comment.objects.filter(created__gt=timezone.now()).exists())
+
+    @override_settings(TIMELINE_BACKFILL_LIMIT=3)
+    def test_feeds_of_followers_are_filled(self):
+        """Ленты подписчиков заполняются последними постами авторов"""
+        self.seed()
+        follow = Follow.objects.annotate(
+            posts=Count('author__posts')).filter(posts__gt=3).first()
+        self.assertEqual(
+            list(TimelineEntry.objects.filter(
+                user=follow.user, post__author=follow.author,
+            ).order_by('-pub_date').values_list('post', flat=True)),
+            list(Post.objects.filter(author=follow.author).order_by(
+                '-pub_date').values_list('pk', flat=True)[:3])
+        )
+        self.assertLessEqual(
+            set(TimelineEntry.objects.values_list('user', 'post__author')),
+            set(Follow.objects.values_list('user', 'author'))
+        )
+
+    def test_rows_depend_on_seed_only(self):
+        """Строки зависят только от seed, а не от числа процессов"""
+        self.seed(processes=1, seed=1)
+        rows = self.rows()
+        for model in (Follow, Comment, Post, User, Group):
+            model.objects.all().delete()
+        self.seed(processes=2, seed=1)
+        self.assertEqual(self.rows(), rows)
+        self.seed(processes=1, seed=2)
+        self.assertNotEqual(self.rows()[len(rows):], rows)
+
+    def test_fake_images_get_thumbnails(self):
+        """Посты получают поддельные изображения с миниатюрами"""
+        self.seed(images=2, image_share=1)
+        images = set(Post.objects.values_list('image', flat=True))
+        self.assertEqual(len(images), 2)
+        self.assertFalse(Post.objects.filter(thumbnail='').exists())
@@ -0,0 +1,210 @@
+import shutil
+import tempfile
+import threading
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
+from django.urls import reverse
+
+from posts import thumbnails
+from posts.models import Post
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+OTHER_GIF = SMALL_GIF.replace(b'\xFF\xFF\xFF', b'\x00\x80\x80')
+
+
+def uploaded_gif(name='small.gif', content=SMALL_GIF):
+    return SimpleUploadedFile(
+        name=name, content=content, content_type='image/gif')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='TestUser')
+        self.post = Post.objects.create(
+            text='Пост с картинкой', author=self.user, image=uploaded_gif())
+
+    def test_placeholder_is_shown_until_thumbnail_is_ready(self):
+        """Пока миниатюра не готова, показывается заглушка"""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        self.assertContains(self.client.get(url), 'Изображение обрабатывается')
+        self.assertTrue(
+            thumbnails.generate(self.post.pk, self.post.image.name))
+        self.post.refresh_from_db()
+        self.assertEqual(
+            (self.post.thumbnail_width, self.post.thumbnail_height),
+            thumbnails.SIZE
+        )
+        self.assertTrue(default_storage.exists(self.post.thumbnail.name))
+        for url in (url, reverse('posts:index')):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertContains(response, self.post.thumbnail.url)
+                self.assertNotContains(
+                    response, 'Изображение обрабатывается')
+
+    def test_new_image_drops_thumbnail(self):
+        """Новая картинка сбрасывает миниатюру старой"""
+        old_image = self.post.image.name
+        thumbnails.generate(self.post.pk, old_image)
+        self.post.refresh_from_db()
+        self.post.image = uploaded_gif('other.gif', OTHER_GIF)
+        self.post.save()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.thumbnail.name, '')
+        self.assertIsNone(self.post.thumbnail_width)
+        self.assertFalse(thumbnails.generate(self.post.pk, old_image))
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.thumbnail.name, '')
+
+    def test_broken_image_keeps_placeholder(self):
+        """Битая картинка не ломает генерацию"""
+        broken = Post.objects.create(
+            text='Битая картинка', author=self.user,
+            image=SimpleUploadedFile('broken.gif', b'not an image'))
+        with self.assertLogs('posts.thumbnails', 'WARNING'):
+            self.assertFalse(
+                thumbnails.generate(broken.pk, broken.image.name))
+
+    def test_variants_are_offered_with_srcset(self):
+        """Миниатюра создается в нескольких ширинах и форматах"""
+        thumbnails.generate(self.post.pk, self.post.image.name)
+        self.post.refresh_from_db()
+        sources = self.post.thumbnail_sources
+        self.assertEqual(
+            [source['type'] for source in sources], list(thumbnails.FORMATS))
+        for source in sources:
+            for width in thumbnails.WIDTHS:
+                self.assertIn(f' {width}w', source['srcset'])
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}))
+        self.assertContains(response, sources[0]['srcset'])
+        self.assertContains(response, 'image/jpeg')
+
+    def test_posts_with_same_image_share_thumbnail(self):
+        """Посты с одинаковой картинкой используют одну миниатюру"""
+        thumbnails.generate(self.post.pk, self.post.image.name)
+        other = Post.objects.create(
+            text='Та же картинка', author=self.user,
+            image=uploaded_gif('copy.gif'))
+        self.assertEqual(other.image.name, self.post.image.name)
+        with mock.patch.object(thumbnails, 'render') as render:
+            self.assertTrue(thumbnails.generate(other.pk, other.image.name))
+        render.assert_not_called()
+        self.post.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(other.thumbnail_variants,
+                         self.post.thumbnail_variants)
+
+    def test_garbage_collector_deletes_orphaned_files(self):
+        """Сборщик мусора удаляет только файлы, на которые нет ссылок"""
+        thumbnails.generate(self.post.pk, self.post.image.name)
+        orphan = Post.objects.create(
+            text='Удаляемый пост', author=self.user,
+            image=uploaded_gif('other.gif', OTHER_GIF))
+        thumbnails.generate(orphan.pk, orphan.image.name)
+        orphan.refresh_from_db()
+        orphan_files = {orphan.image.name, orphan.thumbnail.name}
+        orphan.delete()
+        post = Post.objects.get(pk=self.post.pk)
+        kept_files = {post.image.name, post.thumbnail.name}
+        output = StringIO()
+        call_command('collect_media_garbage', stdout=output)
+        self.assertIn('deleted: 0', output.getvalue())
+        call_command('collect_media_garbage', '--min-age', '-1',
+                     '--dry-run', stdout=output)
+        for name in orphan_files:
+            self.assertTrue(default_storage.exists(name))
+        call_command('collect_media_garbage', '--min-age', '-1',
+                     stdout=output)
+        for name in orphan_files:
+            self.assertFalse(default_storage.exists(name))
+        for name in kept_files:
+            self.assertTrue(default_storage.exists(name))
+
+    def test_command_renders_missing_thumbnails(self):
+        """Команда генерирует недостающие миниатюры в нескольких процессах"""
+        Post.objects.create(
+            text='Еще один пост', author=self.user, image=uploaded_gif())
+        for processes in ('1', '2'):
+            with self.subTest(processes=processes):
+                Post.objects.update(thumbnail_variants='')
+                output = StringIO()
+                call_command(
+                    'generate_thumbnails', '--processes', processes,
+                    stdout=output)
+                self.assertIn('thumbnails rendered: 2 of 2',
+                              output.getvalue())
+                self.assertFalse(
+                    Post.objects.filter(thumbnail_variants='').exists())
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailOnCommitTest(TransactionTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    @override_settings(THUMBNAIL_WORKERS=0)
+    def test_thumbnail_is_rendered_after_upload(self):
+        """Миниатюра создается после сохранения поста в том же потоке"""
+        user = User.objects.create_user(username='TestUser')
+        client = Client()
+        client.force_login(user)
+        client.post(reverse('posts:post_create'), data={
+            'text': 'Пост с картинкой', 'image': uploaded_gif()})
+        post = Post.objects.get()
+        self.assertTrue(post.thumbnail.name.startswith(thumbnails.UPLOAD_TO))
+        self.assertEqual(post.thumbnail_width, thumbnails.SIZE[0])
+
+    def test_thumbnail_is_rendered_in_background(self):
+        """Миниатюра создается в фоновом потоке после сохранения поста"""
+        done = threading.Event()
+        threads = []
+        generate_in_worker = thumbnails.generate_in_worker
+
+        def record(*args):
+            threads.append(threading.current_thread().name)
+            try:
+                return generate_in_worker(*args)
+            finally:
+                done.set()
+
+        user = User.objects.create_user(username='TestUser')
+        client = Client()
+        client.force_login(user)
+        with mock.patch.object(thumbnails, 'generate_in_worker', record):
+            client.post(reverse('posts:post_create'), data={
+                'text': 'Пост с картинкой', 'image': uploaded_gif()})
+            self.assertTrue(done.wait(10))
+        self.assertTrue(threads[0].startswith('thumbnails'))
+        post = Post.objects.get()
+        self.assertTrue(post.thumbnail.name.startswith(thumbnails.UPLOAD_TO))
+        self.assertEqual(post.thumbnail_width, thumbnails.SIZE[0])
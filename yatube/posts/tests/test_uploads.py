@@ -0,0 +1,112 @@
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image, ImageFile, PngImagePlugin
+
+from posts import uploads
+from posts.models import Post
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def uploaded_image(name, size, pil_format, **options):
+    buffer = BytesIO()
+    Image.new('RGB', size, 'teal').save(buffer, pil_format, **options)
+    return SimpleUploadedFile(name, buffer.getvalue(),
+                              content_type=f'image/{pil_format.lower()}')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class UploadTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='TestUser')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def create(self, image):
+        return self.client.post(reverse('posts:post_create'), {
+            'text': 'Пост с картинкой', 'image': image})
+
+    def stored_image(self):
+        with default_storage.open(Post.objects.get().image.name) as file:
+            with Image.open(file) as image:
+                image.load()
+                return image
+
+    @override_settings(UPLOAD_MAX_SIZE=1024)
+    def test_oversized_file_is_rejected(self):
+        """Файл больше UPLOAD_MAX_SIZE не сохраняется"""
+        response = self.create(
+            uploaded_image('big.bmp', (100, 100), 'BMP'))
+        self.assertFormError(
+            response, 'form', 'image',
+            'Размер файла не должен превышать 0 МБ.')
+        self.assertFalse(Post.objects.exists())
+
+    def test_oversized_file_is_cut_off_while_streaming(self):
+        """Обработчик загрузки не пишет на диск хвост большого файла"""
+        handler = uploads.LimitedUploadHandler()
+        handler.new_file('image', 'big.bin', 'application/octet-stream',
+                         None)
+        with override_settings(UPLOAD_MAX_SIZE=10):
+            handler.receive_data_chunk(b'12345678', 0)
+            handler.receive_data_chunk(b'12345678', 8)
+            handler.receive_data_chunk(b'1234', 16)
+        upload = handler.file_complete(20)
+        self.assertTrue(upload.too_large)
+        with upload:
+            self.assertEqual(upload.read(), b'12345678')
+
+    @override_settings(IMAGE_MAX_PIXELS=3 * 10 ** 6)
+    def test_image_with_too_many_pixels_is_not_decoded(self):
+        """Изображение с лишними пикселями отклоняется по заголовку"""
+        image = uploaded_image('wide.png', (3000, 1001), 'PNG')
+        self.assertIsNotNone(uploads.check(image))
+        with mock.patch.object(ImageFile.ImageFile, 'load',
+                               side_effect=AssertionError('decoded')):
+            response = self.create(image)
+        self.assertFormError(
+            response, 'form', 'image',
+            'Изображение не должно превышать 3 мегапикселей.')
+        self.assertFalse(Post.objects.exists())
+
+    def test_metadata_is_stripped(self):
+        """Метаданные загруженного изображения удаляются"""
+        exif = Image.Exif()
+        exif[0x010F] = 'Камера'
+        exif[0x0112] = 6
+        self.create(uploaded_image('photo.jpg', (40, 20), 'JPEG',
+                                   exif=exif.tobytes()))
+        image = self.stored_image()
+        self.assertNotIn('exif', image.info)
+        self.assertEqual(image.size, (20, 40))
+
+    def test_png_text_is_stripped(self):
+        """Текстовые блоки PNG удаляются"""
+        info = PngImagePlugin.PngInfo()
+        info.add_text('Comment', 'секрет')
+        self.create(uploaded_image('image.png', (10, 10), 'PNG',
+                                   pnginfo=info))
+        self.assertNotIn('Comment', self.stored_image().info)
+
+    @override_settings(IMAGE_MAX_SIDE=100)
+    def test_large_image_is_scaled_down(self):
+        """Большое изображение уменьшается до IMAGE_MAX_SIDE"""
+        self.create(uploaded_image('large.jpg', (400, 200), 'JPEG'))
+        self.assertEqual(self.stored_image().size, (100, 50))
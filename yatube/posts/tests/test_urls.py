@@ -1,6 +1,7 @@
 from http import HTTPStatus
 
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import Client
 from django.test.testcases import TestCase
 from django.urls import reverse
@@ -30,13 +31,17 @@ class StaticURLTests(TestCase):
             slug='test_group_slug'
         )
 
+    def setUp(self):
+        cache.clear()
+
     def test_common_pages_are_avaliable(self):
         """Общедоступные страницы доступны"""
         common_pages = [
             '/',
             f'/group/{self.group.slug}/',
             f'/profile/{self.author.username}/',
-            f'/posts/{self.post.pk}'
+            f'/posts/{self.post.pk}',
+            '/search/?q=пост',
         ]
         for adress in common_pages:
             with self.subTest(adress=adress):
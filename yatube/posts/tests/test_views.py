@@ -1,17 +1,23 @@
 import datetime as dt
 import shutil
 import tempfile
+import threading
 from http import HTTPStatus
 
+import pytest
 from django import forms
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase, override_settings
+from django.db import connection
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from posts.models import Follow, Group, Post
+from posts.models import (Comment, Follow, Group, Post, TimelineEntry,
+                          UserStats)
 from yatube.settings import PAGINATION_NUM
 
 User = get_user_model()
@@ -50,6 +56,7 @@ class PostPagesTest(TestCase):
             )
             for x in range(12)
         ])
+        UserStats.objects.change(cls.user.pk, posts_count=12)
         small_gif = (
             b'\x47\x49\x46\x38\x39\x61\x02\x00'
             b'\x01\x00\x80\x00\x00\x00\x00\x00'
@@ -76,6 +83,9 @@ class PostPagesTest(TestCase):
         super().tearDownClass()
         shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
 
+    def setUp(self):
+        cache.clear()
+
     def check_context(self, response, user, group, num):
         for i in range(num):
             for j in range(num - 1, 0):
@@ -246,9 +256,9 @@ class PostPagesTest(TestCase):
         last_post = response.context['page_obj'][0]
         self.assertIsNotNone(last_post.image)
         default_upload_path = last_post._meta.get_field('image').upload_to
-        path_to_file = f"{default_upload_path}small.gif"
+        self.assertTrue(last_post.image.name.startswith(default_upload_path))
         self.assertEqual(
-            last_post.image.name, path_to_file)
+            last_post.image.name, self.post_with_pic.image.name)
 
     def test_image_in_group_context(self):
         """При выводе поста с картинкой
@@ -258,9 +268,9 @@ class PostPagesTest(TestCase):
         last_post = response.context['page_obj'][0]
         self.assertIsNotNone(last_post.image)
         default_upload_path = last_post._meta.get_field('image').upload_to
-        path_to_file = f"{default_upload_path}small.gif"
+        self.assertTrue(last_post.image.name.startswith(default_upload_path))
         self.assertEqual(
-            last_post.image.name, path_to_file)
+            last_post.image.name, self.post_with_pic.image.name)
 
     def test_image_in_profile_context(self):
         """При выводе поста с картинкой
@@ -270,22 +280,53 @@ class PostPagesTest(TestCase):
         last_post = response.context['page_obj'][0]
         self.assertIsNotNone(last_post.image)
         default_upload_path = last_post._meta.get_field('image').upload_to
-        path_to_file = f"{default_upload_path}small.gif"
+        self.assertTrue(last_post.image.name.startswith(default_upload_path))
         self.assertEqual(
-            last_post.image.name, path_to_file)
+            last_post.image.name, self.post_with_pic.image.name)
 
     def test_cache_index(self):
-        """Главная страница кешируется"""
+        """Главная страница кешируется и сразу обновляется при изменениях"""
         response_first = self.authorized_client.get(reverse('posts:index'))
-        post_to_delete = Post.objects.get(text='Пост с картинкой')
+        Post.objects.filter(text='Пост с картинкой').update(
+            text='Измененный без сигналов')
+        response_cached = self.authorized_client.get(reverse('posts:index'))
+        self.assertEqual(response_first.content, response_cached.content)
+        post_to_delete = Post.objects.get(text='Измененный без сигналов')
         post_to_delete.delete()
         response_after_del = self.authorized_client.get(reverse('posts:index'))
-        self.assertEqual(response_first.content, response_after_del.content)
-        cache.clear()
-        response_after_clear = self.authorized_client.get(
-            reverse('posts:index'))
         self.assertNotEqual(
-            response_after_del.content, response_after_clear.content)
+            response_cached.content, response_after_del.content)
+        self.assertNotIn(
+            'Пост с картинкой', response_after_del.content.decode())
+
+    def test_cached_index_renders_without_post_queries(self):
+        """Закешированная главная страница не запрашивает посты"""
+        self.authorized_client.get(reverse('posts:index'))
+        with CaptureQueriesContext(connection) as context:
+            response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, 'Тестовый пост')
+        post_queries = [
+            query['sql'] for query in context.captured_queries
+            if 'FROM "posts_post"' in query['sql']
+            and 'COUNT(*)' not in query['sql']
+        ]
+        self.assertEqual(post_queries, [])
+
+    def test_new_post_is_visible_immediately(self):
+        """Новый пост сразу появляется на закешированных страницах"""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user.username}),
+        )
+        for url in urls:
+            self.authorized_client.get(url)
+        Post.objects.create(
+            text='Самый свежий пост', author=self.user, group=self.group)
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertContains(
+                    self.authorized_client.get(url), 'Самый свежий пост')
 
     def test_user_can_follow(self):
         """Авторизованный пользователь может подписываться на других"""
@@ -342,3 +383,423 @@ class PostPagesTest(TestCase):
         ))
         self.assertEqual(response.status_code, HTTPStatus.OK)
         self.assertNotIn(new_post, response.context['page_obj'])
+
+
+class FeedQueriesTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug'
+        )
+        cls.follower = User.objects.create_user(username='TestFollower')
+        cls.authors = [
+            User.objects.create_user(username=f'TestAuthor{x}')
+            for x in range(PAGINATION_NUM)
+        ]
+        Follow.objects.bulk_create([
+            Follow(user=cls.follower, author=author)
+            for author in cls.authors
+        ])
+        cls.client_follower = Client()
+        cls.client_follower.force_login(cls.follower)
+
+    def setUp(self):
+        cache.clear()
+
+    def add_posts(self, num):
+        posts = [
+            Post.objects.create(
+                text=f'Тестовый пост {x}',
+                author=self.authors[0] if x % 2 else self.authors[x],
+                group=self.group,
+            )
+            for x in range(num)
+        ]
+        for post in posts:
+            Comment.objects.create(
+                post=post, author=self.follower, text='Комментарий')
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client_follower.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return len(context.captured_queries)
+
+    def test_feeds_use_constant_number_of_queries(self):
+        """Количество запросов к БД не зависит от числа постов на странице"""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse(
+                'posts:profile',
+                kwargs={'username': self.authors[0].username}
+            ),
+            reverse('posts:follow_index'),
+        )
+        self.add_posts(1)
+        one_post = {url: self.count_queries(url) for url in urls}
+        self.add_posts(PAGINATION_NUM)
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.count_queries(url), one_post[url])
+
+    def test_profile_and_post_take_two_queries(self):
+        """Профиль и страница поста строятся за два запроса без COUNT"""
+        self.add_posts(PAGINATION_NUM)
+        posts_num = Post.objects.filter(author=self.authors[0]).count()
+        post = Post.objects.filter(author=self.authors[0]).first()
+        for author in self.authors[1:4]:
+            Comment.objects.create(post=post, author=author, text='Ответ')
+        urls = (
+            reverse(
+                'posts:profile',
+                kwargs={'username': self.authors[0].username}
+            ),
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                cache.clear()
+                with self.assertNumQueries(2), CaptureQueriesContext(
+                        connection) as context:
+                    response = Client().get(url)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertEqual(response.context['posts_num'], posts_num)
+                for query in context.captured_queries:
+                    self.assertNotIn('COUNT(', query['sql'])
+        self.assertEqual(len(response.context['comments']), 4)
+        cache.clear()
+        response = self.client_follower.get(urls[0])
+        self.assertTrue(response.context['following'])
+        self.assertEqual(len(response.context['page_obj']), posts_num)
+
+    def test_feed_shows_comments_count(self):
+        """Посты ленты содержат количество комментариев"""
+        self.add_posts(2)
+        response = self.client_follower.get(reverse('posts:index'))
+        for post in response.context['page_obj']:
+            self.assertEqual(post.comments_count, 1)
+
+
+@override_settings(CURSOR_PAGINATION=True)
+class CursorPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug'
+        )
+        Post.objects.bulk_create([
+            Post(
+                text=f'Тестовый пост {x}',
+                author=cls.user,
+                group=cls.group,
+            )
+            for x in range(PAGINATION_NUM * 2 + 3)
+        ])
+        Post.objects.filter(pk__in=Post.objects.values('pk')[:5]).update(
+            pub_date=Post.objects.first().pub_date
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def walk(self, url):
+        pages = []
+        cursor = ''
+        while cursor is not None:
+            response = self.client.get(url, {'cursor': cursor})
+            self.assertEqual(response.status_code, HTTPStatus.OK)
+            page_obj = response.context['page_obj']
+            pages.append(page_obj)
+            cursor = page_obj.next_cursor
+        return pages
+
+    def test_cursor_pages_cover_feed_in_order(self):
+        """Курсорная пагинация выдает все посты по порядку без повторов"""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user.username}),
+        )
+        expected = list(
+            Post.objects.order_by('-pub_date', '-pk').values_list(
+                'pk', flat=True)
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                pages = self.walk(url)
+                self.assertEqual(
+                    [len(page) for page in pages],
+                    [PAGINATION_NUM, PAGINATION_NUM, 3]
+                )
+                self.assertEqual(
+                    [post.pk for page in pages for post in page], expected
+                )
+
+    def test_previous_cursor_returns_previous_page(self):
+        """Ссылка назад возвращает предыдущую страницу"""
+        first, second, _ = self.walk(reverse('posts:index'))
+        self.assertFalse(first.has_previous())
+        response = self.client.get(
+            reverse('posts:index'), {'cursor': second.previous_cursor})
+        page_obj = response.context['page_obj']
+        self.assertEqual(list(page_obj), list(first))
+        self.assertFalse(page_obj.has_previous())
+        self.assertTrue(page_obj.has_next())
+
+    def test_cursor_page_does_not_count_or_offset(self):
+        """Курсорная страница не выполняет COUNT и OFFSET"""
+        second_cursor = self.walk(reverse('posts:index'))[1].next_cursor
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(reverse('posts:index'), {'cursor': second_cursor})
+        for query in context.captured_queries:
+            self.assertNotIn('COUNT(*)', query['sql'])
+            self.assertNotIn('OFFSET', query['sql'])
+
+    def test_malformed_cursor_returns_first_page(self):
+        """Некорректный курсор ведет на первую страницу"""
+        response = self.client.get(
+            reverse('posts:index'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(len(response.context['page_obj']), PAGINATION_NUM)
+        self.assertFalse(response.context['page_obj'].has_previous())
+
+
+@override_settings(COMMENTS_PAGE_SIZE=5)
+class CommentsPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.post = Post.objects.create(text='Тестовый пост', author=cls.user)
+        Comment.objects.bulk_create([
+            Comment(post=cls.post, author=cls.user, text=f'Комментарий {x}')
+            for x in range(12)
+        ])
+        cls.post_url = reverse(
+            'posts:post_detail', kwargs={'post_id': cls.post.pk})
+
+    def setUp(self):
+        cache.clear()
+
+    def test_comments_load_older_pages_in_order(self):
+        """Более ранние комментарии подгружаются страницами по порядку"""
+        response = self.client.get(self.post_url)
+        pages = [response.context['comments']]
+        self.assertContains(response, 'Более ранние комментарии')
+        while pages[-1].has_next():
+            response = self.client.get(
+                reverse('posts:post_comments',
+                        kwargs={'post_id': self.post.pk}),
+                {'cursor': pages[-1].next_cursor},
+            )
+            self.assertEqual(response.status_code, HTTPStatus.OK)
+            self.assertTemplateUsed(response, 'posts/includes/comments.html')
+            pages.append(response.context['comments'])
+        self.assertEqual([len(page) for page in pages], [5, 5, 2])
+        self.assertEqual(
+            [comment.pk for page in pages for comment in page],
+            list(self.post.comments.order_by('-created', '-pk').values_list(
+                'pk', flat=True))
+        )
+        self.assertNotContains(response, 'Более ранние комментарии')
+
+    def test_post_page_queries_do_not_depend_on_comments(self):
+        """Число запросов страницы поста не зависит от числа комментариев"""
+        Comment.objects.bulk_create([
+            Comment(post=self.post, author=self.user, text='Еще комментарий')
+            for _ in range(100)
+        ])
+        with self.assertNumQueries(2):
+            response = self.client.get(self.post_url)
+        self.assertEqual(len(response.context['comments']), 5)
+
+    def test_comments_of_missing_post_not_found(self):
+        """Комментарии несуществующего поста отдают 404"""
+        response = self.client.get(
+            reverse('posts:post_comments', kwargs={'post_id': 0}))
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+
+class FollowConcurrencyTest(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='TestFollower')
+        self.author = User.objects.create_user(username='TestAuthor')
+
+    def test_parallel_follow_requests_create_one_subscription(self):
+        """Параллельные подписки не создают дубликатов"""
+        threads_num = 8
+        barrier = threading.Barrier(threads_num)
+        statuses = []
+        url = reverse(
+            'posts:profile_follow',
+            kwargs={'username': self.author.username}
+        )
+
+        def follow(client):
+            try:
+                barrier.wait(timeout=10)
+                statuses.append(client.get(url).status_code)
+            finally:
+                connection.close()
+
+        clients = [Client() for _ in range(threads_num)]
+        for client in clients:
+            client.force_login(self.user)
+        threads = [
+            threading.Thread(target=follow, args=(client,))
+            for client in clients
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(statuses, [HTTPStatus.FOUND] * threads_num)
+        self.assertEqual(
+            Follow.objects.filter(user=self.user, author=self.author).count(),
+            1
+        )
+
+    def statements(self, context, verb):
+        return [
+            query['sql'] for query in context.captured_queries
+            if query['sql'].startswith(verb)
+        ]
+
+    def test_follow_and_unfollow_are_single_queries(self):
+        """Подписка и отписка выполняются одним запросом"""
+        self.assertTrue(Follow.objects.follow(self.user, self.author))
+        with CaptureQueriesContext(connection) as context:
+            self.assertFalse(Follow.objects.follow(self.user, self.author))
+        self.assertEqual(len(self.statements(context, 'INSERT')), 1)
+        self.assertEqual(self.statements(context, 'SELECT'), [])
+        with CaptureQueriesContext(connection) as context:
+            self.assertTrue(Follow.objects.unfollow(self.user, self.author))
+        self.assertEqual(len(self.statements(context, 'DELETE')), 1)
+        self.assertEqual(self.statements(context, 'SELECT'), [])
+        self.assertFalse(Follow.objects.filter(user=self.user).exists())
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='TestAuthor')
+        cls.follower = User.objects.create_user(username='TestFollower')
+        cls.client_follower = Client()
+        cls.client_follower.force_login(cls.follower)
+
+    def follow_url(self, name):
+        return reverse(name, kwargs={'username': self.author.username})
+
+    def feed(self):
+        response = self.client_follower.get(reverse('posts:follow_index'))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return list(response.context['page_obj'])
+
+    def test_new_post_is_fanned_out_to_followers(self):
+        """Новый пост записывается в ленты подписчиков"""
+        self.client_follower.get(self.follow_url('posts:profile_follow'))
+        post = Post.objects.create(text='Тестовый пост', author=self.author)
+        self.assertTrue(
+            TimelineEntry.objects.filter(
+                user=self.follower, post=post, pub_date=post.pub_date
+            ).exists()
+        )
+        self.assertEqual(self.feed(), [post])
+
+    def test_follow_backfills_and_unfollow_prunes_timeline(self):
+        """Подписка заполняет ленту, отписка очищает ее"""
+        posts = [
+            Post.objects.create(text=f'Тестовый пост {x}', author=self.author)
+            for x in range(3)
+        ]
+        self.client_follower.get(self.follow_url('posts:profile_follow'))
+        self.assertEqual(self.feed(), posts[::-1])
+        self.client_follower.get(self.follow_url('posts:profile_unfollow'))
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.follower).exists())
+        self.assertEqual(self.feed(), [])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_posts_of_popular_authors_are_merged_on_read(self):
+        """Посты популярных авторов подмешиваются в ленту при чтении"""
+        other = User.objects.create_user(username='TestOtherAuthor')
+        Follow.objects.create(user=self.follower, author=self.author)
+        Follow.objects.create(user=self.follower, author=other)
+        pulled = Post.objects.create(text='Без рассылки', author=self.author)
+        TimelineEntry.objects.create(
+            user=self.follower, post=pulled, pub_date=pulled.pub_date)
+        newest = Post.objects.create(text='Другой автор', author=other)
+        self.assertFalse(TimelineEntry.objects.filter(post=newest).exists())
+        self.assertEqual(self.feed(), [newest, pulled])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_merged_feed_is_paginated(self):
+        """Лента с подмешанными постами разбивается на страницы"""
+        other = User.objects.create_user(username='TestOtherAuthor')
+        Follow.objects.follow(self.follower, self.author)
+        Follow.objects.follow(self.follower, other)
+        Follow.objects.follow(other, self.author)
+        posts = [
+            Post.objects.create(
+                text=f'Тестовый пост {x}',
+                author=self.author if x % 3 else other)
+            for x in range(PAGINATION_NUM + 5)
+        ][::-1]
+        url = reverse('posts:follow_index')
+        response = self.client_follower.get(url, {'page': 2})
+        self.assertEqual(response.context['page_obj'].paginator.count,
+                         len(posts))
+        self.assertEqual(list(response.context['page_obj']),
+                         posts[PAGINATION_NUM:])
+        response = self.client_follower.get(url, {'cursor': ''})
+        self.assertEqual(list(response.context['page_obj']),
+                         posts[:PAGINATION_NUM])
+        response = self.client_follower.get(
+            url, {'cursor': response.context['page_obj'].next_cursor})
+        self.assertEqual(list(response.context['page_obj']),
+                         posts[PAGINATION_NUM:])
+
+    @pytest.mark.allow_budget_exceeded
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_author_back_under_limit_is_fanned_out(self):
+        """Посты автора, вернувшегося под лимит, попадают в ленты"""
+        other = User.objects.create_user(username='TestOtherFollower')
+        Follow.objects.follow(self.follower, self.author)
+        Follow.objects.follow(other, self.author)
+        post = Post.objects.create(text='Без рассылки', author=self.author)
+        self.assertFalse(TimelineEntry.objects.exists())
+        client_other = Client()
+        client_other.force_login(other)
+        client_other.get(self.follow_url('posts:profile_unfollow'))
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.follower, post=post).exists())
+        self.assertEqual(self.feed(), [post])
+
+    @pytest.mark.allow_budget_exceeded
+    @override_settings(TIMELINE_FANOUT_LIMIT=2)
+    def test_refill_covers_posts_backfilled_to_new_followers(self):
+        """Посты, скопированные новому подписчику, возвращаются в ленты"""
+        others = [
+            User.objects.create_user(username=f'TestOtherFollower{x}')
+            for x in range(2)
+        ]
+        for user in (self.follower, *others):
+            Follow.objects.follow(user, self.author)
+        post = Post.objects.create(text='Без рассылки', author=self.author)
+        newcomer = Client()
+        newcomer.force_login(
+            User.objects.create_user(username='TestNewFollower'))
+        newcomer.get(self.follow_url('posts:profile_follow'))
+        for user in others:
+            client = Client()
+            client.force_login(user)
+            client.get(self.follow_url('posts:profile_unfollow'))
+        self.assertEqual(self.feed(), [post])
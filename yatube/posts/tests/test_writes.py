@@ -0,0 +1,184 @@
+import datetime as dt
+import os
+import shutil
+import tempfile
+import time
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
+from django.urls import reverse
+
+from posts import writes
+from posts.models import Comment, Follow, Post, TimelineEntry, UserStats
+
+User = get_user_model()
+TEMP_QUEUE_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+class WriteBehindTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='TestAuthor')
+        cls.reader = User.objects.create_user(username='TestReader')
+        cls.post = Post.objects.create(text='Тестовый пост', author=cls.author)
+        cls.post_url = reverse(
+            'posts:post_detail', kwargs={'post_id': cls.post.pk})
+        cls.comment_url = reverse(
+            'posts:add_comment', kwargs={'post_id': cls.post.pk})
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        super().tearDownClass()
+        shutil.rmtree(TEMP_QUEUE_DIR, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        override = override_settings(
+            WRITE_BEHIND=True,
+            WRITE_BEHIND_FLUSHER=False,
+            WRITE_BEHIND_QUEUE=os.path.join(
+                TEMP_QUEUE_DIR, f'{self._testMethodName}.sqlite3'),
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+        self.client_reader = Client()
+        self.client_reader.force_login(self.reader)
+
+    def test_comment_is_shown_to_its_author_before_saving(self):
+        """Комментарий из очереди виден только автору до сохранения"""
+        self.client_reader.post(self.comment_url, data={'text': 'Ожидает'})
+        self.assertFalse(Comment.objects.exists())
+        response = self.client_reader.get(self.post_url)
+        self.assertEqual(
+            [comment.text for comment in response.context['comments']],
+            ['Ожидает']
+        )
+        response = Client().get(self.post_url)
+        self.assertEqual(len(response.context['comments']), 0)
+
+    def test_flush_saves_comments_with_counters(self):
+        """Сохранение очереди создает комментарии и обновляет счетчики"""
+        for number in range(3):
+            self.client_reader.post(
+                self.comment_url, data={'text': f'Комментарий {number}'})
+        self.assertEqual(writes.flush(), 3)
+        self.assertEqual(len(writes.get_queue()), 0)
+        self.assertEqual(
+            list(self.post.comments.order_by('pk').values_list(
+                'text', 'author')),
+            [(f'Комментарий {number}', self.reader.pk)
+             for number in range(3)]
+        )
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 3)
+        self.assertEqual(
+            UserStats.objects.get(user=self.reader).comments_count, 3)
+        response = self.client_reader.get(self.post_url)
+        self.assertEqual(len(response.context['comments']), 3)
+        response = self.client_reader.get(
+            reverse('posts:search'), {'q': 'комментарий'})
+        self.assertEqual(list(response.context['page_obj']), [self.post])
+
+    def test_replayed_batch_saves_comments_once(self):
+        """Повторно примененная очередь не дублирует комментарии"""
+        for number in range(3):
+            self.client_reader.post(
+                self.comment_url, data={'text': f'Комментарий {number}'})
+        queued = [
+            dt.datetime.fromtimestamp(write.created, dt.timezone.utc)
+            for write in writes.get_queue().head(3)
+        ]
+        with mock.patch.object(writes.WriteQueue, 'remove'):
+            writes.flush()
+        self.assertEqual(writes.flush(), 3)
+        self.assertEqual(
+            list(self.post.comments.order_by('created').values_list(
+                'created', flat=True)),
+            queued
+        )
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 3)
+        self.assertEqual(
+            UserStats.objects.get(user=self.reader).comments_count, 3)
+
+    def test_flush_applies_last_subscription_state(self):
+        """Подписки из очереди применяются по последнему состоянию"""
+        other = User.objects.create_user(username='TestOther')
+        for username in ('TestAuthor', 'TestOther'):
+            self.client_reader.get(reverse(
+                'posts:profile_follow', kwargs={'username': username}))
+        self.client_reader.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': 'TestOther'}))
+        response = self.client_reader.get(reverse(
+            'posts:profile', kwargs={'username': 'TestAuthor'}))
+        self.assertTrue(response.context['following'])
+        self.assertFalse(Follow.objects.exists())
+        writes.flush()
+        self.assertTrue(Follow.objects.filter(
+            user=self.reader, author=self.author).exists())
+        self.assertFalse(Follow.objects.filter(author=other).exists())
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=self.post).exists())
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).followers_count, 1)
+        self.assertEqual(
+            UserStats.objects.get(user=self.reader).following_count, 1)
+
+    def test_flush_skips_comments_on_deleted_posts(self):
+        """Комментарии к удаленным постам не сохраняются"""
+        post = Post.objects.create(text='Удаляемый пост', author=self.author)
+        self.client_reader.post(
+            reverse('posts:add_comment', kwargs={'post_id': post.pk}),
+            data={'text': 'Комментарий'})
+        post.delete()
+        self.assertEqual(writes.flush(), 1)
+        self.assertFalse(Comment.objects.exists())
+
+    def test_command_saves_queue_in_batches(self):
+        """Команда сохраняет всю очередь пачками"""
+        for number in range(5):
+            self.client_reader.post(
+                self.comment_url, data={'text': f'Комментарий {number}'})
+        with override_settings(WRITE_BEHIND_BATCH=2):
+            call_command('flush_writes', stdout=StringIO())
+        self.assertEqual(self.post.comments.count(), 5)
+        self.assertEqual(len(writes.get_queue()), 0)
+
+
+class WriteBehindFlusherTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        override = override_settings(
+            WRITE_BEHIND=True,
+            WRITE_BEHIND_QUEUE=os.path.join(directory, 'writes.sqlite3'),
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+        self.addCleanup(writes.stop_flusher)
+
+    def test_flusher_saves_comments(self):
+        """Фоновый поток сохраняет комментарии из очереди"""
+        author = User.objects.create_user(username='TestAuthor')
+        reader = User.objects.create_user(username='TestReader')
+        post = Post.objects.create(text='Тестовый пост', author=author)
+        client = Client()
+        client.force_login(reader)
+        client.post(
+            reverse('posts:add_comment', kwargs={'post_id': post.pk}),
+            data={'text': 'Из потока'})
+        deadline = time.monotonic() + 10
+        while not Comment.objects.exists() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertEqual(
+            list(post.comments.values_list('text', 'author')),
+            [('Из потока', reader.pk)])
+        self.assertEqual(len(writes.get_queue()), 0)
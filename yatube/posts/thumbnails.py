@@ -0,0 +1,228 @@
+"""Module with thumbnails of post images rendered in the background.
+
+A thumbnail is rendered once, after a post with a new image is committed,
+by a pool of worker threads, and its name and size are stored on the post.
+Templates only print the stored URL and show a placeholder until the
+thumbnail is ready, so no image is decoded while a page is rendered.
+
+Every thumbnail is rendered in several widths and in every format of
+FORMATS the installed Pillow can write, from a single decode of the
+original; templates offer them to browsers with `srcset`. Images are
+stored by their content, so posts with the same image share its
+thumbnail, which is rendered once.
+"""
+
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import IO, Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps, features
+
+from core.storage import content_storage
+
+from . import caching
+from .models import Post
+
+try:
+    import pillow_avif  # noqa: F401 registers AVIF support in Pillow
+except ImportError:
+    pillow_avif = None
+
+SIZE = (960, 339)
+WIDTHS = (320, 640, 960)
+UPLOAD_TO = 'posts/thumbnails/'
+
+Image.init()
+FORMATS = {
+    mime: options
+    for mime, options, available in (
+        ('image/avif', ('AVIF', 'avif', {'quality': 60}),
+         'AVIF' in Image.SAVE),
+        ('image/webp', ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+         features.check('webp')),
+        ('image/jpeg', ('JPEG', 'jpg', {
+            'quality': 85, 'optimize': True, 'progressive': True}), True),
+    )
+    if available
+}
+
+Rendition = Tuple[str, int, int, bytes]
+
+logger = logging.getLogger(__name__)
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Get pool of THUMBNAIL_WORKERS threads rendering thumbnails."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails',
+        )
+    return _executor
+
+
+def render(source: IO[bytes]) -> List[Rendition]:
+    """Render all variants of the thumbnail of an image.
+
+    The image is scaled to cover SIZE and cropped in the center, like
+    `{% thumbnail image "960x339" crop="center" upscale=True %}` did, and
+    the crop is resized to every width of WIDTHS. JPEG originals are
+    decoded right at a reduced scale when they are much larger than SIZE.
+
+    Args:
+        source: file with the original image.
+
+    Returns:
+        mime type, width, height and content of every variant.
+    """
+    with Image.open(source) as image:
+        image.draft('RGB', SIZE)
+        image = ImageOps.exif_transpose(image).convert('RGB')
+        crop = ImageOps.fit(image, SIZE, Image.LANCZOS)
+    renditions = []
+    for width in WIDTHS:
+        height = round(SIZE[1] * width / SIZE[0])
+        resized = (
+            crop if width == SIZE[0]
+            else crop.resize((width, height), Image.LANCZOS)
+        )
+        for mime, (pil_format, _, options) in FORMATS.items():
+            buffer = BytesIO()
+            resized.save(buffer, pil_format, **options)
+            renditions.append((mime, width, height, buffer.getvalue()))
+    return renditions
+
+
+def store(image_name: str) -> Optional[Dict[str, object]]:
+    """Render and save the thumbnail variants of an image.
+
+    Touches files only, so it can run in any thread or process.
+
+    Args:
+        image_name: name of the original image in the storage.
+
+    Returns:
+        values of thumbnail fields of the post, None for a broken image.
+    """
+    try:
+        with content_storage.open(image_name) as source:
+            renditions = render(source)
+    except (
+        OSError, Image.DecompressionBombError, SuspiciousFileOperation,
+    ) as error:
+        logger.warning('Thumbnail of %s is not rendered: %s', image_name,
+                       error)
+        return None
+    variants: Dict[str, List[Tuple[str, int]]] = {}
+    for mime, width, height, content in renditions:
+        name = content_storage.save(
+            f'{UPLOAD_TO}{width}x{height}.{FORMATS[mime][1]}',
+            ContentFile(content)
+        )
+        variants.setdefault(mime, []).append((name, width))
+    return {
+        'thumbnail': variants['image/jpeg'][-1][0],
+        'thumbnail_width': SIZE[0],
+        'thumbnail_height': SIZE[1],
+        'thumbnail_variants': json.dumps(variants),
+    }
+
+
+def rendered(image_names: Iterable[str]) -> Dict[str, Dict[str, object]]:
+    """Get thumbnails already rendered for other posts with these images.
+
+    Args:
+        image_names: names of the original images.
+
+    Returns:
+        values of thumbnail fields by image name.
+    """
+    posts = Post.objects.filter(image__in=image_names).exclude(
+        thumbnail_variants='').values(
+        'image', 'thumbnail', 'thumbnail_width', 'thumbnail_height',
+        'thumbnail_variants')
+    return {fields.pop('image'): fields for fields in posts}
+
+
+def save(post_id: int, image_name: str, fields: Dict[str, object]) -> bool:
+    """Store rendered thumbnail on the post unless its image was replaced.
+
+    Files of a thumbnail that is not stored are left to
+    `collect_media_garbage`, as other posts may share them.
+
+    Args:
+        post_id: primary key of the post;
+        image_name: name of the image the thumbnail is rendered from;
+        fields: values returned by `store`.
+
+    Returns:
+        True if the thumbnail was stored.
+    """
+    stored = Post.objects.filter(pk=post_id, image=image_name).update(
+        updated=timezone.now(), **fields
+    )
+    if not stored:
+        return False
+    post = Post.objects.filter(pk=post_id).values_list(
+        'author_id', 'group_id').first()
+    if post is not None:
+        caching.bump_post_feeds(post_id, *post)
+    return True
+
+
+def generate(post_id: int, image_name: str) -> bool:
+    """Render the thumbnail of a post and store it on the post.
+
+    Args:
+        post_id: primary key of the post;
+        image_name: name of the image the thumbnail is rendered from.
+
+    Returns:
+        True if the thumbnail was stored, False if the image is broken or
+        the post got another image meanwhile.
+    """
+    fields = rendered([image_name]).get(image_name) or store(image_name)
+    return fields is not None and save(post_id, image_name, fields)
+
+
+def generate_in_worker(post_id: int, image_name: str) -> bool:
+    """Render a thumbnail in a pool thread that owns its DB connection."""
+    try:
+        return generate(post_id, image_name)
+    except Exception:
+        logger.exception('Thumbnail of post %s failed', post_id)
+        return False
+    finally:
+        connection.close()
+
+
+def schedule(post: Post) -> None:
+    """Render the thumbnail of a post once the transaction is committed.
+
+    With THUMBNAIL_WORKERS set to 0 the thumbnail is rendered right in the
+    committing thread.
+
+    Args:
+        post: post with a new image.
+    """
+    if not post.image:
+        return
+    post_id, image_name = post.pk, post.image.name
+
+    def submit() -> None:
+        if settings.THUMBNAIL_WORKERS:
+            get_executor().submit(generate_in_worker, post_id, image_name)
+        else:
+            generate(post_id, image_name)
+
+    transaction.on_commit(submit)
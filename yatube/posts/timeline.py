@@ -0,0 +1,219 @@
+"""Module with materialized personal feeds (fan-out-on-write).
+
+Every new post is copied as a `TimelineEntry` to the feeds of the author's
+followers, so reading a personal feed is a range scan of the
+`(user, -pub_date)` index instead of a Follow x Post join with a sort.
+Authors with more than TIMELINE_FANOUT_LIMIT followers are not fanned out:
+their posts are read separately and merged into the feed in Python, and
+are fanned out once the author is back at the limit.
+"""
+
+import heapq
+import itertools
+from typing import Iterable, Optional, Sequence, Union
+
+from django.conf import settings
+from django.db.models.query import QuerySet
+
+from .models import Follow, Post, TimelineEntry, User, UserStats
+
+
+def fan_out(post: Post) -> None:
+    """Deliver a new post to the feeds of the author's followers.
+
+    Args:
+        post: just created post.
+    """
+    limit = settings.TIMELINE_FANOUT_LIMIT
+    followers = list(
+        Follow.objects.filter(author_id=post.author_id).values_list(
+            'user', flat=True)[:limit + 1]
+    )
+    if len(followers) > limit:
+        return
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+            for user_id in followers
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def backfill(user: User, author: User) -> None:
+    """Copy latest posts of an author to the feed of a new follower.
+
+    Args:
+        user: new follower;
+        author: followed author.
+    """
+    posts = author.posts.values_list(
+        'pk', 'pub_date')[:settings.TIMELINE_BACKFILL_LIMIT]
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(user=user, post_id=pk, pub_date=pub_date)
+            for pk, pub_date in posts
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def prune(user: User, author: User) -> None:
+    """Remove posts of an unfollowed author from the feed of a user.
+
+    Args:
+        user: former follower;
+        author: unfollowed author.
+    """
+    TimelineEntry.objects.filter(user=user, post__author=author).delete()
+
+
+def refill(author_ids: Iterable[int]) -> None:
+    """Fan out posts of authors who are back at TIMELINE_FANOUT_LIMIT.
+
+    Posts written while an author had more followers were only merged on
+    read, so most followers have no timeline entries for them. Once the
+    author is fanned out again, the latest posts are copied to the feeds
+    of all followers, skipping entries they already have, or the posts
+    would drop out of the feeds.
+
+    Args:
+        author_ids: primary keys of authors who have lost followers.
+    """
+    limit = settings.TIMELINE_FANOUT_LIMIT
+    for author_id in UserStats.objects.filter(
+        user_id__in=author_ids, followers_count=limit,
+    ).values_list('user', flat=True):
+        posts = list(Post.objects.filter(author_id=author_id).values_list(
+            'pk', 'pub_date')[:settings.TIMELINE_BACKFILL_LIMIT])
+        if not posts:
+            continue
+        followers = Follow.objects.filter(
+            author_id=author_id).values_list('user', flat=True)
+        TimelineEntry.objects.bulk_create(
+            [
+                TimelineEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+                for user_id in followers for pk, pub_date in posts
+            ],
+            batch_size=500,
+            ignore_conflicts=True,
+        )
+
+
+def pulled_authors(user: User) -> list:
+    """Get followed authors whose posts are merged into the feed on read.
+
+    Args:
+        user: owner of the feed.
+
+    Returns:
+        primary keys of authors with too many followers to fan out.
+    """
+    return list(
+        Follow.objects.filter(
+            user=user,
+            author__stats__followers_count__gt=settings.TIMELINE_FANOUT_LIMIT
+        ).values_list('author', flat=True)
+    )
+
+
+class MergedFeed:
+    """Personal feed merged from timeline entries and pulled posts.
+
+    Each part is read with its own ordered and limited query, which scans
+    one index: the `(user, -pub_date)` index of timeline entries or the
+    indexes of pulled authors' posts, and the rows are merged in Python.
+    Supports the part of the QuerySet API used by the paginators and
+    the API: `filter()`, `order_by()`, `values()`, `count()` and slicing.
+    """
+
+    def __init__(self, entries: QuerySet, pulled: QuerySet,
+                 ordering: Sequence[str] = ('-pub_date', '-pk')) -> None:
+        """Create feed.
+
+        Args:
+            entries: posts of the feed's timeline entries, without posts
+                of pulled authors;
+            pulled: posts of the pulled authors;
+            ordering: fields to order by, all in the same direction.
+        """
+        self.ordering = tuple(ordering)
+        self.entries = entries.order_by(*map(entry_field, self.ordering))
+        self.pulled = pulled.order_by(*self.ordering)
+
+    def _clone(self, entries: QuerySet, pulled: QuerySet,
+               ordering: Optional[Sequence[str]] = None) -> 'MergedFeed':
+        return MergedFeed(entries, pulled, ordering or self.ordering)
+
+    def filter(self, *args, **kwargs) -> 'MergedFeed':
+        """Filter both parts of the feed."""
+        return self._clone(self.entries.filter(*args, **kwargs),
+                           self.pulled.filter(*args, **kwargs))
+
+    def order_by(self, *fields: str) -> 'MergedFeed':
+        """Order both parts of the feed by the same fields."""
+        return self._clone(self.entries, self.pulled, fields)
+
+    def values(self, *fields: str) -> 'MergedFeed':
+        """Get dicts of the fields instead of posts."""
+        return self._clone(self.entries.values(*fields),
+                           self.pulled.values(*fields))
+
+    def count(self) -> int:
+        """Get amount of posts in the feed with one query."""
+        return self.entries.order_by().union(
+            self.pulled.order_by(), all=True).count()
+
+    def __len__(self) -> int:
+        """Get amount of posts in the feed."""
+        return self.count()
+
+    def __getitem__(self, index: slice) -> list:
+        """Get a slice of the merged parts.
+
+        Both parts are read up to the end of the slice, which also covers
+        any OFFSET the slice starts with.
+        """
+        names = [field.lstrip('-') for field in self.ordering]
+
+        def key(row) -> tuple:
+            if isinstance(row, dict):
+                return tuple(row[name] for name in names)
+            return tuple(getattr(row, name) for name in names)
+
+        merged = heapq.merge(
+            self.entries[:index.stop], self.pulled[:index.stop],
+            key=key, reverse=self.ordering[0].startswith('-'),
+        )
+        return list(itertools.islice(merged, index.start, index.stop))
+
+
+def entry_field(field: str) -> str:
+    """Order posts by the date of their timeline entries.
+
+    Entries copy the date of the post, and ordering by the entry date lets
+    the feed be read along the index of timeline entries.
+    """
+    if field.lstrip('-') == 'pub_date':
+        return field.replace('pub_date', 'timeline_entries__pub_date')
+    return field
+
+
+def feed(user: User) -> Union[QuerySet, MergedFeed]:
+    """Get posts of the personal feed of a user.
+
+    Args:
+        user: owner of the feed.
+
+    Returns:
+        posts prepared for rendering in a feed, newest first: a queryset
+        or, when the user follows authors whose posts are not fanned out,
+        a merged feed supporting the same pagination.
+    """
+    posts = Post.objects.for_feed()
+    entries = posts.filter(timeline_entries__user=user)
+    authors = pulled_authors(user)
+    if not authors:
+        return entries.order_by('-timeline_entries__pub_date')
+    return MergedFeed(entries.exclude(author__in=authors),
+                      posts.filter(author__in=authors))
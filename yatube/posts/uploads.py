@@ -0,0 +1,136 @@
+"""Module with size-bounded handling of uploaded post images.
+
+`LimitedUploadHandler` streams every upload to a temporary file in chunks
+and stops writing once a file grows over UPLOAD_MAX_SIZE, so neither
+memory nor disk usage of a request depends on what a client sends.
+`check` rejects such files and images with more than IMAGE_MAX_PIXELS
+pixels by their header only, before anything decodes them, and
+`sanitize` re-encodes accepted images without their metadata, no larger
+than IMAGE_MAX_SIDE on either side.
+"""
+
+import tempfile
+from typing import Optional
+
+from django.conf import settings
+from django.core.files.uploadedfile import (TemporaryUploadedFile,
+                                            UploadedFile)
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from PIL import Image, ImageOps
+
+ORIENTATION = 0x0112
+
+SAVE_OPTIONS = {
+    'JPEG': {'quality': 90, 'optimize': True},
+    'PNG': {},
+    'WEBP': {'quality': 90},
+}
+
+
+class LimitedUploadHandler(TemporaryFileUploadHandler):
+    """Stream uploads to temporary files, cutting off oversized ones.
+
+    The rest of an oversized file is read from the request and dropped;
+    the file is marked with `too_large` for `check`.
+    """
+
+    def new_file(self, *args, **kwargs) -> None:
+        """Start a temporary file for the next uploaded file."""
+        super().new_file(*args, **kwargs)
+        self.too_large = False
+
+    def receive_data_chunk(self, raw_data: bytes, start: int) -> None:
+        """Write a chunk unless the file is over UPLOAD_MAX_SIZE."""
+        if start + len(raw_data) > settings.UPLOAD_MAX_SIZE:
+            self.too_large = True
+        if not self.too_large:
+            super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size: int) -> TemporaryUploadedFile:
+        """Get the uploaded file marked whether it was cut off."""
+        upload = super().file_complete(file_size)
+        upload.too_large = self.too_large
+        return upload
+
+
+def _source(upload: UploadedFile):
+    if hasattr(upload, 'temporary_file_path'):
+        return upload.temporary_file_path()
+    upload.seek(0)
+    return upload
+
+
+def check(upload: UploadedFile) -> Optional[str]:
+    """Check size and dimensions of an uploaded image.
+
+    Only the header of the image is read. Files that are no images at all
+    pass, so the form field reports them as usual.
+
+    Args:
+        upload: uploaded file.
+
+    Returns:
+        error message, None if the image may be decoded.
+    """
+    if getattr(upload, 'too_large', False) or (
+            upload.size > settings.UPLOAD_MAX_SIZE):
+        return (f'Размер файла не должен превышать '
+                f'{settings.UPLOAD_MAX_SIZE // 2 ** 20} МБ.')
+    try:
+        with Image.open(_source(upload)) as image:
+            width, height = image.size
+    except Image.DecompressionBombError:
+        width = height = settings.IMAGE_MAX_PIXELS
+    except OSError:
+        return None
+    finally:
+        upload.seek(0)
+    if width * height > settings.IMAGE_MAX_PIXELS:
+        return (f'Изображение не должно превышать '
+                f'{settings.IMAGE_MAX_PIXELS // 10 ** 6} мегапикселей.')
+    return None
+
+
+def sanitize(upload: UploadedFile) -> UploadedFile:
+    """Re-encode an uploaded image without its metadata.
+
+    EXIF orientation is applied to the pixels and the ICC profile is kept,
+    everything else like GPS coordinates, camera data and text chunks is
+    dropped. Images larger than IMAGE_MAX_SIDE are scaled down, JPEG ones
+    are decoded right at a reduced scale. Animations and formats missing
+    in SAVE_OPTIONS are left as uploaded.
+
+    Args:
+        upload: uploaded file that passed `check`.
+
+    Returns:
+        anonymous temporary file with the re-encoded image in the original
+        format.
+    """
+    with Image.open(_source(upload)) as image:
+        pil_format = image.format
+        if (pil_format not in SAVE_OPTIONS
+                or getattr(image, 'is_animated', False)):
+            upload.seek(0)
+            return upload
+        icc_profile = image.info.get('icc_profile')
+        scale = min(1, settings.IMAGE_MAX_SIDE / max(image.size))
+        size = tuple(max(1, round(side * scale)) for side in image.size)
+        image.draft(None, size)
+        image.thumbnail(size, Image.LANCZOS, reducing_gap=None)
+        if image.getexif().get(ORIENTATION, 1) != 1:
+            image = ImageOps.exif_transpose(image)
+        else:
+            image.load()
+    cleaned = UploadedFile(
+        tempfile.TemporaryFile(dir=settings.FILE_UPLOAD_TEMP_DIR),
+        upload.name, upload.content_type, 0, upload.charset,
+        upload.content_type_extra,
+    )
+    options = dict(SAVE_OPTIONS[pil_format], exif=b'')
+    if icc_profile:
+        options['icc_profile'] = icc_profile
+    image.save(cleaned, pil_format, **options)
+    cleaned.size = cleaned.tell()
+    cleaned.seek(0)
+    return cleaned
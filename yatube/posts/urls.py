@@ -2,7 +2,7 @@
 
 from django.urls import path
 
-from yatube.posts import views
+from posts import views
 
 app_name = 'posts'
 
@@ -14,7 +14,13 @@ urlpatterns = [
     path('posts/<int:post_id>', views.post_detail, name='post_detail'),
     path('create/', views.post_create, name='post_create'),
     path('posts/<int:post_id>/comment', views.add_comment, name='add_comment'),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.post_comments,
+        name='post_comments'
+    ),
     path('follow/', views.follow_index, name='follow_index'),
+    path('search/', views.search, name='search'),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
@@ -1,54 +1,184 @@
 """Module with views of posts app."""
 
+from typing import Optional, Union
+
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator, Page
+from django.db import transaction
 from django.db.models.query import QuerySet
-from django.http import HttpResponse, HttpRequest, HttpResponseRedirect
+from django.http import (Http404, HttpResponse, HttpRequest,
+                         HttpResponseRedirect)
 from django.shortcuts import get_object_or_404, redirect, render
-# from django.core.cache import cache
-from django.views.decorators.cache import cache_page
 
+from core.concurrency import gather
+from core.metrics import query_budget
 from yatube.settings import PAGINATION_NUM
 
+from . import caching, lookups, timeline, writes
+from .conditional import (comment_feeds, conditional_page, group_feeds,
+                          index_feeds, post_feeds, profile_feeds)
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
+from .models import Comment, Follow, Group, Post, User
+from .paginators import CursorPage, CursorPaginator
+from .search import get_backend as get_search_backend
 
 
 def pagination(
     request: HttpRequest, post_list: QuerySet, num_on_page: int,
-    ) -> Page:
+    count: Optional[int] = None,
+    ) -> Union[Page, CursorPage]:
     """Get paginated page.
+
+    Keyset pagination is used when it is enabled with CURSOR_PAGINATION
+    setting or when the request already carries a `cursor` parameter,
+    otherwise pages are numbered.
     
     Args:
         request: the current request;
         post_list: post objects to paginate;
-        num_on_page: amount of objects on page.
+        num_on_page: amount of objects on page;
+        count: amount of objects when it is already known, so numbered
+            pages do not count them once more.
     
     Returns:
         paginated page.
     """
+    if settings.CURSOR_PAGINATION or 'cursor' in request.GET:
+        paginator = CursorPaginator(post_list, num_on_page)
+        return paginator.get_page(request.GET.get('cursor'))
     paginator = Paginator(post_list, num_on_page)
+    if count is not None:
+        paginator.count = count
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     return page_obj
 
 
-@cache_page(60 * 15)
+def comments_page(request: HttpRequest, post: Post) -> CursorPage:
+    """Get page of comments of a post, newest first.
+
+    Comments are always paginated by cursor, so a page costs the same
+    for a post with any amount of comments. The first page also shows
+    comments of the current user still waiting in the write-behind queue.
+
+    Args:
+        request: the current request, with the `cursor` of older comments;
+        post: the commented post.
+
+    Returns:
+        page of comments with their authors.
+    """
+    paginator = CursorPaginator(
+        post.comments.select_related('author'),
+        settings.COMMENTS_PAGE_SIZE,
+        date_field='created',
+    )
+    page = paginator.get_page(request.GET.get('cursor'))
+    if page.cursor is None:
+        page.object_list[:0] = writes.pending_comments(request.user, post)
+    return page
+
+
+def save_post(form: PostForm, author: User) -> Post:
+    """Save a new post from a valid form.
+
+    Args:
+        form: valid form of the post;
+        author: author of the post.
+
+    Returns:
+        saved post.
+    """
+    post = form.save(commit=False)
+    post.author = author
+    with transaction.atomic():
+        post.save()
+    return post
+
+
+def save_comment(form: CommentForm, author: User, post: Post) -> Comment:
+    """Save a new comment from a valid form.
+
+    Args:
+        form: valid form of the comment;
+        author: author of the comment;
+        post: commented post.
+
+    Returns:
+        saved comment.
+    """
+    comment = form.save(commit=False)
+    comment.author = author
+    comment.post = post
+    with transaction.atomic():
+        comment.save()
+    return comment
+
+
+def follow_author(user: User, author: User) -> bool:
+    """Subscribe a user to an author and fill the personal feed.
+
+    Args:
+        user: subscriber;
+        author: author to subscribe to.
+
+    With WRITE_BEHIND the subscription is queued and made later.
+
+    Returns:
+        True if the subscription has been created or queued.
+    """
+    if user == author:
+        return False
+    if settings.WRITE_BEHIND:
+        writes.submit_follow(user, author)
+        return True
+    if not Follow.objects.follow(user, author):
+        return False
+    timeline.backfill(user, author)
+    caching.bump(caching.author_feed(user.pk), caching.author_feed(author.pk))
+    return True
+
+
+def unfollow_author(user: User, author: User) -> bool:
+    """Unsubscribe a user from an author and prune the personal feed.
+
+    Args:
+        user: subscriber;
+        author: author to unsubscribe from.
+
+    With WRITE_BEHIND the unsubscription is queued and made later.
+
+    Returns:
+        True if the subscription has been deleted or queued.
+    """
+    if settings.WRITE_BEHIND:
+        writes.submit_follow(user, author, follow=False)
+        return True
+    if not Follow.objects.unfollow(user, author):
+        return False
+    timeline.prune(user, author)
+    timeline.refill([author.pk])
+    caching.bump(caching.author_feed(user.pk), caching.author_feed(author.pk))
+    return True
+
+
+@query_budget(4)
+@conditional_page(index_feeds)
 def index(request: HttpRequest) -> HttpResponse:
     """View-function of main page."""
     template = 'posts/index.html'
-#   post_list = cache.get('index_page')
-#    if post_list is None:
-#        post_list = Post.objects.all()
-#        cache.set('index_page', post_list, timeout=20)
-    post_list = Post.objects.all()
+    post_list = Post.objects.for_feed()
     page_obj = pagination(request, post_list, PAGINATION_NUM)
     context = {
-        'page_obj': page_obj
+        'page_obj': page_obj,
+        **caching.fragments_context(caching.INDEX_FEED, page_obj),
     }
     return render(request, template, context)
 
 
+@query_budget(6)
+@conditional_page(group_feeds)
 def group_posts(request: HttpRequest, slug: str) -> HttpResponse:
     """View-function of page with posts of exact group.
     
@@ -60,16 +190,21 @@ def group_posts(request: HttpRequest, slug: str) -> HttpResponse:
         HttpResponse of group posts page.
     """
     template = 'posts/group_list.html'
-    group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
-    page_obj = pagination(request, post_list, PAGINATION_NUM)
+    post_list = Post.objects.for_feed().filter(group__slug=slug)
+    page_obj, group = gather(
+        lambda: pagination(request, post_list, PAGINATION_NUM),
+        lambda: get_object_or_404(Group, slug=slug),
+    )
     context = {
         'group': group,
-        'page_obj': page_obj
+        'page_obj': page_obj,
+        **caching.fragments_context(caching.group_feed(group.pk), page_obj),
     }
     return render(request, template, context)
 
 
+@query_budget(4)
+@conditional_page(profile_feeds)
 def profile(request: HttpRequest, username: str) -> HttpResponse:
     """View of profile pgae.
     
@@ -81,35 +216,61 @@ def profile(request: HttpRequest, username: str) -> HttpResponse:
         HttpResponse of profile page.
     """
     template = 'posts/profile.html'
-    author = get_object_or_404(User, username=username)
-    following = False
-    if request.user.is_authenticated:
-        if Follow.objects.filter(author=author, user=request.user).exists():
-            following = True
-    post_list = author.posts.all()
-    posts_num = author.posts.count()
-    page_obj = pagination(request, post_list, PAGINATION_NUM)
+    author = lookups.profile_author(request, username)
+    if author is None:
+        raise Http404
+    post_list = author.posts.for_feed()
+    page_obj = pagination(
+        request, post_list, PAGINATION_NUM, count=author.posts_num)
+    following = writes.pending_following(request.user, author.pk)
     context = {
         'author': author,
         'page_obj': page_obj,
-        'posts_num': posts_num,
-        'following': following,
+        'posts_num': author.posts_num,
+        'following': author.is_following if following is None else following,
+        **caching.fragments_context(caching.author_feed(author.pk), page_obj),
     }
     return render(request, template, context)
 
 
+@query_budget(6)
 @login_required
 def follow_index(request: HttpRequest) -> HttpResponse:
-    """View of the page with all subscriptions."""
+    """View of the page with all subscriptions.
+
+    Numbered pages of a feed with pulled authors read both of its parts,
+    which costs one query more than a feed of timeline entries only.
+    """
     template = 'posts/follow.html'
-    post_list = Post.objects.filter(author__following__user=request.user)
+    post_list = timeline.feed(request.user)
     page_obj = pagination(request, post_list, PAGINATION_NUM)
     context = {
-        'page_obj': page_obj
+        'page_obj': page_obj,
+        **caching.fragments_context(None, page_obj),
+    }
+    return render(request, template, context)
+
+
+@query_budget(5)
+def search(request: HttpRequest) -> HttpResponse:
+    """View of the page with posts found by the `q` parameter.
+
+    Posts are ranked by the search backend, so pages are always numbered.
+    """
+    template = 'posts/search.html'
+    query = request.GET.get('q', '').strip()
+    post_list = get_search_backend().search(query)
+    paginator = Paginator(post_list, PAGINATION_NUM)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        **caching.fragments_context(None, page_obj),
     }
     return render(request, template, context)
 
 
+@query_budget(10)
 @login_required
 def profile_follow(
     request: HttpRequest, username: str,
@@ -124,14 +285,11 @@ def profile_follow(
         redirect to profile page of followed user.
     """
     author = get_object_or_404(User, username=username)
-    if request.user != author:
-        Follow.objects.get_or_create(
-            user=request.user,
-            author=author
-        )
+    follow_author(request.user, author)
     return redirect('posts:profile', username=username)
 
 
+@query_budget(10)
 @login_required
 def profile_unfollow(
     request: HttpRequest, username: str,
@@ -146,29 +304,44 @@ def profile_unfollow(
         redirect to profile page of unfollowed user.
     """
     following = get_object_or_404(User, username=username)
-    Follow.objects.filter(
-        user=request.user,
-        author=following
-    ).delete()
+    unfollow_author(request.user, following)
     return redirect('posts:profile', username=username)
 
 
+@query_budget(4)
+@conditional_page(post_feeds)
 def post_detail(request: HttpRequest, post_id: int) -> HttpResponse:
     """View of the page with post details."""
     template = 'posts/post_detail.html'
-    post = get_object_or_404(Post, pk=post_id)
-    posts_num = post.author.posts.count()
-    comments = post.comments.all()
+    post = lookups.detail_post(request, post_id)
+    if post is None:
+        raise Http404
     form = CommentForm(request.POST or None)
     context = {
         'post': post,
-        'comments': comments,
+        'comments': comments_page(request, post),
         'form': form,
-        'posts_num': posts_num,
+        'posts_num': post.author_posts_num,
+    }
+    return render(request, template, context)
+
+
+@query_budget(4)
+@conditional_page(comment_feeds)
+def post_comments(request: HttpRequest, post_id: int) -> HttpResponse:
+    """View of a page of older comments, loaded into the page of a post."""
+    template = 'posts/includes/comments.html'
+    comments = comments_page(request, Post(pk=post_id))
+    if not comments and not Post.objects.filter(pk=post_id).exists():
+        raise Http404
+    context = {
+        'post_id': post_id,
+        'comments': comments,
     }
     return render(request, template, context)
 
 
+@query_budget(13)
 @login_required
 def post_create(request: HttpRequest) -> HttpResponseRedirect:
     """View of post creation."""
@@ -183,12 +356,11 @@ def post_create(request: HttpRequest) -> HttpResponseRedirect:
     }
     if not form.is_valid():
         return render(request, 'posts/create_post.html', context)
-    instance = form.save(commit=False)
-    instance.author = request.user
-    instance.save()
+    save_post(form, request.user)
     return redirect('posts:profile', username=request.user.username)
 
 
+@query_budget(13)
 @login_required
 def post_edit(request: HttpRequest, post_id: int) -> HttpResponseRedirect:
     """View of post updation."""
@@ -211,13 +383,16 @@ def post_edit(request: HttpRequest, post_id: int) -> HttpResponseRedirect:
     return redirect('posts:post_detail', post_id=post_id)
 
 
+@query_budget(11)
 @login_required
 def add_comment(request: HttpRequest, post_id: int) -> HttpResponseRedirect:
-    """View of comment creation."""
+    """View of comment creation, queued with WRITE_BEHIND."""
     form = CommentForm(request.POST or None)
     if form.is_valid():
-        comment = form.save(commit=False)
-        comment.author = request.user
-        comment.post = get_object_or_404(Post, pk=post_id)
-        comment.save()
+        post = get_object_or_404(Post, pk=post_id)
+        if settings.WRITE_BEHIND:
+            writes.submit_comment(
+                request.user, post, form.cleaned_data['text'])
+        else:
+            save_comment(form, request.user, post)
     return redirect('posts:post_detail', post_id=post_id)
@@ -0,0 +1,468 @@
+"""Module with write-behind of comments and subscriptions.
+
+With WRITE_BEHIND a comment or a (un)subscription is validated by the
+view and appended to a queue in the WRITE_BEHIND_QUEUE SQLite file instead
+of being written to the database. An append holds the lock of a small
+local file for a moment, so a burst of writes on a hot post never queues
+for the lock of the database. A flusher applies the queue in order, in
+batches of up to WRITE_BEHIND_BATCH writes, each in a single transaction
+with `bulk_create` and one counter update per post and user, and removes
+a batch from the queue once it is committed. A crash between the two
+applies the batch again without effect: a comment keeps the random key of
+its write, so saved comments are skipped, and subscriptions are applied
+as the state they lead to. Comments keep the time they were made at.
+
+Writes skip model signals, so the flusher updates counters, the search
+index and feed versions itself. Until a write is applied, pages show it
+to the user who made it, `pending_comments` and `pending_following` read
+it from the queue.
+
+One flusher applies a queue at a time, the one holding the lock of the
+queue file: the thread of a web process with WRITE_BEHIND_FLUSHER, started
+by its first write, or the `flush_writes` command.
+"""
+
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Iterable, List, NamedTuple, Optional, Set
+
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+from django.db.models import Case, DateTimeField, Value, When
+
+from . import caching, search, timeline
+from .models import Comment, Follow, Post, User, UserStats
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+COMMENT = 'comment'
+FOLLOW = 'follow'
+UNFOLLOW = 'unfollow'
+
+# Seconds before a process retries to become the flusher, and before a
+# failed batch is applied again.
+LOCK_RETRY = 5.0
+ERROR_RETRY = 1.0
+
+logger = logging.getLogger(__name__)
+
+
+class Write(NamedTuple):
+    """Write waiting in the queue.
+
+    `target_id` is the commented post or the (un)followed author, `key`
+    identifies the write among the writes of all queues ever made.
+    """
+
+    id: int
+    key: str
+    kind: str
+    user_id: int
+    target_id: int
+    text: str
+    created: float
+
+
+class WriteQueue:
+    """Queue of writes in a SQLite file shared by all processes.
+
+    The table is created on first use. The database runs in WAL mode, so
+    appended writes survive a crash of the process, and readers never wait
+    for the flusher.
+    """
+
+    def __init__(self, path: str) -> None:
+        """Create queue.
+
+        Args:
+            path: path to the database file.
+        """
+        self.path = path
+        self._local = threading.local()
+        self._lock_file = None
+
+    @property
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(
+                self.path, timeout=5, isolation_level=None,
+                check_same_thread=False,
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS writes '
+                '(id INTEGER PRIMARY KEY, key TEXT NOT NULL, '
+                'kind TEXT NOT NULL, '
+                'user_id INTEGER NOT NULL, target_id INTEGER NOT NULL, '
+                'text TEXT NOT NULL, created REAL NOT NULL)'
+            )
+            connection.execute(
+                'CREATE INDEX IF NOT EXISTS writes_user_idx '
+                'ON writes (user_id, target_id)'
+            )
+            self._local.connection = connection
+        return connection
+
+    def append(self, kind: str, user_id: int, target_id: int,
+               text: str = '') -> Write:
+        """Add a write to the end of the queue."""
+        values = (uuid.uuid4().hex, kind, user_id, target_id, text,
+                  time.time())
+        cursor = self._connection.execute(
+            'INSERT INTO writes (key, kind, user_id, target_id, text, '
+            'created) VALUES (?, ?, ?, ?, ?, ?)', values
+        )
+        return Write(cursor.lastrowid, *values)
+
+    def pending(self, user_id: int, target_id: int,
+                kinds: Iterable[str]) -> List[Write]:
+        """Get writes of a user on a post or an author, oldest first."""
+        kinds = list(kinds)
+        rows = self._connection.execute(
+            'SELECT * FROM writes WHERE user_id = ? AND target_id = ? '
+            'AND kind IN ({}) ORDER BY id'.format(', '.join('?' * len(kinds))),
+            (user_id, target_id, *kinds)
+        ).fetchall()
+        return [Write(*row) for row in rows]
+
+    def head(self, limit: int) -> List[Write]:
+        """Get the oldest writes."""
+        rows = self._connection.execute(
+            'SELECT * FROM writes ORDER BY id LIMIT ?', (limit,)
+        ).fetchall()
+        return [Write(*row) for row in rows]
+
+    def remove(self, last_id: int) -> None:
+        """Remove applied writes up to the given one.
+
+        Ids are issued under the lock of the file, so no write older than
+        the applied ones can appear after they have been read.
+        """
+        self._connection.execute(
+            'DELETE FROM writes WHERE id <= ?', (last_id,))
+
+    def __len__(self) -> int:
+        """Get amount of writes waiting in the queue."""
+        return self._connection.execute(
+            'SELECT COUNT(*) FROM writes').fetchone()[0]
+
+    def lock(self) -> bool:
+        """Try to become the only flusher of the queue.
+
+        Returns:
+            True if this queue object holds the lock.
+        """
+        if fcntl is None or self._lock_file is not None:
+            return True
+        lock_file = open(f'{self.path}.lock', 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    def unlock(self) -> None:
+        """Let another flusher apply the queue."""
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+
+_queue: Optional[WriteQueue] = None
+
+_flusher: Optional[threading.Thread] = None
+
+_flusher_lock = threading.Lock()
+
+_wakeup = threading.Event()
+
+_stop = threading.Event()
+
+
+def get_queue() -> WriteQueue:
+    """Get queue in the WRITE_BEHIND_QUEUE file."""
+    global _queue
+    if _queue is None or _queue.path != settings.WRITE_BEHIND_QUEUE:
+        _queue = WriteQueue(settings.WRITE_BEHIND_QUEUE)
+    return _queue
+
+
+def wake() -> None:
+    """Make the flusher of the process apply new writes, starting it."""
+    global _flusher
+    if not settings.WRITE_BEHIND_FLUSHER:
+        return
+    with _flusher_lock:
+        if _flusher is None or not _flusher.is_alive():
+            _stop.clear()
+            _flusher = threading.Thread(
+                target=run_flusher, args=(_stop,), name='write-behind',
+                daemon=True)
+            _flusher.start()
+    _wakeup.set()
+
+
+def stop_flusher() -> None:
+    """Stop the flusher of the process once its batch is applied."""
+    global _flusher
+    with _flusher_lock:
+        flusher, _flusher = _flusher, None
+        if flusher is None:
+            return
+        _stop.set()
+        _wakeup.set()
+        flusher.join()
+
+
+def queued_comment(write: Write, author: User, post: Post) -> Comment:
+    """Get unsaved comment of a queued write."""
+    return Comment(
+        post=post, author=author, text=write.text, write_key=write.key,
+        created=datetime.fromtimestamp(write.created, timezone.utc),
+    )
+
+
+def submit_comment(author: User, post: Post, text: str) -> Comment:
+    """Queue a comment validated by the form.
+
+    The page of the post is invalidated at once, so the author does not
+    revalidate it to a copy without the comment.
+
+    Args:
+        author: author of the comment;
+        post: commented post;
+        text: text of the comment.
+
+    Returns:
+        unsaved comment, as it is going to be saved.
+    """
+    write = get_queue().append(COMMENT, author.pk, post.pk, text)
+    caching.bump(caching.post_feed(post.pk))
+    wake()
+    return queued_comment(write, author, post)
+
+
+def submit_follow(user: User, author: User, follow: bool = True) -> None:
+    """Queue a subscription or an unsubscription.
+
+    Args:
+        user: subscriber;
+        author: author to (un)subscribe from;
+        follow: False to unsubscribe.
+    """
+    get_queue().append(FOLLOW if follow else UNFOLLOW, user.pk, author.pk)
+    caching.bump(caching.author_feed(user.pk), caching.author_feed(author.pk))
+    wake()
+
+
+def pending_comments(user: User, post: Post) -> List[Comment]:
+    """Get comments of a user on a post not applied yet, newest first."""
+    if not settings.WRITE_BEHIND or not user.is_authenticated:
+        return []
+    return [
+        queued_comment(write, user, post)
+        for write in reversed(get_queue().pending(
+            user.pk, post.pk, [COMMENT]))
+    ]
+
+
+def pending_following(user: User, author_id: int) -> Optional[bool]:
+    """Check if a user follows an author after writes not applied yet.
+
+    Returns:
+        state after the last pending (un)subscription, None without one.
+    """
+    if not settings.WRITE_BEHIND or not user.is_authenticated:
+        return None
+    writes = get_queue().pending(user.pk, author_id, [FOLLOW, UNFOLLOW])
+    return writes[-1].kind == FOLLOW if writes else None
+
+
+def save_comments(writes: List[Write]) -> Set[Optional[str]]:
+    """Create queued comments with the changes their signals would make.
+
+    Comments on deleted posts and of deleted users are dropped, and
+    comments already saved by a batch applied before are skipped.
+
+    Returns:
+        names of the feeds showing the comments.
+    """
+    posts = {
+        pk: (author_id, group_id)
+        for pk, author_id, group_id in Post.objects.filter(
+            pk__in={write.target_id for write in writes}
+        ).values_list('pk', 'author_id', 'group_id')
+    }
+    users = set(User.objects.filter(
+        pk__in={write.user_id for write in writes}
+    ).values_list('pk', flat=True))
+    saved = set(Comment.objects.filter(
+        write_key__in=[write.key for write in writes]
+    ).values_list('write_key', flat=True))
+    comments = [
+        queued_comment(write, User(pk=write.user_id), Post(pk=write.target_id))
+        for write in writes
+        if write.target_id in posts and write.user_id in users
+        and write.key not in saved
+    ]
+    if not comments:
+        return set()
+    created = {comment.write_key: comment.created for comment in comments}
+    Comment.objects.bulk_create(comments)
+    inserted = Comment.objects.filter(write_key__in=list(created))
+    # `created` is set to the time of the insert, the time of the write
+    # replaces it.
+    inserted.update(created=Case(
+        *(When(write_key=key, then=Value(date, DateTimeField()))
+          for key, date in created.items()),
+        output_field=DateTimeField(),
+    ))
+    for comment in comments:
+        comment.created = created[comment.write_key]
+    if comments[0].pk is None:
+        # SQLite returns no ids of inserted rows.
+        pks = dict(inserted.values_list('write_key', 'pk'))
+        for comment in comments:
+            comment.pk = pks[comment.write_key]
+    for post_id, delta in Counter(c.post_id for c in comments).items():
+        Post.objects.change_comments_count(post_id, delta)
+    for author_id, delta in Counter(c.author_id for c in comments).items():
+        UserStats.objects.change(author_id, comments_count=delta)
+    backend = search.get_backend()
+    for comment in comments:
+        backend.index_comment(comment)
+    feeds = {caching.INDEX_FEED}
+    for post_id in {comment.post_id for comment in comments}:
+        author_id, group_id = posts[post_id]
+        feeds.update((caching.post_feed(post_id),
+                      caching.author_feed(author_id),
+                      caching.group_feed(group_id)))
+    feeds.update(caching.author_feed(c.author_id) for c in comments)
+    return feeds
+
+
+def save_follows(writes: List[Write]) -> Set[Optional[str]]:
+    """Apply queued (un)subscriptions with their counters and feeds.
+
+    The last write of a pair of users decides if the pair is subscribed,
+    so repeated and cancelled writes cost nothing.
+
+    Returns:
+        names of the feeds of the users whose subscriptions changed.
+    """
+    state = {
+        (write.user_id, write.target_id): write.kind == FOLLOW
+        for write in writes
+    }
+    user_ids = {pk for pair in state for pk in pair}
+    users = set(User.objects.filter(
+        pk__in=user_ids).values_list('pk', flat=True))
+    existing = {
+        (user_id, author_id): pk
+        for pk, user_id, author_id in Follow.objects.filter(
+            user_id__in={user_id for user_id, _ in state},
+            author_id__in={author_id for _, author_id in state},
+        ).values_list('pk', 'user_id', 'author_id')
+    }
+    created = [
+        pair for pair, follow in state.items()
+        if follow and pair not in existing and set(pair) <= users
+    ]
+    deleted = [
+        pair for pair, follow in state.items()
+        if not follow and pair in existing
+    ]
+    Follow.objects.bulk_create(
+        [Follow(user_id=user_id, author_id=author_id)
+         for user_id, author_id in created],
+        ignore_conflicts=True,
+    )
+    if deleted:
+        Follow.objects.filter(
+            pk__in=[existing[pair] for pair in deleted],
+        )._raw_delete(Follow.objects.db)
+    deltas = Counter()
+    for user_id, author_id in created:
+        timeline.backfill(User(pk=user_id), User(pk=author_id))
+        deltas[user_id, 'following_count'] += 1
+        deltas[author_id, 'followers_count'] += 1
+    for user_id, author_id in deleted:
+        timeline.prune(User(pk=user_id), User(pk=author_id))
+        deltas[user_id, 'following_count'] -= 1
+        deltas[author_id, 'followers_count'] -= 1
+    for user_id in {user_id for user_id, _ in deltas}:
+        UserStats.objects.change(user_id, **{
+            name: delta for (pk, name), delta in deltas.items()
+            if pk == user_id
+        })
+    timeline.refill({author_id for _, author_id in deleted})
+    return {
+        caching.author_feed(pk)
+        for pair in created + deleted for pk in pair
+    }
+
+
+def flush(limit: Optional[int] = None) -> int:
+    """Apply the oldest writes of the queue in one transaction.
+
+    Args:
+        limit: largest amount of writes, WRITE_BEHIND_BATCH by default.
+
+    Returns:
+        amount of applied writes.
+    """
+    queue = get_queue()
+    writes = queue.head(limit or settings.WRITE_BEHIND_BATCH)
+    if not writes:
+        return 0
+    comments = [write for write in writes if write.kind == COMMENT]
+    follows = [write for write in writes if write.kind != COMMENT]
+    with transaction.atomic():
+        feeds = save_comments(comments) if comments else set()
+        if follows:
+            feeds |= save_follows(follows)
+    queue.remove(writes[-1].id)
+    caching.bump(*feeds)
+    return len(writes)
+
+
+def run_flusher(stop: Optional[threading.Event] = None) -> None:
+    """Apply the queue as writes come, until stopped.
+
+    Writes of the process wake the flusher at once, writes of other
+    processes are picked up every WRITE_BEHIND_INTERVAL seconds. Only the
+    holder of the lock of the queue applies it, other flushers wait for
+    the lock to become free.
+
+    Args:
+        stop: event stopping the flusher, it runs forever without one.
+    """
+    while stop is None or not stop.is_set():
+        queue = get_queue()
+        if not queue.lock():
+            time.sleep(LOCK_RETRY)
+            continue
+        close_old_connections()
+        _wakeup.clear()
+        try:
+            applied = flush()
+        except Exception:
+            logger.exception('Failed to apply queued writes')
+            time.sleep(ERROR_RETRY)
+            continue
+        if not applied:
+            _wakeup.wait(settings.WRITE_BEHIND_INTERVAL)
+    get_queue().unlock()
+    connections.close_all()
@@ -3,7 +3,7 @@
 from django.contrib.auth.views import LoginView, LogoutView
 from django.urls import path
 
-from yatube.users import views
+from users import views
 
 app_name = 'users'
 
@@ -3,7 +3,7 @@
 from django.urls import reverse_lazy
 from django.views.generic import CreateView
 
-from yatube.users.forms import CreationForm
+from users.forms import CreationForm
 
 
 class SignUp(CreateView):
@@ -0,0 +1,20 @@
+"""
+ASGI config for yatube project.
+
+It exposes the ASGI callable as a module-level variable named ``application``,
+e.g. for ``uvicorn yatube.asgi:application``. Django 2.2 has no ASGI support
+of its own, so requests run in threads of ``core.asgi.ASGIHandler``.
+"""
+
+import os
+
+from django.conf import settings
+from django.core.wsgi import get_wsgi_application
+
+from core.asgi import ASGIHandler
+from core.wsgi import FileServer
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+application = ASGIHandler(
+    FileServer(get_wsgi_application()), settings.ASGI_THREADS)
@@ -26,10 +26,12 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
     'sorl.thumbnail',
 ]
 
 MIDDLEWARE = [
+    'core.metrics.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -45,7 +47,7 @@ ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.metrics.TimedDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -63,13 +65,58 @@ TEMPLATES = [
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
 
-DATABASES = {
-    'default': {
+# Database chosen by YATUBE_DATABASE. 'postgresql' needs psycopg2 and
+# reads connection parameters from YATUBE_DB_* variables; with PgBouncer in
+# transaction pooling mode in front of it set YATUBE_DB_PGBOUNCER=1, which
+# turns off server-side cursors that do not survive between transactions.
+# Every worker thread keeps its connection open for CONN_MAX_AGE seconds
+# instead of connecting on every request.
+DATABASE_ENGINES = {
+    'sqlite': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'TEST': {
+            'NAME': os.path.join(BASE_DIR, 'test_db.sqlite3'),
+        },
+    },
+    'postgresql': {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ.get('YATUBE_DB_NAME', 'yatube'),
+        'USER': os.environ.get('YATUBE_DB_USER', 'yatube'),
+        'PASSWORD': os.environ.get('YATUBE_DB_PASSWORD', ''),
+        'HOST': os.environ.get('YATUBE_DB_HOST', 'localhost'),
+        'PORT': os.environ.get('YATUBE_DB_PORT', '5432'),
+        'DISABLE_SERVER_SIDE_CURSORS': bool(
+            int(os.environ.get('YATUBE_DB_PGBOUNCER', 0))),
+        'OPTIONS': {'connect_timeout': 5},
+    },
+}
+
+DATABASE = os.environ.get('YATUBE_DATABASE', 'sqlite')
+
+DATABASES = {
+    'default': {
+        **DATABASE_ENGINES[DATABASE],
+        'CONN_MAX_AGE': int(os.environ.get('YATUBE_DB_CONN_MAX_AGE', 60)),
     }
 }
 
+# Removes WAL files of the SQLite test database after `manage.py test`.
+TEST_RUNNER = 'core.testing.TestRunner'
+
+# Applied in order to every SQLite connection by `core.database`, the busy
+# timeout first, so switching to WAL waits for other connections. WAL and
+# synchronous=NORMAL keep commits durable against process crashes, not
+# against power loss of the host.
+SQLITE_PRAGMAS = {
+    'busy_timeout': 5000,
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 2 ** 20,
+    'cache_size': -64 * 2 ** 10,
+    'temp_store': 'MEMORY',
+}
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -102,6 +149,17 @@ STATIC_URL = '/static/'
 
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 
+STATIC_ROOT = os.path.join(BASE_DIR, 'collected_static')
+
+# collectstatic names files by their content and compresses them; with
+# DEBUG on nothing is collected and names stay as they are.
+# Both static and media files are served by `core.wsgi.FileServer`.
+STATICFILES_STORAGE = (
+    'django.contrib.staticfiles.storage.StaticFilesStorage'
+    if DEBUG
+    else 'core.staticfiles.CompressedManifestStaticFilesStorage'
+)
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
@@ -116,14 +174,129 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 PAGINATION_NUM = 10
 
+CURSOR_PAGINATION = False
+
+# Amount of comments the page of a post shows, newest first; older ones
+# are loaded by the same amount.
+COMMENTS_PAGE_SIZE = 20
+
+# Default and largest amount of objects on a page of the JSON API, which
+# clients choose with the `limit` parameter.
+API_PAGE_SIZE = 20
+API_MAX_PAGE_SIZE = 100
+
+TIMELINE_FANOUT_LIMIT = 1000
+
+TIMELINE_BACKFILL_LIMIT = 1000
+
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
+FRAGMENT_CACHE_TIMEOUT = 60 * 15
+
+FRAGMENT_REBUILD_TIMEOUT = 30
+
+# Threads rendering thumbnails of post images; with 0 they are rendered
+# in the request thread right after the post is committed.
+THUMBNAIL_WORKERS = 2
+
+# Threads running independent queries of a page concurrently, each with
+# connections of its own; with 0 queries run one by one in the request
+# thread.
+QUERY_WORKERS = 4
+
+# Threads of `yatube.asgi` running requests, each with connections of its
+# own.
+ASGI_THREADS = 16
+
+# With WRITE_BEHIND comments and subscriptions made on the pages are
+# appended to the WRITE_BEHIND_QUEUE file and saved by `posts.writes` in
+# batches of up to WRITE_BEHIND_BATCH. With WRITE_BEHIND_FLUSHER every
+# process runs a thread saving them, which checks the queue for writes of
+# other processes every WRITE_BEHIND_INTERVAL seconds; without it the
+# queue is saved by the `flush_writes` command.
+WRITE_BEHIND = bool(int(os.environ.get('YATUBE_WRITE_BEHIND', 0)))
+WRITE_BEHIND_QUEUE = os.environ.get(
+    'YATUBE_WRITE_BEHIND_QUEUE', os.path.join(BASE_DIR, 'writes.sqlite3'))
+WRITE_BEHIND_BATCH = 500
+WRITE_BEHIND_INTERVAL = 0.1
+WRITE_BEHIND_FLUSHER = True
+
+# Uploads are streamed to temporary files in chunks. Files over
+# UPLOAD_MAX_SIZE and images over IMAGE_MAX_PIXELS are rejected by their
+# header, accepted images are stored without metadata and scaled down to
+# IMAGE_MAX_SIDE, which bounds the memory every later decode takes.
+FILE_UPLOAD_HANDLERS = ['posts.uploads.LimitedUploadHandler']
+
+UPLOAD_MAX_SIZE = 10 * 2 ** 20
+
+IMAGE_MAX_PIXELS = 50 * 10 ** 6
+
+IMAGE_MAX_SIDE = 2560
+
+# 'posts.search.DatabaseBackend' works without the SQLite FTS5 index,
+# which is only created on SQLite.
+SEARCH_BACKEND = (
+    'posts.search.FTS5Backend'
+    if DATABASE == 'sqlite'
+    else 'posts.search.DatabaseBackend'
+)
+
+# Shared cache tier, chosen by YATUBE_CACHE. Every worker process on the
+# host sees the same entries; 'redis' needs django-redis installed and
+# 'memcached' needs python-memcached. Bumping YATUBE_CACHE_VERSION drops
+# all entries at once, e.g. on deploy.
+SHARED_CACHES = {
+    'sqlite': {
+        'BACKEND': 'core.caches.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache.sqlite3'),
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache'),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    'redis': {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': 'redis://127.0.0.1:6379/1',
+    },
+    'memcached': {
+        'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+        'LOCATION': '127.0.0.1:11211',
+    },
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+
+SHARED_CACHE = SHARED_CACHES[
+    os.environ.get('YATUBE_CACHE', 'sqlite')
+].copy()
+if 'YATUBE_CACHE_LOCATION' in os.environ:
+    SHARED_CACHE['LOCATION'] = os.environ['YATUBE_CACHE_LOCATION']
+SHARED_CACHE['KEY_PREFIX'] = os.environ.get('YATUBE_CACHE_PREFIX', 'yatube')
+SHARED_CACHE['VERSION'] = int(os.environ.get('YATUBE_CACHE_VERSION', 1))
+
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'BACKEND': 'core.caches.TieredCache',
+        'LOCATION': 'shared',
+        'OPTIONS': {
+            'MAX_ENTRIES': 1000,
+            'LOCAL_TIMEOUT': float(
+                os.environ.get('YATUBE_CACHE_LOCAL_TIMEOUT', 5)),
+        },
+    },
+    'shared': SHARED_CACHE,
 }
 
+FEED_VERSION_CACHE = 'shared'
+
+# Clients seeing the debug toolbar.
 INTERNAL_IPS = [
     '127.0.0.1',
 ]
+
+# Request metrics at /metrics are only given to scrapers sending the token
+# as `Authorization: Bearer <token>`; without a token there is no page.
+METRICS_TOKEN = os.environ.get('YATUBE_METRICS_TOKEN', '')